@@ -1,8 +1,47 @@
 from django.contrib import admin
-from .models import Category, Transaction
+from .models import ArchivedTransaction, Budget, Category, ExchangeRate, LedgerEntry, RecurringRule, Transaction, Transfer
 
 admin.site.register(Category)
-admin.site.register(Transaction)
+admin.site.register(ExchangeRate)
+admin.site.register(RecurringRule)
+admin.site.register(Budget)
 
 
+class ReadOnlyAdmin(admin.ModelAdmin):
+    """Только просмотр: записи меняются через main/services.py, иначе журнал и счётчики разойдутся."""
 
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Transaction)
+class TransactionAdmin(ReadOnlyAdmin):
+    # Операции проводятся и удаляются через create_transaction/delete_transaction
+    list_display = ('wallet', 'type', 'amount', 'category', 'created_at')
+    list_filter = ('type',)
+
+
+@admin.register(Transfer)
+class TransferAdmin(ReadOnlyAdmin):
+    # Перевод — строка и две записи журнала, создаёт их services.transfer
+    list_display = ('from_wallet', 'to_wallet', 'amount', 'credited', 'created_at')
+
+
+@admin.register(LedgerEntry)
+class LedgerEntryAdmin(ReadOnlyAdmin):
+    # Журнал только для просмотра: записи не правятся, ошибки исправляются встречной записью
+    list_display = ('wallet', 'kind', 'amount', 'occurred_at', 'batch')
+    list_filter = ('kind',)
+
+
+@admin.register(ArchivedTransaction)
+class ArchivedTransactionAdmin(ReadOnlyAdmin):
+    # Архив переносит и возвращает команда archive_transactions
+    list_display = ('wallet', 'type', 'amount', 'created_at', 'archived_at')
+    list_filter = ('type',)
@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'main'
+
+    def ready(self):
+        from . import rates  # noqa: F401  сигналы сброса кэша курсов
+        from . import refdata  # noqa: F401  сигналы сброса справочников пользователей
+        from . import ledger  # noqa: F401  начальный остаток нового кошелька в журнал
+        from . import rollups  # noqa: F401  сводки удаляемой категории — в корзины без категории
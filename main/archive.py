@@ -0,0 +1,75 @@
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import ArchivedTransaction, Transaction
+
+
+# Операции старше стольких дней переносит в архив команда archive_transactions.
+# Горизонт — локальная полночь, поэтому в архив уходят целые дни
+ARCHIVE_DAYS = getattr(settings, 'TRANSACTION_ARCHIVE_DAYS', 730)
+
+FIELDS = ('id', 'user_id', 'wallet_id', 'category_id', 'type', 'amount', 'description', 'created_at', 'recurring_rule_id')
+
+
+def horizon(now=None):
+    """
+    Граница горячей таблицы: всё в архиве строго раньше неё. Горизонт только
+    растёт со временем, поэтому чтения, сравнивающие диапазон с текущим
+    горизонтом, не пропустят ни одной архивной строки. Если увеличить
+    TRANSACTION_ARCHIVE_DAYS, лишнее возвращает archive_transactions --restore.
+    """
+    day = timezone.localdate(now) - timedelta(days=ARCHIVE_DAYS)
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def reaches(start):
+    """Диапазон с началом start (None — всё время) может задеть архив."""
+    return start is None or start < horizon()
+
+
+def models(start):
+    """Где искать операции начиная с start: горячая таблица и, если нужно, архив."""
+    return [Transaction, ArchivedTransaction] if reaches(start) else [Transaction]
+
+
+def _move(source, target, rows):
+    target.objects.bulk_create([target(**{field: getattr(row, field) for field in FIELDS}) for row in rows])
+    # Обратных ссылок с каскадом нет (журнал ссылается без внешнего ключа) — один DELETE
+    source.objects.filter(pk__in=[row.pk for row in rows]).delete()
+
+
+def _batches(source, target, condition, batch_size):
+    moved = 0
+    while True:
+        with transaction.atomic():
+            # По id: старые операции в начале таблицы, выборка быстро набирает пачку
+            rows = list(
+                source.objects
+                .select_for_update(skip_locked=True)
+                .filter(condition)
+                .order_by('pk')[:batch_size]
+            )
+            if not rows:
+                return moved
+            _move(source, target, rows)
+        moved += len(rows)
+
+
+def archive(before=None, batch_size=1000):
+    """
+    Переносит операции раньше before (по умолчанию — горизонт) из Transaction
+    в ArchivedTransaction пачками по batch_size, каждая — своя транзакция БД.
+    Сводки, счётчики и журнал не меняются: сумма денег та же.
+    Возвращает число перенесённых операций.
+    """
+    before = min(before or horizon(), horizon())
+    return _batches(Transaction, ArchivedTransaction, Q(created_at__lt=before), batch_size)
+
+
+def restore(since=None, batch_size=1000):
+    """Возвращает в Transaction архивные операции не раньше since (по умолчанию — горизонт)."""
+    return _batches(ArchivedTransaction, Transaction, Q(created_at__gte=since or horizon()), batch_size)
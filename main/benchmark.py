@@ -0,0 +1,284 @@
+import gc
+import io
+import json
+import os
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.cache import caches
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext, override_settings
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+from PIL import Image
+
+from users import avatars
+from users.models import CustomUser
+from . import budgets, checkpoints, ledger, rates, rollups
+from .services import create_transaction, recount_wallets
+from .models import Budget, Category, Transaction, Wallet
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), 'benchmark_baseline.json')
+
+VOLUME = {'users': 2, 'wallets': 3, 'categories': 20, 'transactions': 2000}
+
+def _fresh_transaction(data):
+    return create_transaction(Transaction(
+        user=data['user'], wallet=data['wallet'], type='income', amount=Decimal('1'),
+    ))
+
+
+def _fresh_wallet(data):
+    return Wallet.objects.create(user=data['user'], name='Удаляемый', type='cash', currency='UZS')
+
+
+def _fresh_budget(data):
+    category = Category.objects.create(user=data['user'], name='Удаляемая', type='outcome')
+    return Budget.objects.create(user=data['user'], category=category, limit=Decimal('1000'))
+
+
+def _avatar_rendition(data):
+    # Одна картинка на прогон; имена по содержимому, повторный прогон файлы не множит
+    if 'avatar' not in data:
+        source = io.BytesIO()
+        Image.radial_gradient('L').convert('RGB').resize((800, 600)).save(source, 'PNG')
+        _, renditions = avatars.render(source)
+        data['avatar'] = renditions['webp'][str(avatars.SIZES[0])].rsplit('/', 1)[-1]
+    return data['avatar']
+
+
+# Аргументы маршрутов с параметрами; маршрут без записи здесь — ошибка прогона,
+# чтобы новая страница не выпала из замеров незаметно
+ROUTE_KWARGS = {
+    'transaction_list': lambda data: {'type': 'outcome'},
+    'transaction_delete': lambda data: {'pk': _fresh_transaction(data).pk},
+    'transaction_create': lambda data: {'pk': data['wallet'].pk},
+    'wallet_detail': lambda data: {'pk': data['wallet'].pk},
+    'wallet_delete': lambda data: {'pk': _fresh_wallet(data).pk},
+    'statement_import': lambda data: {'pk': data['wallet'].pk},
+    'avatar_rendition': lambda data: {'name': _avatar_rendition(data)},
+    'budget_delete': lambda data: {'pk': _fresh_budget(data).pk},
+}
+
+# Строка запроса, без которой страница не делает основной работы
+ROUTE_QUERY = {
+    'transaction_search': '?q=операция',
+}
+
+# Удаление работает только POST-запросом: каждый замер удаляет новый объект
+POST_ROUTES = {'transaction_delete', 'wallet_delete', 'budget_delete'}
+
+# Маршруты, после которых клиента нужно снова авторизовать
+LOGS_OUT = {'logout'}
+
+# Метрики закрыты от обычных пользователей: на время прогона задаётся токен
+METRICS_TOKEN = 'benchmark'
+ROUTE_HEADERS = {
+    'metrics': {'Authorization': f'Bearer {METRICS_TOKEN}'},
+}
+
+
+def seed(users=2, wallets=3, categories=20, transactions=2000, prefix='bench', seed=0, created=None):
+    """
+    Создаёт пользователей с кошельками, категориями и операциями за последний год.
+    Журнал, балансы, счётчики кошельков, дневные сводки и контрольные точки согласованы с операциями.
+    Возвращает данные первого пользователя для подстановки в маршруты.
+    В created дописывается каждый созданный пользователь — по нему вызывающий
+    удаляет данные, даже если seed упал на середине.
+    """
+    rnd = random.Random(seed)
+    now = timezone.now()
+    created = [] if created is None else created
+    for u in range(users):
+        user = CustomUser.objects.create_user(f'{prefix}_{u}', password='bench')
+        created.append(user)
+        user_wallets = [
+            Wallet.objects.create(
+                user=user, name=f'Кошелёк {i}', type='cash',
+                currency='USD' if i % 3 == 2 else 'UZS',
+            )
+            for i in range(wallets)
+        ]
+        user_categories = [
+            Category.objects.create(
+                user=user, name=f'Категория {i}', type='income' if i % 4 == 0 else 'outcome'
+            )
+            for i in range(categories)
+        ]
+
+        batch = []
+        for _ in range(transactions):
+            wallet = rnd.choice(user_wallets)
+            category = rnd.choice(user_categories)
+            amount = Decimal(rnd.randint(1000, 500000))
+            batch.append(Transaction(
+                user=user, wallet=wallet, category=category, type=category.type, amount=amount,
+                description=f'Операция {len(batch)}',
+                created_at=now - timedelta(minutes=rnd.randint(1, 60 * 24 * 365)),
+            ))
+        Transaction.objects.bulk_create(batch, batch_size=2000)
+        ledger.post([ledger.entry_for(tx) for tx in batch])
+
+        for wallet in user_wallets:
+            # Запас, чтобы история не уходила в минус
+            reserve = Decimal(500000) * transactions
+            Wallet.objects.filter(pk=wallet.pk).update(balance=reserve)
+            ledger.post([ledger.opening(wallet.pk, reserve)])
+            checkpoints.build(wallet)
+        recount_wallets(Wallet.objects.filter(user=user), repair=True)
+        rollups.rebuild(user)
+        # Бюджеты на первые три категории расходов
+        month = budgets.month_of(timezone.localdate())
+        for category in [c for c in user_categories if c.type == 'outcome'][:3]:
+            budget = Budget.objects.create(user=user, category=category, limit=Decimal(10000000))
+            budgets.recalculate(budget, month)
+
+    user = created[0]
+    return {
+        'user': user,
+        'wallet': Wallet.objects.filter(user=user).first(),
+        'transaction': Transaction.objects.filter(user=user).newest_first().first(),
+    }
+
+
+def routes():
+    """Именованные маршруты main/urls.py и users/urls.py."""
+    from main.urls import urlpatterns as main_patterns
+    from users.urls import urlpatterns as users_patterns
+
+    result = []
+    for patterns in (main_patterns, users_patterns):
+        for pattern in patterns:
+            if not isinstance(pattern, URLPattern) or not pattern.name:
+                continue
+            if pattern.pattern.converters and pattern.name not in ROUTE_KWARGS:
+                raise KeyError(f'Нет аргументов для маршрута {pattern.name}')
+            result.append(pattern.name)
+    return result
+
+
+def _path(name, data):
+    if name in ROUTE_KWARGS:
+        path = reverse(name, kwargs=ROUTE_KWARGS[name](data))
+    else:
+        path = reverse(name)
+    return path + ROUTE_QUERY.get(name, '')
+
+
+def percentile(values, p):
+    # nearest rank
+    ordered = sorted(values)
+    index = max(0, -(-len(ordered) * p // 100) - 1)
+    return ordered[int(index)]
+
+
+def reset_caches():
+    # Каждый замер проходит весь путь запроса, иначе повторы читаются из кэша контекста
+    for cache in caches.all():
+        cache.clear()
+    rates.invalidate()
+
+
+@override_settings(METRICS_TOKEN=METRICS_TOKEN)
+def run(data, samples=20, warmup=2):
+    """
+    Прогоняет маршруты через тестовый клиент. Для каждого — p50/p95/p99 в мс,
+    максимум SQL-запросов за вызов и код ответа.
+    """
+    client = Client()
+    client.force_login(data['user'])
+    results = {}
+    for name in routes():
+        method = client.post if name in POST_ROUTES else client.get
+        timings = []
+        queries = 0
+        status = None
+        for i in range(warmup + samples):
+            path = _path(name, data)
+            reset_caches()
+            # Как timeit: сборка мусора не попадает внутрь замера
+            gc.collect()
+            gc.disable()
+            try:
+                with CaptureQueriesContext(connection) as captured:
+                    started = time.perf_counter()
+                    response = method(path, headers=ROUTE_HEADERS.get(name))
+                    if response.streaming:
+                        b''.join(response.streaming_content)
+                    elapsed = (time.perf_counter() - started) * 1000
+            finally:
+                gc.enable()
+            if name in LOGS_OUT:
+                client.force_login(data['user'])
+            if i < warmup:
+                continue
+            timings.append(elapsed)
+            queries = max(queries, len(captured))
+            status = response.status_code
+        results[name] = {
+            'status': status,
+            'queries': queries,
+            'p50': round(percentile(timings, 50), 2),
+            'p95': round(percentile(timings, 95), 2),
+            'p99': round(percentile(timings, 99), 2),
+        }
+    return results
+
+
+def compare(results, baseline):
+    """
+    Список регрессий относительно базовой линии из репозитория: выросло число
+    запросов или поменялся код ответа. Время здесь не сравнивается — оно
+    зависит от машины (см. compare_latency).
+    """
+    problems = []
+    routes_baseline = baseline.get('routes', {})
+    for name, current in results.items():
+        previous = routes_baseline.get(name)
+        if previous is None:
+            problems.append(f'{name}: нет в базовой линии')
+            continue
+        if current['status'] != previous['status']:
+            problems.append(f"{name}: код ответа {previous['status']} → {current['status']}")
+        if current['queries'] > previous['queries']:
+            problems.append(f"{name}: SQL-запросов {previous['queries']} → {current['queries']}")
+    for name in routes_baseline.keys() - results.keys():
+        problems.append(f'{name}: маршрут пропал')
+    return problems
+
+
+def compare_latency(results, timings, latency_threshold=0.5, latency_slack_ms=5.0):
+    """
+    Рост p95 относительно замеров, снятых на этой же машине: больше чем на
+    latency_threshold (доля) и latency_slack_ms сверху — чтобы быстрые
+    страницы не дёргались от шума.
+    """
+    problems = []
+    for name, current in results.items():
+        previous = timings.get('routes', {}).get(name)
+        if previous is None:
+            continue
+        limit = previous['p95'] * (1 + latency_threshold) + latency_slack_ms
+        if current['p95'] > limit:
+            problems.append(f"{name}: p95 {previous['p95']} → {current['p95']} мс (порог {limit:.2f})")
+    return problems
+
+
+def load_baseline(path):
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_baseline(path, results, volume, fields=('status', 'queries')):
+    """
+    Базовая линия в репозитории — только коды ответов и число запросов;
+    замеры времени (fields с p50/p95/p99) пишутся в локальный файл.
+    """
+    routes = {name: {field: row[field] for field in fields} for name, row in results.items()}
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'volume': volume, 'routes': routes}, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write('\n')
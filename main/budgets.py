@@ -0,0 +1,133 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+from .models import Budget, BudgetNotification, BudgetSpending, Transaction
+from .rates import convert
+
+
+# Пороги в процентах лимита, при переходе которых ставится уведомление
+THRESHOLDS = (80, 100)
+
+
+def month_of(day):
+    return day.replace(day=1)
+
+
+def _crossed(budget, before, after):
+    return [
+        threshold for threshold in THRESHOLDS
+        if before * 100 < budget.limit * threshold <= after * 100
+    ]
+
+
+def apply_delta(budget, month, amount):
+    """
+    Прибавляет amount к расходу бюджета за месяц и ставит уведомления о
+    пройденных порогах. Вызывать внутри transaction.atomic: UPDATE блокирует
+    строку счётчика, поэтому прочитанное следом значение — своё.
+    """
+    lookup = dict(budget_id=budget.pk, month=month)
+    if not BudgetSpending.objects.filter(**lookup).update(spent=F('spent') + amount):
+        try:
+            with transaction.atomic():
+                BudgetSpending.objects.create(spent=amount, **lookup)
+        except IntegrityError:
+            # Строку успел создать параллельный запрос
+            BudgetSpending.objects.filter(**lookup).update(spent=F('spent') + amount)
+    if amount <= 0:
+        return
+
+    spent = BudgetSpending.objects.filter(**lookup).values_list('spent', flat=True).get()
+    crossed = _crossed(budget, spent - amount, spent)
+    if crossed:
+        # Порог за месяц уведомляется один раз, даже если расход снова опустился и поднялся
+        BudgetNotification.objects.bulk_create([
+            BudgetNotification(
+                budget=budget, month=month, threshold=threshold, spent=spent, limit=budget.limit,
+            )
+            for threshold in crossed
+        ], ignore_conflicts=True)
+
+
+def _amount(budget, tx):
+    return convert(tx.amount, tx.wallet.currency, budget.currency, at=tx.created_at)
+
+
+def apply(tx, sign=1):
+    """Учитывает расход tx в бюджете его категории, если бюджет есть."""
+    if tx.type != 'outcome' or tx.category_id is None:
+        return
+    budget = Budget.objects.filter(category_id=tx.category_id).first()
+    if budget is not None:
+        apply_delta(budget, month_of(timezone.localdate(tx.created_at)), sign * _amount(budget, tx))
+
+
+class Spending:
+    """Накопитель для пачек (импорт, регулярные операции): по категории, дню и валюте."""
+
+    def __init__(self):
+        self._amounts = defaultdict(Decimal)
+
+    def add(self, tx, sign=1):
+        if tx.type == 'outcome' and tx.category_id is not None:
+            key = (tx.category_id, timezone.localdate(tx.created_at), tx.wallet.currency)
+            self._amounts[key] += sign * tx.amount
+
+    def flush(self):
+        """Один запрос за бюджетами пачки и по UPDATE на бюджет и месяц; внутри transaction.atomic."""
+        budgets = Budget.objects.in_bulk({key[0] for key in self._amounts}, field_name='category_id')
+        totals = defaultdict(Decimal)
+        for (category_id, day, currency), amount in self._amounts.items():
+            budget = budgets.get(category_id)
+            if budget is not None:
+                totals[budget, month_of(day)] += convert(amount, currency, budget.currency, at=day)
+        for (budget, month), amount in totals.items():
+            apply_delta(budget, month, amount)
+        self._amounts.clear()
+
+
+def recalculate(budget, month):
+    """
+    Пересчитывает расход бюджета за месяц по операциям — при заведении
+    бюджета посреди месяца и для сверки счётчика. Уведомления не ставит.
+    """
+    start = timezone.make_aware(datetime.combine(month, time.min))
+    end = timezone.make_aware(datetime.combine(month_of(month + timedelta(days=32)), time.min))
+    rows = (
+        Transaction.objects
+        .filter(category_id=budget.category_id, type='outcome', created_at__gte=start, created_at__lt=end)
+        .values('wallet__currency', 'created_at__date')
+        .annotate(total=Sum('amount'))
+    )
+    spent = sum(
+        (convert(row['total'], row['wallet__currency'], budget.currency, at=row['created_at__date'])
+         for row in rows),
+        Decimal('0'),
+    )
+    BudgetSpending.objects.update_or_create(budget=budget, month=month, defaults={'spent': spent})
+    return spent
+
+
+def status(user, month=None):
+    """Бюджеты пользователя с расходом за месяц: два запроса без агрегатов по операциям."""
+    month = month or month_of(timezone.localdate())
+    spent = dict(
+        BudgetSpending.objects
+        .filter(budget__user=user, month=month)
+        .values_list('budget_id', 'spent')
+    )
+    result = []
+    for budget in Budget.objects.filter(user=user).select_related('category').order_by('category__name'):
+        value = spent.get(budget.pk, Decimal('0'))
+        result.append({
+            'budget': budget,
+            'spent': value,
+            'left': budget.limit - value,
+            'percent': round(value / budget.limit * 100) if budget.limit else 0,
+        })
+    return result
@@ -0,0 +1,137 @@
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import F, Sum
+from django.db.models.functions import TruncDate, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from . import ledger
+from .models import LedgerEntry, Wallet, WalletCheckpoint
+
+
+# Точки ставятся на начало периода (локальная полночь)
+PERIODS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def _entries(wallet, **filters):
+    """
+    Движения кошелька по журналу: операции (и их отмены) на момент операции,
+    переводы, начальный остаток. Архив операций журнал не затрагивает.
+    """
+    return LedgerEntry.objects.filter(wallet_id=wallet.pk, **filters)
+
+
+def _sum(entries):
+    return entries.aggregate(total=Sum('amount'))['total'] or Decimal('0')
+
+
+def build(wallet, every='month'):
+    """
+    Пересчитывает точки кошелька назад от текущего баланса: одна группировка
+    записей журнала по периодам, точка на начало каждого периода с движениями.
+    Возвращает число точек.
+    """
+    trunc = PERIODS[every]
+    with transaction.atomic():
+        # Блокируем кошелёк: списания и свёртка журнала ждут пересчёта. Зачисления
+        # дописываются в журнал без блокировки — пересчёт лучше запускать в тихое время
+        wallet = Wallet.objects.select_for_update().get(pk=wallet.pk)
+        totals = (
+            _entries(wallet)
+            .annotate(period=trunc('occurred_at'))
+            .values('period')
+            .annotate(total=Sum('amount'))
+            .order_by()
+            .values_list('period', 'total')
+        )
+        balance = ledger.balance(wallet.pk)
+        checkpoints = []
+        for period, total in sorted(totals, reverse=True):
+            balance -= total
+            checkpoints.append(WalletCheckpoint(wallet=wallet, at=period, balance=balance))
+
+        WalletCheckpoint.objects.filter(wallet=wallet).delete()
+        WalletCheckpoint.objects.bulk_create(checkpoints)
+    return len(checkpoints)
+
+
+def shift(wallet_id, created_at, delta):
+    """
+    Операция задним числом меняет все точки после неё; вызывать внутри transaction.atomic.
+    Переводы и начальный остаток датированы моментом записи — после них точек нет.
+    """
+    WalletCheckpoint.objects.filter(wallet_id=wallet_id, at__gt=created_at).update(
+        balance=F('balance') + delta
+    )
+
+
+def shift_days(wallet_id, day_deltas):
+    """
+    То же для пачки операций, сгруппированных по локальным дням {day: delta}.
+    Точки стоят на полуночи, поэтому день целиком либо до точки, либо после.
+    """
+    if not day_deltas:
+        return
+    days = sorted(day_deltas)
+    checkpoints = (
+        WalletCheckpoint.objects
+        .filter(wallet_id=wallet_id, at__gt=_midnight(days[0]))
+        .order_by('at')
+        .values_list('pk', 'at')
+    )
+    delta = Decimal('0')
+    i = 0
+    for pk, at in checkpoints:
+        while i < len(days) and _midnight(days[i]) < at:
+            delta += day_deltas[days[i]]
+            i += 1
+        WalletCheckpoint.objects.filter(pk=pk).update(balance=F('balance') + delta)
+
+
+def _nearest(wallet, when):
+    return wallet.checkpoints.filter(at__lte=when).order_by('-at').first()
+
+
+def balance_at(wallet, when):
+    checkpoint = _nearest(wallet, when)
+    if checkpoint is None:
+        # Точек раньше нет — отматываем назад от текущего баланса
+        return ledger.current_balance(wallet) - _sum(_entries(wallet, occurred_at__gt=when))
+    return checkpoint.balance + _sum(_entries(wallet, occurred_at__gte=checkpoint.at, occurred_at__lte=when))
+
+
+def balance_series(wallet, days):
+    if not days:
+        return []
+    start = _midnight(days[0])
+    end = _midnight(days[-1] + timedelta(days=1))
+
+    checkpoint = _nearest(wallet, start)
+    if checkpoint is None:
+        since = start
+        balance = ledger.current_balance(wallet) - _sum(_entries(wallet, occurred_at__gte=start))
+    else:
+        since = checkpoint.at
+        balance = checkpoint.balance
+
+    per_day = sorted(
+        _entries(wallet, occurred_at__gte=since, occurred_at__lt=end)
+        .annotate(day=TruncDate('occurred_at'))
+        .values('day')
+        .annotate(total=Sum('amount'))
+        .order_by()
+        .values_list('day', 'total')
+    )
+    series = []
+    i = 0
+    for day in days:
+        while i < len(per_day) and per_day[i][0] <= day:
+            balance += per_day[i][1]
+            i += 1
+        series.append(balance)
+    return series
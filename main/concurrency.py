@@ -0,0 +1,36 @@
+import asyncio
+
+from asgiref.sync import sync_to_async
+from django.db import close_old_connections, connection
+
+
+def _in_atomic_block():
+    return connection.in_atomic_block
+
+
+def _own_connection(function):
+    def run():
+        try:
+            return function()
+        finally:
+            # Поток пула переживает запрос: соединение закрывается по тем же
+            # правилам CONN_MAX_AGE, что и в конце обычного HTTP-запроса
+            close_old_connections()
+    return run
+
+
+async def gather_queries(*functions):
+    """
+    Выполняет независимые синхронные функции с запросами одновременно —
+    каждую в своём потоке и своём соединении. aaggregate/acount/async for
+    идут через sync_to_async(thread_sensitive=True), то есть через один общий
+    поток, и asyncio.gather их не распараллеливает.
+    Внутри открытой транзакции другие соединения не видят её данных, поэтому
+    тогда функции выполняются по очереди в текущем соединении.
+    """
+    if await sync_to_async(_in_atomic_block)():
+        return [await sync_to_async(function)() for function in functions]
+    return await asyncio.gather(*(
+        sync_to_async(_own_connection(function), thread_sensitive=False)()
+        for function in functions
+    ))
@@ -0,0 +1,82 @@
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+
+# Алиас кэша из settings.CACHES; LocMemCache и Redis с allkeys-lru вытесняют по LRU
+CACHE_ALIAS = getattr(settings, 'USER_CONTEXT_CACHE', 'default')
+TIMEOUT = getattr(settings, 'USER_CONTEXT_CACHE_TIMEOUT', 300)
+
+# Пространства версий: 'data' поднимает любая запись пользователя, у справочников
+# (main/refdata.py) — своё, его сбрасывают только записи кошельков и категорий
+VERSION_KEY = 'user-{}-version:{}'
+CONTEXT_KEY = 'user-context:{}:{}:{}:{}'
+
+
+def _cache():
+    return caches[CACHE_ALIAS]
+
+
+def data_version(user_id, namespace='data'):
+    cache = _cache()
+    key = VERSION_KEY.format(namespace, user_id)
+    version = cache.get(key)
+    if version is None:
+        # Начальное значение от времени: если счётчик вытеснили, новая версия
+        # не совпадёт со старыми ключами, которые ещё могут лежать в кэше
+        cache.add(key, time.time_ns(), timeout=None)
+        version = cache.get(key)
+    return version
+
+
+async def adata_version(user_id, namespace='data'):
+    cache = _cache()
+    key = VERSION_KEY.format(namespace, user_id)
+    version = await cache.aget(key)
+    if version is None:
+        await cache.aadd(key, time.time_ns(), timeout=None)
+        version = await cache.aget(key)
+    return version
+
+
+def bump(user_id, namespace='data'):
+    cache = _cache()
+    key = VERSION_KEY.format(namespace, user_id)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns(), timeout=None)
+
+
+def bump_on_commit(user_id, namespace='data'):
+    """Новая версия данных пользователя — после фиксации транзакции БД, а не до неё."""
+    transaction.on_commit(lambda: bump(user_id, namespace))
+
+
+def cached_context(user_id, name, params, build, namespace='data'):
+    """
+    Значение build() под ключом текущей версии данных пользователя.
+    Любая запись пользователя поднимает версию, старые ключи просто
+    перестают читаться и вытесняются кэшем. namespace — другое пространство
+    версий (справочники), его поднимает только bump(..., namespace).
+    """
+    cache = _cache()
+    key = CONTEXT_KEY.format(user_id, data_version(user_id, namespace), name, params)
+    value = cache.get(key)
+    if value is None:
+        value = build()
+        cache.set(key, value, TIMEOUT)
+    return value
+
+
+async def acached_context(user_id, name, params, build):
+    """Асинхронный cached_context: build — корутинная функция, ключи общие с синхронным."""
+    cache = _cache()
+    key = CONTEXT_KEY.format(user_id, await adata_version(user_id), name, params)
+    value = await cache.aget(key)
+    if value is None:
+        value = await build()
+        await cache.aset(key, value, TIMEOUT)
+    return value
@@ -1,9 +1,19 @@
 import warnings
 
-from .models import Category, Transaction ,Transfer,Wallet
+from .models import Budget, Category, Transaction ,Transfer,Wallet
+from . import refdata
 from django import forms
 
 
+def _cached_choices(field, queryset, choices):
+    """
+    Варианты выбора берутся готовыми из refdata, а queryset нужен только для
+    проверки отправленного значения — отрисовка формы не делает запросов.
+    """
+    field.queryset = queryset
+    field.choices = ([('', field.empty_label)] if field.empty_label is not None else []) + choices
+
+
 class TransactionsCreateForm(forms.ModelForm):
     class Meta:
         model = Transaction
@@ -12,7 +22,10 @@ class TransactionsCreateForm(forms.ModelForm):
     def __init__(self,*args,user=None,**kwargs):
         super().__init__(*args,**kwargs)
         if user is not None:
-            self.fields['category'].queryset = Category.objects.filter(user=user)
+            _cached_choices(
+                self.fields['category'], Category.objects.filter(user=user),
+                refdata.category_choices(user.pk),
+            )
 
 
 #--------------------------------------------------------------------
@@ -26,14 +39,57 @@ class TransferForm(forms.ModelForm):
     def __init__(self,*args, user, **kwargs):
         super().__init__(*args,**kwargs)
         if user:
-            self.fields['from_wallet'].queryset = Wallet.objects.filter(user=user)
-            self.fields['to_wallet'].queryset = Wallet.objects.filter(user=user)
+            choices = refdata.wallet_choices(user.pk)
+            for name in ('from_wallet', 'to_wallet'):
+                _cached_choices(self.fields[name], Wallet.objects.filter(user=user), choices)
+
+
+#--------------------------------------------------------------------
+
 
+class StatementImportForm(forms.Form):
+    FORMAT_CHOICES = (
+        ('auto', 'По расширению файла'),
+        ('csv', 'CSV'),
+        ('ofx', 'OFX'),
+    )
 
+    file = forms.FileField(label='Файл выписки')
+    format = forms.ChoiceField(label='Формат', choices=FORMAT_CHOICES, initial='auto')
 
 
+#--------------------------------------------------------------------
+
+
+class TransactionSearchForm(forms.Form):
+    TYPE_CHOICES = (
+        ('', 'Все'),
+        ('income', 'Доходы'),
+        ('outcome', 'Расходы'),
+    )
 
+    q = forms.CharField(label='Поиск', required=False, max_length=200)
+    wallet = forms.ModelChoiceField(label='Кошелёк', queryset=Wallet.objects.none(), required=False, empty_label='Все')
+    type = forms.ChoiceField(label='Тип', choices=TYPE_CHOICES, required=False)
+    date_from = forms.DateField(label='С', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
+    date_to = forms.DateField(label='По', required=False, widget=forms.DateInput(attrs={'type': 'date'}))
 
+    def __init__(self, *args, user, **kwargs):
+        super().__init__(*args, **kwargs)
+        _cached_choices(self.fields['wallet'], Wallet.objects.filter(user=user), refdata.wallet_choices(user.pk))
 
 
+#--------------------------------------------------------------------
+
 
+class BudgetForm(forms.ModelForm):
+    class Meta:
+        model = Budget
+        fields = ('category', 'limit', 'currency')
+
+    def __init__(self, *args, user, **kwargs):
+        super().__init__(*args, **kwargs)
+        _cached_choices(
+            self.fields['category'], Category.objects.filter(user=user, type='outcome'),
+            refdata.category_choices(user.pk, 'outcome'),
+        )
@@ -0,0 +1,195 @@
+import csv
+import re
+from collections import defaultdict
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import budgets, checkpoints, ledger, rollups
+from .context_cache import bump_on_commit
+from .models import Category, Transaction
+
+
+DATE_FORMATS = (
+    '%Y-%m-%d',
+    '%Y-%m-%d %H:%M',
+    '%Y-%m-%d %H:%M:%S',
+    '%d.%m.%Y',
+    '%d.%m.%Y %H:%M',
+    '%d.%m.%Y %H:%M:%S',
+    '%d/%m/%Y',
+)
+
+
+class StatementError(ValueError):
+    def __init__(self, line, message):
+        super().__init__(f'Строка {line}: {message}')
+        self.line = line
+
+
+def _parse_amount(value, line):
+    try:
+        return Decimal(value.replace('\xa0', '').replace(' ', '').replace(',', '.'))
+    except (InvalidOperation, AttributeError):
+        raise StatementError(line, f'неверная сумма «{value}»')
+
+
+def _parse_date(value, line):
+    value = (value or '').strip()
+    for fmt in DATE_FORMATS:
+        try:
+            return timezone.make_aware(datetime.strptime(value, fmt))
+        except ValueError:
+            continue
+    raise StatementError(line, f'неверная дата «{value}»')
+
+
+def _row(line, created_at, amount, description='', category='', type=''):
+    type = (type or '').strip().lower()
+    if type not in ('income', 'outcome'):
+        type = 'outcome' if amount < 0 else 'income'
+    return {
+        'line': line,
+        'created_at': created_at,
+        'type': type,
+        'amount': abs(amount),
+        'description': (description or '').strip(),
+        'category': (category or '').strip(),
+    }
+
+
+def parse_csv(stream):
+    """
+    CSV с заголовком: date, amount, [type], [category], [description].
+    Без колонки type знак суммы задаёт доход/расход. Читается построчно.
+    """
+    reader = csv.DictReader(stream)
+    if reader.fieldnames is None:
+        return
+    reader.fieldnames = [name.strip().lower() for name in reader.fieldnames]
+    missing = {'date', 'amount'} - set(reader.fieldnames)
+    if missing:
+        raise StatementError(1, f'нет колонок: {", ".join(sorted(missing))}')
+
+    for record in reader:
+        line = reader.line_num
+        yield _row(
+            line,
+            _parse_date(record['date'], line),
+            _parse_amount(record['amount'], line),
+            description=record.get('description'),
+            category=record.get('category'),
+            type=record.get('type'),
+        )
+
+
+OFX_TAG = re.compile(r'<(/?)(\w+)>([^<\r\n]*)')
+
+
+def _parse_ofx_date(value, line):
+    # 20240131[120000[.000]][[-5:EST]]
+    digits = re.match(r'\d{8,14}', value.strip())
+    if not digits:
+        raise StatementError(line, f'неверная дата «{value}»')
+    raw = digits.group(0)
+    fmt = {8: '%Y%m%d', 12: '%Y%m%d%H%M', 14: '%Y%m%d%H%M%S'}.get(len(raw))
+    if fmt is None:
+        raise StatementError(line, f'неверная дата «{value}»')
+    return timezone.make_aware(datetime.strptime(raw, fmt))
+
+
+def parse_ofx(stream):
+    """OFX 1.x (SGML) и 2.x (XML): построчно собирает блоки <STMTTRN>."""
+    current = None
+    start_line = 0
+    for line_no, text in enumerate(stream, start=1):
+        for closing, tag, value in OFX_TAG.findall(text):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if not closing:
+                    current, start_line = {}, line_no
+                elif current is not None:
+                    if 'DTPOSTED' not in current or 'TRNAMT' not in current:
+                        raise StatementError(start_line, 'в STMTTRN нет DTPOSTED или TRNAMT')
+                    yield _row(
+                        start_line,
+                        _parse_ofx_date(current['DTPOSTED'], start_line),
+                        _parse_amount(current['TRNAMT'], start_line),
+                        description=' — '.join(filter(None, [current.get('NAME'), current.get('MEMO')])),
+                    )
+                    current = None
+            elif current is not None and not closing and value.strip():
+                current[tag] = value.strip()
+
+
+PARSERS = {'csv': parse_csv, 'ofx': parse_ofx}
+
+
+def detect_format(filename):
+    return 'ofx' if filename.lower().endswith(('.ofx', '.qfx')) else 'csv'
+
+
+def _insert(batch):
+    Transaction.objects.bulk_create(batch)
+    # Выписка банка — уже свершившийся факт, поэтому записи журнала без проверки остатка
+    ledger.post([ledger.entry_for(tx) for tx in batch])
+    return len(batch)
+
+
+def import_rows(user, wallet, rows, batch_size=2000):
+    """
+    Вставляет строки выписки пачками bulk_create. Категории ищутся и создаются
+    через словарь в памяти; записи журнала вставляются теми же пачками,
+    контрольные точки, дневные сводки и бюджеты — пачкой после вставки.
+    Всё в одной транзакции БД.
+    Возвращает число импортированных операций.
+    """
+    categories = {
+        (name.lower(), type): pk
+        for pk, name, type in Category.objects.filter(user=user).values_list('id', 'name', 'type')
+    }
+    deltas = rollups.Deltas()
+    spending = budgets.Spending()
+    day_deltas = defaultdict(Decimal)
+    imported = 0
+    batch = []
+
+    with transaction.atomic():
+        for row in rows:
+            category_id = None
+            if row['category']:
+                key = (row['category'].lower(), row['type'])
+                category_id = categories.get(key)
+                if category_id is None:
+                    category_id = categories[key] = Category.objects.create(
+                        user=user, name=row['category'], type=row['type']
+                    ).pk
+
+            tx = Transaction(
+                user=user,
+                wallet=wallet,
+                category_id=category_id,
+                type=row['type'],
+                amount=row['amount'],
+                description=row['description'],
+                created_at=row['created_at'],
+            )
+            batch.append(tx)
+            deltas.add(tx)
+            spending.add(tx)
+            signed = tx.amount if tx.type == 'income' else -tx.amount
+            day_deltas[timezone.localdate(tx.created_at)] += signed
+
+            if len(batch) >= batch_size:
+                imported += _insert(batch)
+                batch = []
+
+        imported += _insert(batch)
+        checkpoints.shift_days(wallet.pk, day_deltas)
+        deltas.flush()
+        spending.flush()
+        bump_on_commit(user.pk)
+
+    return imported
@@ -0,0 +1,150 @@
+from decimal import Decimal
+
+from django.db import connection, transaction
+from django.db.models import Count, F, Max, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from .models import ArchivedTransaction, LedgerEntry, Transaction, Wallet
+
+
+def entry_for(tx, sign=1):
+    """Запись журнала для проведения (sign=1) или удаления (sign=-1) операции tx."""
+    amount = tx.amount if tx.type == 'income' else -tx.amount
+    return LedgerEntry(
+        wallet_id=tx.wallet_id, amount=sign * amount, kind=tx.type, tx_delta=sign,
+        occurred_at=tx.created_at, transaction_id=tx.pk,
+    )
+
+
+def opening(wallet_id, amount):
+    """Начальный остаток: запись сразу считается свёрнутой, сумма уже в Wallet.balance."""
+    return LedgerEntry(wallet_id=wallet_id, amount=amount, kind='opening', batch=LedgerEntry.OPENING_BATCH)
+
+
+@receiver(post_save, sender=Wallet)
+def _opening_balance(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and instance.balance:
+        opening(instance.pk, instance.balance).save()
+
+
+def post(entries):
+    """Дописывает записи в журнал; строки кошельков не меняются."""
+    LedgerEntry.objects.bulk_create(entries, batch_size=2000)
+
+
+def balance(wallet_id):
+    """Текущий баланс кошелька: свёрнутый плюс хвост журнала, один запрос."""
+    return Wallet.objects.with_live_balance().values_list('live_balance', flat=True).get(pk=wallet_id)
+
+
+def current_balance(wallet):
+    live = getattr(wallet, 'live_balance', None)
+    return live if live is not None else balance(wallet.pk)
+
+
+def _totals(entries):
+    totals = entries.aggregate(
+        balance=Sum('amount'),
+        income=Sum('amount', filter=Q(kind='income')),
+        outcome=Sum('amount', filter=Q(kind='outcome')),
+        count=Sum('tx_delta'),
+        last_at=Max('occurred_at', filter=Q(tx_delta__gt=0)),
+        removed=Count('pk', filter=Q(tx_delta__lt=0)),
+    )
+    zero = Decimal('0')
+    return {
+        'balance': totals['balance'] or zero,
+        'income': totals['income'] or zero,
+        # Расходы в журнале со знаком минус
+        'outcome': -(totals['outcome'] or zero),
+        'count': totals['count'] or 0,
+        'last_at': totals['last_at'],
+        'removed': totals['removed'],
+    }
+
+
+def tail(wallet_id):
+    """Итоги ещё не свёрнутых записей кошелька: баланс, доходы, расходы, число и время операций."""
+    return _totals(LedgerEntry.objects.filter(wallet_id=wallet_id, batch__isnull=True))
+
+
+def debit(entry):
+    """
+    Списание с проверкой остатка. Запись вставляется первой, затем
+    проверяется баланс уже с ней; не хватило — запись откатывается и
+    возвращается False. На PostgreSQL списания одного кошелька идут по
+    очереди через SELECT ... FOR UPDATE его строки (без UPDATE), зачисления
+    не блокируются. На SQLite блокировку берёт сам INSERT: чтение до него
+    открыло бы снимок, который запись уже не смогла бы продолжить.
+    """
+    with transaction.atomic():
+        if connection.features.has_select_for_update:
+            list(Wallet.objects.select_for_update().filter(pk=entry.wallet_id).values_list('pk'))
+        entry.save()
+        if balance(entry.wallet_id) < 0:
+            transaction.set_rollback(True)
+            return False
+    return True
+
+
+def compact_wallet(wallet_id, batch_size=5000):
+    """
+    Сворачивает до batch_size записей хвоста в Wallet.balance и счётчики
+    кошелька. Первый оператор — UPDATE номера свёртки: он же блокирует строку,
+    поэтому кошелёк сворачивает один процесс, а проверка остатка видит хвост
+    целиком до свёртки или после. Записи помечаются номером свёртки одним
+    UPDATE и суммируются по нему — запись, зафиксированная позже, остаётся
+    в хвосте. Возвращает число свёрнутых записей.
+    """
+    with transaction.atomic():
+        wallets = Wallet.objects.filter(pk=wallet_id)
+        if not wallets.update(ledger_batch=F('ledger_batch') + 1):
+            return 0
+        batch = wallets.values_list('ledger_batch', flat=True).get()
+        pending = (
+            LedgerEntry.objects
+            .filter(wallet_id=wallet_id, batch__isnull=True)
+            .order_by('pk')
+            .values('pk')[:batch_size]
+        )
+        claimed = LedgerEntry.objects.filter(pk__in=pending).update(batch=batch)
+        if not claimed:
+            transaction.set_rollback(True)
+            return 0
+
+        totals = _totals(LedgerEntry.objects.filter(wallet_id=wallet_id, batch=batch))
+        updates = {
+            'balance': F('balance') + totals['balance'],
+            'total_income': F('total_income') + totals['income'],
+            'total_outcome': F('total_outcome') + totals['outcome'],
+            'tx_count': F('tx_count') + totals['count'],
+        }
+        if totals['removed']:
+            # Среди свёрнутых есть удаления — время последней берётся из оставшихся
+            # операций; архив, как правило, старше горячей таблицы и нужен, если она пуста
+            updates['last_tx_at'] = Coalesce(*(
+                Subquery(model.objects.filter(wallet_id=OuterRef('pk')).order_by('-created_at').values('created_at')[:1])
+                for model in (Transaction, ArchivedTransaction)
+            ))
+        elif totals['last_at'] is not None:
+            last_at = Value(totals['last_at'])
+            updates['last_tx_at'] = Greatest(Coalesce('last_tx_at', last_at), last_at)
+        wallets.update(**updates)
+    return claimed
+
+
+def compact(wallet_ids=None, batch_size=5000):
+    """Сворачивает хвосты всех кошельков (или wallet_ids). Возвращает число свёрнутых записей."""
+    pending = LedgerEntry.objects.filter(batch__isnull=True)
+    if wallet_ids is not None:
+        pending = pending.filter(wallet_id__in=wallet_ids)
+    folded = 0
+    for wallet_id in list(pending.values_list('wallet_id', flat=True).distinct().order_by('wallet_id')):
+        while True:
+            claimed = compact_wallet(wallet_id, batch_size)
+            folded += claimed
+            if claimed < batch_size:
+                break
+    return folded
@@ -0,0 +1,25 @@
+from django.core.management.base import BaseCommand
+
+from main import archive
+
+
+class Command(BaseCommand):
+    help = (
+        f'Переносит операции старше {archive.ARCHIVE_DAYS} дней (TRANSACTION_ARCHIVE_DAYS) '
+        'в архивную таблицу'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000, help='Операций в одной транзакции БД')
+        parser.add_argument('--restore', action='store_true',
+                            help='Вернуть из архива операции новее горизонта (после увеличения TRANSACTION_ARCHIVE_DAYS)')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            restored = archive.restore(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Возвращено из архива: {restored}'))
+            return
+        moved = archive.archive(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Перенесено в архив: {moved} (раньше {archive.horizon():%Y-%m-%d})'
+        ))
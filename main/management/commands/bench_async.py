@@ -0,0 +1,66 @@
+import time
+
+from asgiref.sync import async_to_sync
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+
+from main import benchmark
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Время ответа синхронных и асинхронных дашборда и статистики через ASGI-обработчик'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--transactions', type=int, default=20000)
+        parser.add_argument('--samples', type=int, default=30)
+        parser.add_argument('--prefix', default='bench_async')
+
+    def handle(self, *args, **options):
+        # Данные фиксируются: одновременные запросы идут через отдельные
+        # соединения и не увидели бы незафиксированную транзакцию.
+        # Поэтому вместо отката удаляются ровно созданные пользователи
+        created = []
+        setup_test_environment()
+        try:
+            data = benchmark.seed(
+                users=1, transactions=options['transactions'], prefix=options['prefix'], created=created,
+            )
+            pages = [
+                ('Дашборд, год', reverse('dashboard'), reverse('dashboard_async'), '?period=year'),
+                ('Статистика, месяц', reverse('statistics'), reverse('statistics_async'), '?period=month'),
+                ('Статистика, всё время', reverse('statistics'), reverse('statistics_async'), ''),
+            ]
+            results = async_to_sync(self.measure)(data['user'], pages, options['samples'])
+        finally:
+            teardown_test_environment()
+            CustomUser.objects.filter(pk__in=[user.pk for user in created]).delete()
+
+        for title, sync_ms, async_ms in results:
+            change = (async_ms - sync_ms) / sync_ms * 100
+            self.stdout.write(
+                f'{title:<22} sync p50 {sync_ms:8.2f} мс   async p50 {async_ms:8.2f} мс   {change:+.0f}%'
+            )
+
+    async def measure(self, user, pages, samples):
+        client = AsyncClient()
+        await client.aforce_login(user)
+        results = []
+        for title, sync_url, async_url, query in pages:
+            timings = {sync_url: [], async_url: []}
+            # Пути чередуются, чтобы фоновые колебания влияли на оба одинаково
+            for _ in range(samples):
+                for url in (sync_url, async_url):
+                    benchmark.reset_caches()
+                    started = time.perf_counter()
+                    response = await client.get(url + query)
+                    timings[url].append((time.perf_counter() - started) * 1000)
+                    assert response.status_code == 200, (url, response.status_code)
+            results.append((
+                title,
+                benchmark.percentile(timings[sync_url], 50),
+                benchmark.percentile(timings[async_url], 50),
+            ))
+        return results
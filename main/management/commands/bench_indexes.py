@@ -0,0 +1,133 @@
+import random
+import time
+from datetime import timedelta
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Sum
+from django.utils import timezone
+
+from main.models import Category, Transaction, Wallet
+from users.models import CustomUser
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Планы запросов и время горячих выборок Transaction без составных индексов и с ними'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', default='bench_indexes')
+        parser.add_argument('--rows', type=int, default=200000,
+                            help='Сколько транзакций должно быть в таблице (недостающие создаются на время замера)')
+        parser.add_argument('--repeat', type=int, default=5)
+
+    def handle(self, *args, **options):
+        try:
+            # Засеянные строки не проходят через сводки, журнал и счётчики
+            # кошельков — после замера они откатываются вместе с пользователями.
+            with transaction.atomic():
+                user = self.seed(options['username'], options['rows'])
+                wallet = Wallet.objects.filter(user=user).first()
+                queries = self.queries(user, wallet)
+                with connection.cursor() as cursor:
+                    # Статистика планировщика должна видеть засеянные строки
+                    cursor.execute(f'ANALYZE {connection.ops.quote_name(Transaction._meta.db_table)}')
+
+                try:
+                    with transaction.atomic():
+                        # DDL в SQLite и PostgreSQL транзакционный: индексы удаляются
+                        # только на время замера и возвращаются откатом.
+                        with connection.cursor() as cursor:
+                            for index in Transaction._meta.indexes:
+                                cursor.execute(f'DROP INDEX {connection.ops.quote_name(index.name)}')
+                        self.run('Без индексов', queries, options['repeat'])
+                        raise _Rollback
+                except _Rollback:
+                    pass
+
+                self.run('С индексами', queries, options['repeat'])
+                raise _Rollback
+        except _Rollback:
+            pass
+
+    def queries(self, user, wallet):
+        month_ago = timezone.now() - timedelta(days=30)
+        return [
+            ('dashboard: период', lambda: Transaction.objects.for_user_period(user, month_ago)
+                .values('type').annotate(total=Sum('amount'))),
+            ('dashboard: последние', lambda: Transaction.objects.for_user(user)
+                .newest_first()[:5]),
+            ('transaction_list', lambda: Transaction.objects.for_user_type(user, 'outcome')
+                .newest_first()[:20]),
+            ('statistics: месяц', lambda: Transaction.objects.for_user_type(user, 'outcome', month_ago)
+                .values('category__name').annotate(total=Sum('amount'))),
+            ('wallet_detail', lambda: Transaction.objects.for_wallet(wallet)
+                .newest_first()[:20]),
+        ]
+
+    def run(self, title, queries, repeat):
+        self.stdout.write(self.style.MIGRATE_HEADING(title))
+        for name, build in queries:
+            plan = build().explain()
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(build())
+                timings.append((time.perf_counter() - started) * 1000)
+            timings.sort()
+            self.stdout.write(f'{name}: медиана {timings[len(timings) // 2]:.2f} ms')
+            for line in plan.splitlines():
+                self.stdout.write(f'    {line}')
+
+    def seed(self, username, rows):
+        user, _ = CustomUser.objects.get_or_create(username=username)
+        existing = Transaction.objects.count()
+        if existing >= rows:
+            return user
+
+        wallets = list(Wallet.objects.filter(user=user))
+        if not wallets:
+            wallets = [
+                Wallet.objects.create(user=user, name=f'Кошелёк {i}', type='cash', currency='UZS')
+                for i in range(3)
+            ]
+        categories = list(Category.objects.filter(user=user))
+        if not categories:
+            categories = [
+                Category.objects.create(user=user, name=f'Категория {i}',
+                                        type='income' if i % 4 == 0 else 'outcome')
+                for i in range(20)
+            ]
+
+        # Соседи по таблице, чтобы индекс по user был избирательным
+        others = []
+        for i in range(9):
+            other, _ = CustomUser.objects.get_or_create(username=f'{username}_noise_{i}')
+            wallet, _ = Wallet.objects.get_or_create(user=other, name='Шум', type='cash', currency='UZS')
+            others.append((other, wallet))
+
+        now = timezone.now()
+        batch = []
+        for i in range(rows - existing):
+            if i % 10 == 0:
+                owner, wallet, category = user, random.choice(wallets), random.choice(categories)
+            else:
+                owner, wallet = random.choice(others)
+                category = None
+            batch.append(Transaction(
+                user=owner,
+                wallet=wallet,
+                category=category,
+                type=category.type if category else random.choice(['income', 'outcome']),
+                amount=Decimal(random.randint(1000, 500000)),
+                created_at=now - timedelta(minutes=random.randint(0, 60 * 24 * 365 * 3)),
+            ))
+            if len(batch) >= 5000:
+                Transaction.objects.bulk_create(batch)
+                batch = []
+        Transaction.objects.bulk_create(batch)
+        return user
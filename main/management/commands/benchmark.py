@@ -0,0 +1,76 @@
+import shutil
+import tempfile
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings, setup_test_environment, teardown_test_environment
+
+from main import benchmark
+
+
+class _Rollback(Exception):
+    pass
+
+
+class Command(BaseCommand):
+    help = 'Замеры всех страниц: число SQL-запросов против базовой линии, p50/p95/p99 против --timings'
+
+    def add_arguments(self, parser):
+        for name, default in benchmark.VOLUME.items():
+            parser.add_argument(f'--{name}', type=int, default=default)
+        parser.add_argument('--samples', type=int, default=20)
+        parser.add_argument('--prefix', default='benchmark', help='Префикс имён создаваемых пользователей')
+        parser.add_argument('--baseline', default=benchmark.BASELINE_PATH)
+        parser.add_argument('--update-baseline', action='store_true',
+                            help='Записать результаты как новую базовую линию (и замеры в --timings)')
+        parser.add_argument('--timings', metavar='PATH',
+                            help='Локальный файл замеров времени этой машины, в репозиторий не кладётся')
+        parser.add_argument('--latency-threshold', type=float, default=0.5,
+                            help='Допустимый рост p95 относительно --timings, доля (0.5 = +50%%)')
+
+    def handle(self, *args, **options):
+        volume = {name: options[name] for name in benchmark.VOLUME}
+
+        # Тестовое окружение: хост testserver и тестовый клиент без настройки ALLOWED_HOSTS
+        setup_test_environment()
+        # Файлы аватаров — во временный каталог, не в MEDIA_ROOT проекта
+        media = tempfile.mkdtemp()
+        try:
+            # Данные замера живут только внутри транзакции и откатываются
+            with override_settings(MEDIA_ROOT=media), transaction.atomic():
+                data = benchmark.seed(prefix=options['prefix'], **volume)
+                results = benchmark.run(data, samples=options['samples'])
+                raise _Rollback
+        except _Rollback:
+            pass
+        finally:
+            shutil.rmtree(media, ignore_errors=True)
+            teardown_test_environment()
+
+        for name, row in results.items():
+            self.stdout.write(
+                f"{name:<22} {row['status']}  запросов {row['queries']:>3}  "
+                f"p50 {row['p50']:>8.2f}  p95 {row['p95']:>8.2f}  p99 {row['p99']:>8.2f} мс"
+            )
+
+        if options['update_baseline']:
+            benchmark.save_baseline(options['baseline'], results, volume)
+            self.stdout.write(self.style.SUCCESS(f"Базовая линия записана: {options['baseline']}"))
+            if options['timings']:
+                benchmark.save_baseline(options['timings'], results, volume, fields=('p50', 'p95', 'p99'))
+                self.stdout.write(self.style.SUCCESS(f"Замеры записаны: {options['timings']}"))
+            return
+
+        baseline = benchmark.load_baseline(options['baseline'])
+        if baseline.get('volume') != volume:
+            self.stdout.write(self.style.WARNING(
+                f"Объём данных отличается от базовой линии: {baseline.get('volume')}"
+            ))
+        problems = benchmark.compare(results, baseline)
+        if options['timings']:
+            problems += benchmark.compare_latency(
+                results, benchmark.load_baseline(options['timings']), options['latency_threshold'],
+            )
+        if problems:
+            raise CommandError('Регрессии:\n' + '\n'.join(problems))
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
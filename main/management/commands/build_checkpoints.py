@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand
+
+from main import checkpoints
+from main.models import Wallet
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает контрольные точки балансов кошельков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wallet', type=int, action='append', help='Только этот кошелёк (можно несколько)')
+        parser.add_argument('--every', choices=sorted(checkpoints.PERIODS), default='month')
+
+    def handle(self, *args, **options):
+        wallets = Wallet.objects.order_by('pk')
+        if options['wallet']:
+            wallets = wallets.filter(pk__in=options['wallet'])
+
+        total = 0
+        for wallet in wallets.iterator():
+            total += checkpoints.build(wallet, every=options['every'])
+        self.stdout.write(self.style.SUCCESS(f'Создано контрольных точек: {total}'))
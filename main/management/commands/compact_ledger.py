@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main import ledger
+
+
+class Command(BaseCommand):
+    help = 'Сворачивает новые записи журнала в балансы и счётчики кошельков'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wallet', type=int, action='append', help='Только этот кошелёк (можно несколько)')
+        parser.add_argument('--batch-size', type=int, default=5000, help='Записей в одной транзакции БД')
+        parser.add_argument('--every', type=int, metavar='SECONDS',
+                            help='Не выходить, а повторять проход каждые SECONDS секунд')
+
+    def handle(self, *args, **options):
+        while True:
+            folded = ledger.compact(options['wallet'], batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Свёрнуто записей: {folded}'))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
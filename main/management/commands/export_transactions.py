@@ -0,0 +1,58 @@
+import sys
+from datetime import datetime
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from main.exporters import FORMATS, encode, export_rows
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка транзакций пользователя в CSV или JSON Lines'
+
+    def add_arguments(self, parser):
+        parser.add_argument('username')
+        parser.add_argument('--format', choices=sorted(FORMATS), default='csv')
+        parser.add_argument('--gzip', action='store_true')
+        parser.add_argument('--output', help='Файл; по умолчанию — stdout')
+        parser.add_argument('--date-from', help='YYYY-MM-DD')
+        parser.add_argument('--date-to', help='YYYY-MM-DD, включительно')
+        parser.add_argument('--type', choices=['income', 'outcome'])
+        parser.add_argument('--wallet', type=int)
+        parser.add_argument('--chunk-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            user = CustomUser.objects.get(username=options['username'])
+        except CustomUser.DoesNotExist:
+            raise CommandError(f"Пользователь {options['username']} не найден")
+
+        rows = export_rows(
+            user,
+            date_from=self.parse_date(options['date_from']),
+            date_to=self.parse_date(options['date_to'], end_of_day=True),
+            type=options['type'],
+            wallet_id=options['wallet'],
+            chunk_size=options['chunk_size'],
+        )
+        to_chunks = FORMATS[options['format']][0]
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for data in encode(to_chunks(rows), options['gzip']):
+                output.write(data)
+        finally:
+            if options['output']:
+                output.close()
+
+    def parse_date(self, value, end_of_day=False):
+        if not value:
+            return None
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise CommandError(f'Неверная дата: {value}')
+        return timezone.make_aware(
+            datetime.combine(day, datetime.max.time() if end_of_day else datetime.min.time())
+        )
@@ -0,0 +1,36 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from main.importers import PARSERS, StatementError, detect_format, import_rows
+from main.models import Wallet
+
+
+class Command(BaseCommand):
+    help = 'Потоковый импорт банковской выписки (CSV/OFX) в кошелёк'
+
+    def add_arguments(self, parser):
+        parser.add_argument('wallet_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=sorted(PARSERS), help='По умолчанию — по расширению файла')
+        parser.add_argument('--encoding', default='utf-8-sig')
+        parser.add_argument('--batch-size', type=int, default=2000)
+
+    def handle(self, *args, **options):
+        try:
+            wallet = Wallet.objects.select_related('user').get(pk=options['wallet_id'])
+        except Wallet.DoesNotExist:
+            raise CommandError(f"Кошелёк {options['wallet_id']} не найден")
+
+        parse = PARSERS[options['format'] or detect_format(options['path'])]
+        started = time.perf_counter()
+        try:
+            with open(options['path'], encoding=options['encoding'], newline='') as stream:
+                imported = import_rows(wallet.user, wallet, parse(stream), batch_size=options['batch_size'])
+        except (OSError, StatementError) as exc:
+            raise CommandError(str(exc))
+
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Импортировано {imported} операций за {elapsed:.1f} с ({imported / max(elapsed, 1e-9):.0f}/с)'
+        ))
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from main import rollups
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Заполняет дневные сводки DailySummary по существующим транзакциям'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--username', help='Пересчитать только этого пользователя')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        user = None
+        if options['username']:
+            try:
+                user = CustomUser.objects.get(username=options['username'])
+            except CustomUser.DoesNotExist:
+                raise CommandError(f"Пользователь {options['username']} не найден")
+
+        created = rollups.rebuild(user, batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f'Создано строк сводки: {created}'))
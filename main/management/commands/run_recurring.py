@@ -0,0 +1,22 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from main import recurring
+
+
+class Command(BaseCommand):
+    help = 'Проводит наступившие повторения регулярных операций'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=200, help='Правил в одной транзакции БД')
+        parser.add_argument('--every', type=int, metavar='SECONDS',
+                            help='Не выходить, а повторять проход каждые SECONDS секунд')
+
+    def handle(self, *args, **options):
+        while True:
+            created = recurring.run(batch_size=options['batch_size'])
+            self.stdout.write(self.style.SUCCESS(f'Проведено повторений: {created}'))
+            if not options['every']:
+                return
+            time.sleep(options['every'])
@@ -0,0 +1,43 @@
+from django.core.mail import send_mail
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from main.models import BudgetNotification
+
+
+class Command(BaseCommand):
+    help = 'Отправляет письма из очереди уведомлений о бюджетах'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+
+    def handle(self, *args, **options):
+        sent = 0
+        while True:
+            # Письмо и отметка sent_at — в одной транзакции: при ошибке отправки
+            # уведомление остаётся в очереди до следующего запуска
+            with transaction.atomic():
+                pending = list(
+                    BudgetNotification.objects
+                    .select_for_update(skip_locked=True, of=('self',))
+                    .select_related('budget__user', 'budget__category')
+                    .filter(sent_at__isnull=True)
+                    .order_by('created_at')[:options['batch_size']]
+                )
+                if not pending:
+                    break
+                for notification in pending:
+                    user = notification.budget.user
+                    if user.email:
+                        send_mail(
+                            f'Бюджет «{notification.budget.category.name}»: {notification.threshold}%',
+                            f'Потрачено {notification.spent} из {notification.limit} '
+                            f'{notification.budget.currency} за {notification.month:%m.%Y}.',
+                            None,
+                            [user.email],
+                        )
+                    notification.sent_at = timezone.now()
+                BudgetNotification.objects.bulk_update(pending, ['sent_at'])
+                sent += len(pending)
+        self.stdout.write(self.style.SUCCESS(f'Обработано уведомлений: {sent}'))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+
+from main.models import Wallet
+from main.services import recount_wallets
+
+
+class Command(BaseCommand):
+    help = 'Сворачивает журнал и сверяет балансы с журналом, а счётчики кошельков — с операциями'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--wallet', type=int, action='append', help='Только этот кошелёк (можно несколько)')
+        parser.add_argument('--repair', action='store_true', help='Записать пересчитанные значения')
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        wallets = Wallet.objects.order_by('pk')
+        if options['wallet']:
+            wallets = wallets.filter(pk__in=options['wallet'])
+        ids = list(wallets.values_list('pk', flat=True))
+
+        total = 0
+        size = options['batch_size']
+        for start in range(0, len(ids), size):
+            batch = Wallet.objects.filter(pk__in=ids[start:start + size]).order_by('pk')
+            for wallet, diff in recount_wallets(batch, repair=options['repair']):
+                total += 1
+                fields = ', '.join(f'{field}: {old} → {new}' for field, (old, new) in diff.items())
+                self.stdout.write(f'Кошелёк {wallet.pk}: {fields}')
+
+        if not total:
+            self.stdout.write(self.style.SUCCESS(f'Балансы и счётчики сходятся, проверено кошельков: {len(ids)}'))
+        elif options['repair']:
+            self.stdout.write(self.style.SUCCESS(f'Исправлено кошельков: {total}'))
+        else:
+            self.stdout.write(self.style.WARNING(f'Расходятся кошельков: {total}; запустите с --repair'))
@@ -0,0 +1,66 @@
+from decimal import Decimal
+
+from django.db import models
+from django.db.models import DecimalField, F, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+class TransactionQuerySet(models.QuerySet):
+    """
+    Все выборки транзакций в представлениях идут через эти методы:
+    каждый из них начинается с ведущих колонок одного из составных
+    индексов Transaction.Meta.indexes, поэтому план запроса — поиск
+    по индексу, а не полный просмотр таблицы с сортировкой.
+    """
+
+    def for_user(self, user):
+        # (user, created_at)
+        return self.filter(user=user)
+
+    def for_user_period(self, user, start=None, end=None):
+        # (user, created_at) — диапазон по второй колонке индекса
+        qs = self.filter(user=user)
+        if start is not None:
+            qs = qs.filter(created_at__gte=start)
+        if end is not None:
+            qs = qs.filter(created_at__lte=end)
+        return qs
+
+    def for_user_type(self, user, type, start=None, end=None):
+        # (user, type, created_at)
+        return self.for_user_period(user, start, end).filter(type=type)
+
+    def for_wallet(self, wallet):
+        # (wallet, created_at)
+        return self.filter(wallet=wallet)
+
+    def newest_first(self):
+        # id — для однозначного порядка при одинаковом created_at
+        return self.order_by('-created_at', '-id')
+
+
+TransactionManager = models.Manager.from_queryset(TransactionQuerySet)
+
+
+class WalletQuerySet(models.QuerySet):
+
+    def with_live_balance(self):
+        """
+        live_balance — свёрнутый Wallet.balance плюс ещё не свёрнутые записи
+        журнала (ledger): коррелированная сумма по частичному индексу хвоста.
+        """
+        entries = self.model._meta.get_field('ledger_entries').related_model
+        tail = (
+            entries.objects
+            .filter(wallet=OuterRef('pk'), batch__isnull=True)
+            .values('wallet')
+            .annotate(total=Sum('amount'))
+            .values('total')
+        )
+        money = DecimalField(max_digits=15, decimal_places=2)
+        return self.annotate(
+            live_balance=F('balance') + Coalesce(Subquery(tail, output_field=money), Value(Decimal('0')), output_field=money)
+        )
+
+
+WalletManager = models.Manager.from_queryset(WalletQuerySet)
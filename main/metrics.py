@@ -0,0 +1,173 @@
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+
+# Границы корзин; последняя корзина — +Inf
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+UNRESOLVED = '<unresolved>'
+
+
+class Histogram:
+    __slots__ = ('bounds', 'counts', 'sum')
+
+    def __init__(self, bounds):
+        self.bounds = bounds
+        # Массив заводится один раз, дальше только инкременты
+        self.counts = [0] * (len(bounds) + 1)
+        self.sum = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+
+
+class ViewMetrics:
+    __slots__ = ('latency', 'queries', 'sql_seconds')
+
+    def __init__(self):
+        self.latency = Histogram(LATENCY_BUCKETS)
+        self.queries = Histogram(QUERY_BUCKETS)
+        self.sql_seconds = 0.0
+
+
+class Registry:
+    """Метрики процесса по имени маршрута. Запись на каждый маршрут создаётся один раз."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def record(self, view, seconds, queries, sql_seconds):
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = ViewMetrics()
+            metrics.latency.observe(seconds)
+            metrics.queries.observe(queries)
+            metrics.sql_seconds += sql_seconds
+
+    def reset(self):
+        with self._lock:
+            self._views = {}
+
+    def render(self):
+        """Текстовый формат экспозиции Prometheus 0.0.4."""
+        with self._lock:
+            snapshot = [
+                (view, list(m.latency.counts), m.latency.sum, list(m.queries.counts),
+                 m.queries.sum, m.sql_seconds)
+                for view, m in sorted(self._views.items())
+            ]
+
+        lines = []
+        _histogram(lines, 'http_request_duration_seconds', 'Время ответа по маршруту',
+                   LATENCY_BUCKETS, [(row[0], row[1], row[2]) for row in snapshot])
+        _histogram(lines, 'db_queries_per_request', 'SQL-запросов на один запрос',
+                   QUERY_BUCKETS, [(row[0], row[3], row[4]) for row in snapshot])
+        lines.append('# HELP db_query_duration_seconds_total Суммарное время SQL по маршруту')
+        lines.append('# TYPE db_query_duration_seconds_total counter')
+        for row in snapshot:
+            lines.append(f'db_query_duration_seconds_total{{view="{_escape(row[0])}"}} {row[5]!r}')
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value):
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _histogram(lines, name, help, bounds, rows):
+    lines.append(f'# HELP {name} {help}')
+    lines.append(f'# TYPE {name} histogram')
+    for view, counts, total in rows:
+        label = _escape(view)
+        cumulative = 0
+        for bound, count in zip(bounds, counts):
+            cumulative += count
+            lines.append(f'{name}_bucket{{view="{label}",le="{bound}"}} {cumulative}')
+        cumulative += counts[-1]
+        lines.append(f'{name}_bucket{{view="{label}",le="+Inf"}} {cumulative}')
+        lines.append(f'{name}_sum{{view="{label}"}} {total!r}')
+        lines.append(f'{name}_count{{view="{label}"}} {cumulative}')
+
+
+registry = Registry()
+
+
+class QueryTimer:
+    """Число запросов и время SQL одного HTTP-запроса, в том числе из потоков gather_queries."""
+    __slots__ = ('count', 'seconds', '_lock')
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            with self._lock:
+                self.seconds += elapsed
+                self.count += 1
+
+
+# Таймер текущего HTTP-запроса. sync_to_async копирует контекст в рабочий
+# поток, поэтому запросы из чужих потоков попадают в тот же таймер
+current_timer = ContextVar('query_timer', default=None)
+
+
+def timed_execute(execute, sql, params, many, context):
+    """execute_wrapper, который стоит на каждом соединении; вне запроса ничего не считает."""
+    timer = current_timer.get()
+    if timer is None:
+        return execute(sql, params, many, context)
+    return timer(execute, sql, params, many, context)
+
+
+def install(connection):
+    if timed_execute not in connection.execute_wrappers:
+        connection.execute_wrappers.append(timed_execute)
+
+
+def _connection_created(sender, connection, **kwargs):
+    # Соединения рабочих потоков открываются уже внутри запроса
+    install(connection)
+
+
+connection_created.connect(_connection_created, dispatch_uid='main.metrics.install')
+
+
+class MetricsMiddleware:
+    """
+    Время ответа, число и время SQL-запросов по имени маршрута.
+    Ставится первым в MIDDLEWARE: 'main.metrics.MetricsMiddleware'.
+    Для потоковых ответов время считается до отдачи первого байта.
+    Время SQL из параллельных потоков складывается и может превышать время ответа.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # Соединения, открытые до подключения сигнала
+        for connection in connections.all():
+            install(connection)
+        timer = QueryTimer()
+        token = current_timer.set(timer)
+        started = time.perf_counter()
+        try:
+            return self.get_response(request)
+        finally:
+            elapsed = time.perf_counter() - started
+            current_timer.reset(token)
+            match = getattr(request, 'resolver_match', None)
+            registry.record(match.view_name if match else UNRESOLVED, elapsed, timer.count, timer.seconds)
@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:40
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0007_daily_summary'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ExchangeRate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('base', models.CharField(choices=[('UZS', 'UZS'), ('USD', 'USD')], max_length=3, verbose_name='Валюта')),
+                ('quote', models.CharField(choices=[('UZS', 'UZS'), ('USD', 'USD')], max_length=3, verbose_name='Котируемая валюта')),
+                ('rate', models.DecimalField(decimal_places=6, max_digits=18, verbose_name='Курс')),
+                ('effective_from', models.DateField(verbose_name='Действует с')),
+            ],
+            options={
+                'verbose_name': 'Курс валюты',
+                'verbose_name_plural': 'Курсы валют',
+                'constraints': [models.UniqueConstraint(fields=('base', 'quote', 'effective_from'), name='exchange_rate_unique_day')],
+            },
+        ),
+    ]
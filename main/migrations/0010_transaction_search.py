@@ -0,0 +1,146 @@
+# Generated by Django 6.0.1 on 2026-10-18 12:00
+
+from django.db import migrations
+
+
+# SQLite: отдельная FTS5-таблица, rowid = id транзакции. Колонка owner хранит
+# токен «u<user_id>», чтобы отбор по пользователю шёл внутри индекса.
+SQLITE_FORWARD = [
+    """
+    CREATE VIRTUAL TABLE main_transaction_fts USING fts5(
+        owner, description, category,
+        tokenize = 'unicode61 remove_diacritics 2',
+        prefix = '2 3'
+    )
+    """,
+    """
+    CREATE TRIGGER main_transaction_fts_insert AFTER INSERT ON main_transaction BEGIN
+        INSERT INTO main_transaction_fts(rowid, owner, description, category)
+        VALUES (
+            new.id, 'u' || new.user_id, new.description,
+            coalesce((SELECT name FROM main_category WHERE id = new.category_id), '')
+        );
+    END
+    """,
+    """
+    CREATE TRIGGER main_transaction_fts_update
+    AFTER UPDATE OF user_id, description, category_id ON main_transaction BEGIN
+        UPDATE main_transaction_fts SET
+            owner = 'u' || new.user_id,
+            description = new.description,
+            category = coalesce((SELECT name FROM main_category WHERE id = new.category_id), '')
+        WHERE rowid = new.id;
+    END
+    """,
+    """
+    CREATE TRIGGER main_transaction_fts_delete AFTER DELETE ON main_transaction BEGIN
+        DELETE FROM main_transaction_fts WHERE rowid = old.id;
+    END
+    """,
+    """
+    CREATE TRIGGER main_category_fts_rename AFTER UPDATE OF name ON main_category BEGIN
+        UPDATE main_transaction_fts SET category = new.name
+        WHERE rowid IN (SELECT id FROM main_transaction WHERE category_id = new.id);
+    END
+    """,
+    """
+    INSERT INTO main_transaction_fts(rowid, owner, description, category)
+    SELECT t.id, 'u' || t.user_id, t.description, coalesce(c.name, '')
+    FROM main_transaction t
+    LEFT JOIN main_category c ON c.id = t.category_id
+    """,
+]
+
+SQLITE_BACKWARD = [
+    'DROP TRIGGER IF EXISTS main_category_fts_rename',
+    'DROP TRIGGER IF EXISTS main_transaction_fts_delete',
+    'DROP TRIGGER IF EXISTS main_transaction_fts_update',
+    'DROP TRIGGER IF EXISTS main_transaction_fts_insert',
+    'DROP TABLE IF EXISTS main_transaction_fts',
+]
+
+# PostgreSQL: колонка tsvector (описание — вес A, категория — вес B), которую
+# ведёт триггер, и GIN-индекс по ней. Конфигурация simple: тексты на разных языках.
+POSTGRESQL_FORWARD = [
+    'ALTER TABLE main_transaction ADD COLUMN search_vector tsvector',
+    """
+    CREATE FUNCTION main_transaction_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(
+                (SELECT name FROM main_category WHERE id = NEW.category_id), ''
+            )), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER main_transaction_search_vector
+    BEFORE INSERT OR UPDATE OF description, category_id ON main_transaction
+    FOR EACH ROW EXECUTE FUNCTION main_transaction_search_vector()
+    """,
+    """
+    CREATE FUNCTION main_category_search_vector() RETURNS trigger AS $$
+    BEGIN
+        -- Пересчёт через триггер транзакций
+        UPDATE main_transaction SET category_id = category_id WHERE category_id = NEW.id;
+        RETURN NULL;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER main_category_search_vector
+    AFTER UPDATE OF name ON main_category
+    FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+    EXECUTE FUNCTION main_category_search_vector()
+    """,
+    """
+    UPDATE main_transaction t SET search_vector =
+        setweight(to_tsvector('simple', coalesce(t.description, '')), 'A') ||
+        setweight(to_tsvector('simple', coalesce(
+            (SELECT name FROM main_category c WHERE c.id = t.category_id), ''
+        )), 'B')
+    """,
+    'CREATE INDEX main_transaction_search_idx ON main_transaction USING GIN (search_vector)',
+]
+
+POSTGRESQL_BACKWARD = [
+    'DROP TRIGGER IF EXISTS main_category_search_vector ON main_category',
+    'DROP FUNCTION IF EXISTS main_category_search_vector()',
+    'DROP TRIGGER IF EXISTS main_transaction_search_vector ON main_transaction',
+    'DROP FUNCTION IF EXISTS main_transaction_search_vector()',
+    'ALTER TABLE main_transaction DROP COLUMN IF EXISTS search_vector',
+]
+
+STATEMENTS = {
+    'sqlite': (SQLITE_FORWARD, SQLITE_BACKWARD),
+    'postgresql': (POSTGRESQL_FORWARD, POSTGRESQL_BACKWARD),
+}
+
+
+def _run(schema_editor, index):
+    statements = STATEMENTS.get(schema_editor.connection.vendor)
+    if statements is None:
+        return
+    for sql in statements[index]:
+        schema_editor.execute(sql)
+
+
+def forward(apps, schema_editor):
+    _run(schema_editor, 0)
+
+
+def backward(apps, schema_editor):
+    _run(schema_editor, 1)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0009_wallet_checkpoint'),
+    ]
+
+    operations = [
+        migrations.RunPython(forward, backward),
+    ]
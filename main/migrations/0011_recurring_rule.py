@@ -0,0 +1,74 @@
+# Generated by Django 6.0.1 on 2026-10-18 14:00
+
+import importlib
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+search = importlib.import_module('main.migrations.0010_transaction_search')
+
+# На SQLite откат (удаление колонки) пересоздаёт main_transaction: триггеры
+# текстового индекса пропали бы вместе со старой таблицей, а триггер на
+# main_category не даёт переименовать новую. На время отката они снимаются.
+SEARCH_TRIGGERS = search.SQLITE_FORWARD[1:5]
+DROP_SEARCH_TRIGGERS = search.SQLITE_BACKWARD[:4]
+
+
+def _sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for sql in statements:
+                schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0010_transaction_search'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, _sqlite(SEARCH_TRIGGERS)),
+        migrations.CreateModel(
+            name='RecurringRule',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type', models.CharField(choices=[('income', 'Доход'), ('outcome', 'Расход')], max_length=10, verbose_name='Тип операции')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='Сумма')),
+                ('description', models.TextField(blank=True, verbose_name='Описание')),
+                ('freq', models.CharField(choices=[('daily', 'Ежедневно'), ('weekly', 'Еженедельно'), ('monthly', 'Ежемесячно'), ('yearly', 'Ежегодно')], max_length=10, verbose_name='Периодичность')),
+                ('interval', models.PositiveSmallIntegerField(default=1, verbose_name='Интервал')),
+                ('starts_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Первое повторение')),
+                ('until', models.DateTimeField(blank=True, null=True, verbose_name='Последнее повторение не позже')),
+                ('is_active', models.BooleanField(default=True, verbose_name='Активно')),
+                ('occurrence_count', models.PositiveIntegerField(default=0, editable=False)),
+                ('next_run', models.DateTimeField(blank=True, editable=False, null=True)),
+                ('category', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to='main.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_rules', to=settings.AUTH_USER_MODEL)),
+                ('wallet', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='recurring_rules', to='main.wallet')),
+            ],
+            options={
+                'verbose_name': 'Регулярная операция',
+                'verbose_name_plural': 'Регулярные операции',
+            },
+        ),
+        migrations.AddField(
+            model_name='transaction',
+            name='recurring_rule',
+            field=models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='transactions', to='main.recurringrule'),
+        ),
+        migrations.AddConstraint(
+            model_name='transaction',
+            constraint=models.UniqueConstraint(condition=models.Q(('recurring_rule__isnull', False)), fields=('recurring_rule', 'created_at'), name='tx_recurring_unique_occurrence'),
+        ),
+        migrations.AddIndex(
+            model_name='recurringrule',
+            index=models.Index(fields=['is_active', 'next_run'], name='recurring_due_idx'),
+        ),
+        migrations.RunPython(migrations.RunPython.noop, _sqlite(DROP_SEARCH_TRIGGERS)),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.1 on 2026-10-18 15:00
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0011_recurring_rule'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Budget',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('limit', models.DecimalField(decimal_places=2, max_digits=15, verbose_name='Лимит в месяц')),
+                ('currency', models.CharField(choices=[('UZS', 'UZS'), ('USD', 'USD')], default='UZS', max_length=3, verbose_name='Валюта')),
+                ('category', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='budget', to='main.category')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='budgets', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Бюджет',
+                'verbose_name_plural': 'Бюджеты',
+            },
+        ),
+        migrations.CreateModel(
+            name='BudgetNotification',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('threshold', models.PositiveSmallIntegerField()),
+                ('spent', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('limit', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='notifications', to='main.budget')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['sent_at', 'created_at'], name='budget_notification_queue_idx')],
+                'constraints': [models.UniqueConstraint(fields=('budget', 'month', 'threshold'), name='budget_notification_unique')],
+            },
+        ),
+        migrations.CreateModel(
+            name='BudgetSpending',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.DateField()),
+                ('spent', models.DecimalField(decimal_places=2, default=0, max_digits=15)),
+                ('budget', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='spendings', to='main.budget')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('budget', 'month'), name='budget_spending_unique_month')],
+            },
+        ),
+    ]
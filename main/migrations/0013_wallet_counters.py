@@ -0,0 +1,64 @@
+# Generated by Django 6.0.1 on 2026-10-18 16:00
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Q, Sum
+
+
+def fill_counters(apps, schema_editor):
+    """Начальные значения счётчиков — одним сгруппированным запросом по операциям."""
+    Wallet = apps.get_model('main', 'Wallet')
+    Transaction = apps.get_model('main', 'Transaction')
+    rows = (
+        Transaction.objects
+        .values('wallet_id')
+        .annotate(
+            income=Sum('amount', filter=Q(type='income')),
+            outcome=Sum('amount', filter=Q(type='outcome')),
+            count=Count('id'),
+            last=Max('created_at'),
+        )
+        .order_by()
+    )
+    wallets = []
+    for row in rows.iterator():
+        wallets.append(Wallet(
+            pk=row['wallet_id'],
+            total_income=row['income'] or 0,
+            total_outcome=row['outcome'] or 0,
+            tx_count=row['count'],
+            last_tx_at=row['last'],
+        ))
+    Wallet.objects.bulk_update(
+        wallets, ['total_income', 'total_outcome', 'tx_count', 'last_tx_at'], batch_size=500,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0012_budget'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wallet',
+            name='last_tx_at',
+            field=models.DateTimeField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='total_income',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=18),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='total_outcome',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=18),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='tx_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 6.0.1 on 2026-10-18 17:00
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+def open_balances(apps, schema_editor):
+    """Текущий баланс каждого кошелька — начальный остаток журнала, уже свёрнутый."""
+    Wallet = apps.get_model('main', 'Wallet')
+    LedgerEntry = apps.get_model('main', 'LedgerEntry')
+    LedgerEntry.objects.bulk_create(
+        (
+            LedgerEntry(wallet_id=pk, amount=balance, kind='opening', batch=0)
+            for pk, balance in Wallet.objects.exclude(balance=0).values_list('pk', 'balance').iterator()
+        ),
+        batch_size=2000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0013_wallet_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='transfer',
+            name='credited',
+            field=models.DecimalField(decimal_places=2, default=0, editable=False, max_digits=15),
+        ),
+        migrations.AddField(
+            model_name='wallet',
+            name='ledger_batch',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='LedgerEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('amount', models.DecimalField(decimal_places=2, max_digits=15)),
+                ('kind', models.CharField(choices=[('income', 'Доход'), ('outcome', 'Расход'), ('transfer', 'Перевод'), ('opening', 'Начальный остаток')], max_length=10)),
+                ('tx_delta', models.SmallIntegerField(default=0)),
+                ('occurred_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('batch', models.PositiveIntegerField(blank=True, editable=False, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('transaction', models.ForeignKey(blank=True, db_constraint=False, db_index=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='+', to='main.transaction')),
+                ('transfer', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='main.transfer')),
+                ('wallet', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='ledger_entries', to='main.wallet')),
+            ],
+            options={
+                'verbose_name': 'Запись журнала',
+                'verbose_name_plural': 'Журнал',
+                'indexes': [models.Index(condition=models.Q(('batch__isnull', True)), fields=['wallet', 'id'], name='ledger_tail_idx'), models.Index(fields=['wallet', 'batch'], name='ledger_wallet_batch_idx')],
+            },
+        ),
+        migrations.RunPython(open_balances, migrations.RunPython.noop),
+    ]
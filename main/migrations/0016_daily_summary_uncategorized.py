@@ -0,0 +1,41 @@
+# Generated by Django 6.0.1 on 2026-10-18 19:00
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Min, Sum
+
+
+def merge_uncategorized(apps, schema_editor):
+    """Задвоенные корзины без категории сливаются в одну строку перед созданием индекса."""
+    DailySummary = apps.get_model('main', 'DailySummary')
+    duplicates = (
+        DailySummary.objects
+        .filter(category__isnull=True)
+        .values('user_id', 'day', 'type', 'currency')
+        .annotate(rows=Count('id'), keep=Min('id'), total_sum=Sum('total'), count_sum=Sum('count'))
+        .filter(rows__gt=1)
+        .order_by()
+    )
+    for bucket in duplicates.iterator():
+        rows = DailySummary.objects.filter(
+            category__isnull=True, user_id=bucket['user_id'], day=bucket['day'],
+            type=bucket['type'], currency=bucket['currency'],
+        )
+        rows.exclude(pk=bucket['keep']).delete()
+        rows.update(total=bucket['total_sum'], count=bucket['count_sum'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0015_transaction_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_uncategorized, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='dailysummary',
+            constraint=models.UniqueConstraint(condition=models.Q(('category__isnull', True)), fields=('user', 'day', 'type', 'currency'), name='daily_summary_unique_uncategorized'),
+        ),
+    ]
@@ -0,0 +1,113 @@
+# Generated by Django 6.0.1 on 2026-10-18 20:00
+
+from collections import defaultdict
+from decimal import Decimal
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Max
+from django.utils import timezone
+
+
+DEFAULT_RATES = getattr(settings, 'DEFAULT_EXCHANGE_RATES', {('USD', 'UZS'): Decimal('12000')})
+
+
+def _rate(ExchangeRate, base, quote, day):
+    """Курс в порядке rates.get_rate: прямая пара (история, умолчание), затем обратная."""
+    for pair, inverse in (((base, quote), False), ((quote, base), True)):
+        rate = (
+            ExchangeRate.objects
+            .filter(base=pair[0], quote=pair[1], effective_from__lte=day)
+            .order_by('-effective_from')
+            .values_list('rate', flat=True)
+            .first()
+        )
+        if rate is None:
+            rate = DEFAULT_RATES.get(pair)
+        if rate is not None:
+            return Decimal('1') / rate if inverse else rate
+    return None
+
+
+def backfill(apps, schema_editor):
+    """
+    Журнал начат в 0014 с остатков на момент миграции: операций и переводов
+    до него в журнале нет, и история баланса по журналу была бы пустой.
+    Они дописываются уже свёрнутыми (batch=0), а начальный остаток уменьшается
+    на их сумму и переносится на момент первой из них — баланс не меняется.
+    """
+    LedgerEntry = apps.get_model('main', 'LedgerEntry')
+    Transfer = apps.get_model('main', 'Transfer')
+    ExchangeRate = apps.get_model('main', 'ExchangeRate')
+
+    # Дописанные здесь записи не должны попасть в выборку уже учтённых
+    last = LedgerEntry.objects.aggregate(last=Max('pk'))['last'] or 0
+    known = LedgerEntry.objects.filter(pk__lte=last)
+    moved = defaultdict(Decimal)
+    earliest = {}
+    entries = []
+
+    def add(wallet_id, amount, occurred_at, **fields):
+        entries.append(LedgerEntry(wallet_id=wallet_id, amount=amount, occurred_at=occurred_at, batch=0, **fields))
+        moved[wallet_id] += amount
+        if wallet_id not in earliest or occurred_at < earliest[wallet_id]:
+            earliest[wallet_id] = occurred_at
+        if len(entries) >= 2000:
+            LedgerEntry.objects.bulk_create(entries)
+            entries.clear()
+
+    tracked = known.filter(tx_delta__gt=0, transaction_id__isnull=False).values('transaction_id')
+    for name in ('Transaction', 'ArchivedTransaction'):
+        rows = (
+            apps.get_model('main', name).objects
+            .exclude(pk__in=tracked)
+            .values_list('pk', 'wallet_id', 'type', 'amount', 'created_at')
+        )
+        for pk, wallet_id, type, amount, created_at in rows.iterator(chunk_size=2000):
+            signed = amount if type == 'income' else -amount
+            add(wallet_id, signed, created_at, kind=type, tx_delta=1, transaction_id=pk)
+
+    posted = known.filter(transfer_id__isnull=False).values('transfer_id')
+    transfers = (
+        Transfer.objects
+        .exclude(pk__in=posted)
+        .values_list('pk', 'from_wallet_id', 'from_wallet__currency', 'to_wallet_id', 'to_wallet__currency',
+                     'amount', 'credited', 'created_at')
+    )
+    for pk, source, source_currency, target, target_currency, amount, credited, created_at in transfers.iterator():
+        add(source, -amount, created_at, kind='transfer', transfer_id=pk)
+        if not credited:
+            rate = Decimal('1') if source_currency == target_currency else _rate(
+                ExchangeRate, source_currency, target_currency, timezone.localdate(created_at),
+            )
+            # Курса нет — зачисление остаётся в начальном остатке
+            if rate is None:
+                continue
+            credited = (amount * rate).quantize(Decimal('0.01'))
+        add(target, credited, created_at, kind='transfer', transfer_id=pk)
+    LedgerEntry.objects.bulk_create(entries)
+
+    for wallet_id, first in earliest.items():
+        opening = known.filter(wallet_id=wallet_id, kind='opening').order_by('pk').first()
+        if opening is None:
+            if not moved[wallet_id]:
+                continue
+            opening = LedgerEntry(wallet_id=wallet_id, amount=0, kind='opening', batch=0)
+        opening.amount -= moved[wallet_id]
+        opening.occurred_at = min(first, opening.occurred_at) if opening.pk else first
+        opening.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0016_daily_summary_uncategorized'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ledgerentry',
+            index=models.Index(fields=['wallet', 'occurred_at'], name='ledger_wallet_occurred_idx'),
+        ),
+        migrations.RunPython(backfill, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 6.0.1 on 2026-10-18 22:00
+
+import importlib
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+search = importlib.import_module('main.migrations.0010_transaction_search')
+
+# На SQLite смена индекса пересоздаёт main_transaction (как в 0011):
+# триггеры текстового индекса снимаются до и ставятся обратно после — в обе стороны
+SEARCH_TRIGGERS = search.SQLITE_FORWARD[1:5]
+DROP_SEARCH_TRIGGERS = search.SQLITE_BACKWARD[:4]
+
+
+def _sqlite(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'sqlite':
+            for sql in statements:
+                schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('main', '0018_ledger_transfer_no_cascade'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(_sqlite(DROP_SEARCH_TRIGGERS), _sqlite(SEARCH_TRIGGERS)),
+        migrations.AlterField(
+            model_name='archivedtransaction',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='archivedtransaction',
+            name='wallet',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='archived_transactions', to='main.wallet'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='user',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL, verbose_name='Пользователь'),
+        ),
+        migrations.AlterField(
+            model_name='transaction',
+            name='wallet',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='transactions', to='main.wallet', verbose_name='Кошелек'),
+        ),
+        migrations.RunPython(_sqlite(SEARCH_TRIGGERS), _sqlite(DROP_SEARCH_TRIGGERS)),
+    ]
@@ -1,7 +1,9 @@
 from django.conf import settings
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 from users.models import CustomUser
+from .managers import TransactionManager, WalletManager
 class Wallet(models.Model):
     name = models.CharField(
         max_length=100,
@@ -50,8 +52,19 @@ class Wallet(models.Model):
 
     name = models.CharField(_("Название кошелька"), max_length=100)
     type = models.CharField(_("Тип"), max_length=20, choices=TYPE_CHOICES)
+    # Свёрнутый баланс: записи журнала LedgerEntry прибавляются к нему пачками
+    # (ledger.compact), текущий баланс — with_live_balance() или ledger.balance()
     balance = models.DecimalField(_("Баланс"), max_digits=15, decimal_places=2, default=0)
     currency = models.CharField(_("Валюта"), max_length=3, choices=CURRENCY_CHOICES)
+    # Счётчики по операциям кошелька; сворачиваются из журнала вместе с балансом (ledger.compact)
+    total_income = models.DecimalField(max_digits=18, decimal_places=2, default=0, editable=False)
+    total_outcome = models.DecimalField(max_digits=18, decimal_places=2, default=0, editable=False)
+    tx_count = models.PositiveIntegerField(default=0, editable=False)
+    last_tx_at = models.DateTimeField(null=True, blank=True, editable=False)
+    # Номер последней свёртки журнала кошелька
+    ledger_batch = models.PositiveIntegerField(default=0, editable=False)
+
+    objects = WalletManager()
 
     class Meta:
         verbose_name = _("Кошелек")
@@ -60,6 +73,16 @@ class Wallet(models.Model):
     def __str__(self):
         return f"{self.name} ({self.currency})"
 
+    def balance_at(self, when):
+        """Баланс на момент when: ближайшая контрольная точка плюс движения по журналу после неё."""
+        from .checkpoints import balance_at
+        return balance_at(self, when)
+
+    def balance_series(self, days):
+        """Балансы на конец каждого из дней days (по возрастанию)."""
+        from .checkpoints import balance_series
+        return balance_series(self, days)
+
 
 class Transaction(models.Model):
     TYPE_CHOICES = (
@@ -67,16 +90,19 @@ class Transaction(models.Model):
         ("outcome", _("Расход")),
     )
 
+    # Отдельных индексов по user и wallet нет: они первые колонки индексов из Meta
     user = models.ForeignKey(
         CustomUser,
         on_delete=models.CASCADE,
-        verbose_name=_("Пользователь")
+        verbose_name=_("Пользователь"),
+        db_index=False,
     )
     wallet = models.ForeignKey(
         Wallet,
         on_delete=models.CASCADE,
         related_name='transactions',
-        verbose_name=_("Кошелек")
+        verbose_name=_("Кошелек"),
+        db_index=False,
     )
     category = models.ForeignKey(
         Category,
@@ -87,11 +113,74 @@ class Transaction(models.Model):
     type = models.CharField(_("Тип операции"), max_length=10, choices=TYPE_CHOICES)
     amount = models.DecimalField(_("Сумма"), max_digits=15, decimal_places=2)
     description = models.TextField(_("Описание"), blank=True)
-    created_at = models.DateTimeField(_("Дата создания"), auto_now_add=True)
+    created_at = models.DateTimeField(_("Дата создания"), default=timezone.now)
+    # Операция, проведённая по регулярному правилу: created_at — момент повторения
+    recurring_rule = models.ForeignKey(
+        'RecurringRule',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='transactions',
+        # Индекс по правилу — первая колонка tx_recurring_unique_occurrence
+        db_index=False,
+    )
+
+    objects = TransactionManager()
 
     class Meta:
         verbose_name = _("Транзакция")
         verbose_name_plural = _("Транзакции")
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='tx_user_created_idx'),
+            models.Index(fields=['user', 'type', 'created_at'], name='tx_user_type_created_idx'),
+            models.Index(fields=['wallet', 'created_at'], name='tx_wallet_created_idx'),
+        ]
+        constraints = [
+            # Повтор правила проводится не больше одного раза, даже при повторном запуске
+            models.UniqueConstraint(
+                fields=['recurring_rule', 'created_at'],
+                condition=models.Q(recurring_rule__isnull=False),
+                name='tx_recurring_unique_occurrence',
+            ),
+        ]
+    def __str__(self):
+        return f'{self.wallet}{self.user}'
+
+
+class ArchivedTransaction(models.Model):
+    """
+    Операция старше горизонта архивации (main/archive.py): строка перенесена
+    из Transaction с тем же id. Архив только читается; суммы по нему остаются
+    в DailySummary, счётчиках кошельков и журнале.
+    """
+    is_archived = True
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='+', db_index=False)
+    wallet = models.ForeignKey(
+        Wallet, on_delete=models.CASCADE, related_name='archived_transactions', db_index=False,
+    )
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, related_name='+')
+    type = models.CharField(_("Тип операции"), max_length=10, choices=Transaction.TYPE_CHOICES)
+    amount = models.DecimalField(_("Сумма"), max_digits=15, decimal_places=2)
+    description = models.TextField(_("Описание"), blank=True)
+    created_at = models.DateTimeField(_("Дата создания"))
+    recurring_rule = models.ForeignKey(
+        'RecurringRule', on_delete=models.SET_NULL, null=True, blank=True, related_name='+', db_index=False,
+    )
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = TransactionManager()
+
+    class Meta:
+        verbose_name = _("Архивная транзакция")
+        verbose_name_plural = _("Архив транзакций")
+        # Те же ведущие колонки, что у Transaction: выборки идут через TransactionQuerySet
+        indexes = [
+            models.Index(fields=['user', 'created_at'], name='archived_tx_user_created_idx'),
+            models.Index(fields=['user', 'type', 'created_at'], name='archived_tx_user_type_idx'),
+            models.Index(fields=['wallet', 'created_at'], name='archived_tx_wallet_idx'),
+        ]
+
     def __str__(self):
         return f'{self.wallet}{self.user}'
 
@@ -101,12 +190,221 @@ class Transfer(models.Model):
     from_wallet = models.ForeignKey(Wallet,on_delete=models.CASCADE,related_name='outgoing_transfers')
     to_wallet = models.ForeignKey(Wallet,on_delete=models.CASCADE,related_name='incoming_transfers')
     amount = models.DecimalField(max_digits=15,decimal_places=2)
+    # Зачислено в валюте to_wallet по курсу на момент перевода
+    credited = models.DecimalField(max_digits=15,decimal_places=2,default=0,editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
 
     def __str__(self):
         return  f'{self.user}{self.from_wallet}{self.to_wallet}'
 
 
+class LedgerEntry(models.Model):
+    """
+    Неизменяемая запись журнала движения денег по кошельку: операция даёт одну
+    запись, её удаление — встречную, перевод — списание и зачисление.
+    Записи не обновляются, кроме пометки batch при свёртке в Wallet.balance.
+    """
+    KIND_CHOICES = (
+        ('income', _('Доход')),
+        ('outcome', _('Расход')),
+        ('transfer', _('Перевод')),
+        ('opening', _('Начальный остаток')),
+    )
+    # batch у начального остатка: сумма уже лежит в Wallet.balance
+    OPENING_BATCH = 0
+
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='ledger_entries', db_index=False)
+    amount = models.DecimalField(max_digits=15, decimal_places=2)
+    kind = models.CharField(max_length=10, choices=KIND_CHOICES)
+    # +1 — проведена операция, -1 — удалена, 0 — перевод и начальный остаток
+    tx_delta = models.SmallIntegerField(default=0)
+    occurred_at = models.DateTimeField(default=timezone.now)
+    # Ссылка без внешнего ключа: запись переживает удаление операции
+    transaction = models.ForeignKey(
+        Transaction, on_delete=models.DO_NOTHING, db_constraint=False, db_index=False,
+        null=True, blank=True, related_name='+',
+    )
+    # Тоже без внешнего ключа: удаление кошелька уносит перевод, но не записи второго кошелька
+    transfer = models.ForeignKey(
+        Transfer, on_delete=models.DO_NOTHING, db_constraint=False,
+        null=True, blank=True, related_name='entries',
+    )
+    # Номер свёртки кошелька; NULL — запись ещё не учтена в Wallet.balance
+    batch = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name = _('Запись журнала')
+        verbose_name_plural = _('Журнал')
+        indexes = [
+            # Хвост для текущего баланса и свёртки
+            models.Index(
+                fields=['wallet', 'id'], name='ledger_tail_idx', condition=models.Q(batch__isnull=True),
+            ),
+            models.Index(fields=['wallet', 'batch'], name='ledger_wallet_batch_idx'),
+            # История баланса: точки и ряды по дням (main/checkpoints.py)
+            models.Index(fields=['wallet', 'occurred_at'], name='ledger_wallet_occurred_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.wallet} {self.amount} ({self.kind})'
+
+
+class ExchangeRate(models.Model):
+    base = models.CharField(_("Валюта"), max_length=3, choices=Wallet.CURRENCY_CHOICES)
+    quote = models.CharField(_("Котируемая валюта"), max_length=3, choices=Wallet.CURRENCY_CHOICES)
+    rate = models.DecimalField(_("Курс"), max_digits=18, decimal_places=6)
+    effective_from = models.DateField(_("Действует с"))
+
+    class Meta:
+        verbose_name = _("Курс валюты")
+        verbose_name_plural = _("Курсы валют")
+        constraints = [
+            models.UniqueConstraint(
+                fields=['base', 'quote', 'effective_from'],
+                name='exchange_rate_unique_day',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.base}/{self.quote} {self.rate} ({self.effective_from})'
+
+
+class DailySummary(models.Model):
+    TYPE_CHOICES = Transaction.TYPE_CHOICES
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='daily_summaries')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True)
+    type = models.CharField(max_length=10, choices=TYPE_CHOICES)
+    currency = models.CharField(max_length=3, choices=Wallet.CURRENCY_CHOICES)
+    day = models.DateField()
+    total = models.DecimalField(max_digits=18, decimal_places=2, default=0)
+    count = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'day', 'type', 'category', 'currency'],
+                name='daily_summary_unique_bucket',
+            ),
+            # NULL в уникальном индексе не равен NULL: корзины без категории
+            # держит отдельный частичный индекс (nulls_distinct есть не во всех СУБД)
+            models.UniqueConstraint(
+                fields=['user', 'day', 'type', 'currency'],
+                condition=models.Q(category__isnull=True),
+                name='daily_summary_unique_uncategorized',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.user}{self.day}{self.type}'
+
+
+class WalletCheckpoint(models.Model):
+    """Баланс кошелька с учётом всех операций строго до момента at."""
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='checkpoints')
+    at = models.DateTimeField()
+    balance = models.DecimalField(max_digits=15, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['wallet', 'at'], name='wallet_checkpoint_unique_at'),
+        ]
+
+    def __str__(self):
+        return f'{self.wallet}{self.at}'
+
+
+class RecurringRule(models.Model):
+    """
+    Регулярная операция в духе RRULE: FREQ, INTERVAL, DTSTART, UNTIL.
+    Повторы проводит команда run_recurring (main/recurring.py).
+    """
+    FREQ_CHOICES = (
+        ('daily', _('Ежедневно')),
+        ('weekly', _('Еженедельно')),
+        ('monthly', _('Ежемесячно')),
+        ('yearly', _('Ежегодно')),
+    )
+
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='recurring_rules')
+    wallet = models.ForeignKey(Wallet, on_delete=models.CASCADE, related_name='recurring_rules')
+    category = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
+    type = models.CharField(_("Тип операции"), max_length=10, choices=Transaction.TYPE_CHOICES)
+    amount = models.DecimalField(_("Сумма"), max_digits=15, decimal_places=2)
+    description = models.TextField(_("Описание"), blank=True)
+    freq = models.CharField(_("Периодичность"), max_length=10, choices=FREQ_CHOICES)
+    interval = models.PositiveSmallIntegerField(_("Интервал"), default=1)
+    starts_at = models.DateTimeField(_("Первое повторение"), default=timezone.now)
+    until = models.DateTimeField(_("Последнее повторение не позже"), null=True, blank=True)
+    is_active = models.BooleanField(_("Активно"), default=True)
+    # Сколько повторений уже проведено и когда следующее; NULL — правило исчерпано
+    occurrence_count = models.PositiveIntegerField(default=0, editable=False)
+    next_run = models.DateTimeField(null=True, blank=True, editable=False)
 
+    class Meta:
+        verbose_name = _("Регулярная операция")
+        verbose_name_plural = _("Регулярные операции")
+        indexes = [
+            models.Index(fields=['is_active', 'next_run'], name='recurring_due_idx'),
+        ]
 
+    def save(self, *args, **kwargs):
+        if self._state.adding and self.next_run is None:
+            self.next_run = self.starts_at
+        super().save(*args, **kwargs)
 
+    def __str__(self):
+        return f'{self.wallet} {self.amount} {self.freq}'
+
+
+class Budget(models.Model):
+    """Месячный лимит расходов по категории. Потрачено — счётчик в BudgetSpending."""
+    user = models.ForeignKey(CustomUser, on_delete=models.CASCADE, related_name='budgets')
+    category = models.OneToOneField(Category, on_delete=models.CASCADE, related_name='budget')
+    limit = models.DecimalField(_("Лимит в месяц"), max_digits=15, decimal_places=2)
+    currency = models.CharField(_("Валюта"), max_length=3, choices=Wallet.CURRENCY_CHOICES, default='UZS')
+
+    class Meta:
+        verbose_name = _("Бюджет")
+        verbose_name_plural = _("Бюджеты")
+
+    def __str__(self):
+        return f'{self.category} {self.limit} {self.currency}'
+
+
+class BudgetSpending(models.Model):
+    """Потрачено по бюджету за месяц в его валюте; ведётся при записи операций (main/budgets.py)."""
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='spendings')
+    month = models.DateField()
+    spent = models.DecimalField(max_digits=15, decimal_places=2, default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['budget', 'month'], name='budget_spending_unique_month'),
+        ]
+
+    def __str__(self):
+        return f'{self.budget} {self.month} {self.spent}'
+
+
+class BudgetNotification(models.Model):
+    """Очередь уведомлений: бюджет перешёл порог в этом месяце. sent_at — когда отправлено."""
+    budget = models.ForeignKey(Budget, on_delete=models.CASCADE, related_name='notifications')
+    month = models.DateField()
+    threshold = models.PositiveSmallIntegerField()
+    spent = models.DecimalField(max_digits=15, decimal_places=2)
+    limit = models.DecimalField(max_digits=15, decimal_places=2)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['budget', 'month', 'threshold'], name='budget_notification_unique'),
+        ]
+        indexes = [
+            models.Index(fields=['sent_at', 'created_at'], name='budget_notification_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f'{self.budget} {self.month} {self.threshold}%'
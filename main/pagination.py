@@ -0,0 +1,114 @@
+import base64
+import binascii
+from datetime import datetime
+
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(obj, direction):
+    raw = f'{direction}|{obj.created_at.isoformat()}|{obj.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        direction, created_at, pk = raw.split('|')
+        if direction not in ('n', 'p'):
+            raise ValueError(direction)
+        return direction, datetime.fromisoformat(created_at), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor(token) from exc
+
+
+class CursorPage:
+    def __init__(self, object_list, next_cursor, previous_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def has_other_pages(self):
+        return self.has_next() or self.has_previous()
+
+
+class CursorPaginator:
+    """
+    Постраничный вывод по ключу (created_at, id) вместо OFFSET: каждая
+    страница — поиск по индексу (..., created_at) от последней увиденной
+    строки и LIMIT per_page + 1, без COUNT(*). Стоимость страницы не зависит
+    от её номера.
+
+    archived — та же выборка по архиву, где все строки раньше horizon: она
+    читается, только если страница до неё доходит, и сливается с основной
+    по тому же ключу.
+    """
+
+    def __init__(self, queryset, per_page, archived=None, horizon=None):
+        self.queryset = queryset
+        self.per_page = per_page
+        self.archived = archived
+        self.horizon = horizon
+
+    def _rows(self, queryset, direction, after):
+        if after is not None:
+            created_at, pk = after
+            if direction == 'n':
+                queryset = queryset.filter(
+                    Q(created_at__lt=created_at) | Q(created_at=created_at, pk__lt=pk)
+                )
+            else:
+                queryset = queryset.filter(
+                    Q(created_at__gt=created_at) | Q(created_at=created_at, pk__gt=pk)
+                )
+        order = ('-created_at', '-pk') if direction == 'n' else ('created_at', 'pk')
+        return list(queryset.order_by(*order)[:self.per_page + 1])
+
+    def _needs_archive(self, rows, direction, after):
+        if self.archived is None:
+            return False
+        if direction == 'n':
+            # Архив целиком старше horizon: страница, добранная из свежих строк, его не касается
+            return len(rows) <= self.per_page or rows[-1].created_at < self.horizon
+        return after[0] < self.horizon
+
+    def page(self, token=None):
+        direction, after = 'n', None
+        if token:
+            direction, created_at, pk = decode_cursor(token)
+            after = (created_at, pk)
+
+        rows = self._rows(self.queryset, direction, after)
+        if self._needs_archive(rows, direction, after):
+            rows = sorted(
+                rows + self._rows(self.archived, direction, after),
+                key=lambda row: (row.created_at, row.pk),
+                reverse=direction == 'n',
+            )[:self.per_page + 1]
+
+        has_more = len(rows) > self.per_page
+        if direction == 'n':
+            rows = rows[:self.per_page]
+            has_next, has_previous = has_more, bool(token)
+        else:
+            rows = rows[:self.per_page][::-1]
+            has_next, has_previous = True, has_more
+
+        next_cursor = encode_cursor(rows[-1], 'n') if rows and has_next else None
+        previous_cursor = encode_cursor(rows[0], 'p') if rows and has_previous else None
+        return CursorPage(rows, next_cursor, previous_cursor)
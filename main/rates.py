@@ -0,0 +1,145 @@
+import threading
+import time
+from bisect import bisect_right
+from decimal import Decimal
+
+from django.conf import settings
+from django.db.models import (
+    Case, DateTimeField, DecimalField, ExpressionWrapper, F, Func, OuterRef, Subquery, Value, When,
+)
+from django.db.models.functions import Coalesce, TruncDate
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .models import ExchangeRate
+
+
+# Курс до появления записей в ExchangeRate (раньше был зашит в представления)
+DEFAULT_RATES = getattr(settings, 'DEFAULT_EXCHANGE_RATES', {('USD', 'UZS'): Decimal('12000')})
+CACHE_TTL = getattr(settings, 'EXCHANGE_RATE_CACHE_TTL', 300)
+
+MONEY = DecimalField(max_digits=24, decimal_places=6)
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def invalidate():
+    with _lock:
+        _cache.clear()
+
+
+@receiver(post_save, sender=ExchangeRate)
+@receiver(post_delete, sender=ExchangeRate)
+def _rates_changed(sender, **kwargs):
+    invalidate()
+
+
+def _history(base, quote):
+    """История курса пары: (отсортированные даты, курсы), из кэша процесса с TTL."""
+    now = time.monotonic()
+    with _lock:
+        entry = _cache.get((base, quote))
+        if entry is not None and entry[0] > now:
+            return entry[1]
+
+    rows = list(
+        ExchangeRate.objects
+        .filter(base=base, quote=quote)
+        .order_by('effective_from')
+        .values_list('effective_from', 'rate')
+    )
+    history = ([day for day, _ in rows], [rate for _, rate in rows])
+    with _lock:
+        _cache[(base, quote)] = (now + CACHE_TTL, history)
+    return history
+
+
+def _direct_rate(base, quote, day):
+    days, values = _history(base, quote)
+    index = bisect_right(days, day)
+    if index:
+        return values[index - 1]
+    return DEFAULT_RATES.get((base, quote))
+
+
+def get_rate(base, quote, at=None):
+    """Курс base→quote, действовавший на дату at (по умолчанию — сегодня)."""
+    if base == quote:
+        return Decimal('1')
+    if at is None:
+        day = timezone.localdate()
+    elif hasattr(at, 'tzinfo'):
+        day = timezone.localdate(at) if timezone.is_aware(at) else at.date()
+    else:
+        day = at
+
+    rate = _direct_rate(base, quote, day)
+    if rate is not None:
+        return rate
+    inverse = _direct_rate(quote, base, day)
+    if inverse is not None:
+        return Decimal('1') / inverse
+    raise LookupError(f'Нет курса {base}/{quote} на {day}')
+
+
+def convert(amount, from_currency, to_currency, at=None):
+    if from_currency == to_currency:
+        return amount
+    converted = Decimal(amount) * get_rate(from_currency, to_currency, at)
+    return converted.quantize(Decimal('0.01'))
+
+
+def rate_expression(currency_field, date_field, quote='UZS', date_is_datetime=True):
+    """
+    Курс currency_field→quote на дату строки: коррелированный подзапрос к
+    ExchangeRate (индекс base, quote, effective_from), т.е. соединение с таблицей
+    курсов внутри SQL, без отдельного обращения на каждую строку из Python.
+    Порядок как в get_rate: прямая пара (история, затем DEFAULT_RATES), потом
+    обратная. Для пары без курса — NULL: такие строки выпадают из Sum, а не
+    считаются один к одному.
+    """
+    if date_is_datetime:
+        day = TruncDate(ExpressionWrapper(OuterRef(date_field), output_field=DateTimeField()))
+    else:
+        day = OuterRef(date_field)
+
+    def latest(**pair):
+        return Subquery(
+            ExchangeRate.objects
+            .filter(effective_from__lte=day, **pair)
+            .order_by('-effective_from')
+            .values('rate')[:1],
+            output_field=MONEY,
+        )
+
+    def defaults(inverse):
+        whens = [When(**{currency_field: quote}, then=Value(Decimal('1')))]
+        for (base, rate_quote), rate in DEFAULT_RATES.items():
+            if inverse and base == quote:
+                whens.append(When(**{currency_field: rate_quote}, then=Value(Decimal('1') / rate)))
+            elif not inverse and rate_quote == quote:
+                whens.append(When(**{currency_field: base}, then=Value(rate)))
+        return Case(*whens, default=Value(None), output_field=MONEY)
+
+    # Литерал 1.0, а не Value: SQLite приводит Decimal к целому и делит нацело
+    inverse = Func(
+        latest(base=quote, quote=OuterRef(currency_field)), template='(1.0 / %(expressions)s)', output_field=MONEY,
+    )
+    return Coalesce(
+        latest(base=OuterRef(currency_field), quote=quote),
+        defaults(inverse=False),
+        inverse,
+        defaults(inverse=True),
+        output_field=MONEY,
+    )
+
+
+def amount_in(amount_field, currency_field, date_field, quote='UZS', date_is_datetime=True):
+    """Выражение суммы строки в валюте quote по курсу на дату этой строки."""
+    return Case(
+        When(**{currency_field: quote}, then=F(amount_field)),
+        default=F(amount_field) * rate_expression(currency_field, date_field, quote, date_is_datetime),
+        output_field=MONEY,
+    )
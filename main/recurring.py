@@ -0,0 +1,137 @@
+import calendar
+from collections import defaultdict
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.utils import timezone
+
+from . import budgets, checkpoints, ledger, rollups
+from .context_cache import bump_on_commit
+from .models import RecurringRule, Transaction
+
+
+# Потолок повторений одного правила за пачку: правило, начатое годы назад,
+# догоняется за несколько пачек, а не одним огромным INSERT
+MAX_PER_RULE = 1000
+
+
+def _add_months(day, months):
+    month = day.month - 1 + months
+    year, month = day.year + month // 12, month % 12 + 1
+    # 31 января + месяц = 28/29 февраля
+    return day.replace(year=year, month=month, day=min(day.day, calendar.monthrange(year, month)[1]))
+
+
+def occurrence(rule, n):
+    """
+    Момент n-го повторения (с нуля). Считается от starts_at, а не от
+    предыдущего повторения, поэтому 31-е число не сползает на 28-е навсегда.
+    Время суток держится по местным часам.
+    """
+    local = timezone.localtime(rule.starts_at)
+    step = n * rule.interval
+    if rule.freq == 'daily':
+        day = local.date() + timedelta(days=step)
+    elif rule.freq == 'weekly':
+        day = local.date() + timedelta(weeks=step)
+    elif rule.freq == 'monthly':
+        day = _add_months(local.date(), step)
+    else:
+        day = _add_months(local.date(), 12 * step)
+    return timezone.make_aware(datetime.combine(day, local.time().replace(tzinfo=None)))
+
+
+def _due(rule, now):
+    """Непроведённые повторения до now включительно: пары (номер, момент)."""
+    n = rule.occurrence_count
+    while n - rule.occurrence_count < MAX_PER_RULE:
+        at = occurrence(rule, n)
+        if at > now or (rule.until is not None and at > rule.until):
+            return
+        yield n, at
+        n += 1
+
+
+def _next_run(rule):
+    at = occurrence(rule, rule.occurrence_count)
+    return None if rule.until is not None and at > rule.until else at
+
+
+def _materialize(rules, now):
+    """
+    Проводит повторения пачки правил: bulk_create операций и записей журнала,
+    сдвиг контрольных точек, сводок и бюджетов пачкой, затем bulk_update
+    правил. Вызывать внутри transaction.atomic — вместе с продвижением
+    next_run всё фиксируется или откатывается целиком.
+    """
+    # Уже проведённые повторения (например, next_run сдвинули вручную назад)
+    existing = set(
+        Transaction.objects
+        .filter(recurring_rule__in=rules, created_at__gte=min(rule.next_run for rule in rules))
+        .values_list('recurring_rule_id', 'created_at')
+    )
+    batch = []
+    deltas = rollups.Deltas()
+    spending = budgets.Spending()
+    day_deltas = defaultdict(lambda: defaultdict(Decimal))
+
+    for rule in rules:
+        for n, at in _due(rule, now):
+            rule.occurrence_count = n + 1
+            if (rule.pk, at) in existing:
+                continue
+            tx = Transaction(
+                user_id=rule.user_id,
+                wallet=rule.wallet,
+                category_id=rule.category_id,
+                type=rule.type,
+                amount=rule.amount,
+                description=rule.description,
+                created_at=at,
+                recurring_rule=rule,
+            )
+            batch.append(tx)
+            deltas.add(tx)
+            spending.add(tx)
+            signed = tx.amount if tx.type == 'income' else -tx.amount
+            day_deltas[rule.wallet_id][timezone.localdate(at)] += signed
+        rule.next_run = _next_run(rule)
+
+    Transaction.objects.bulk_create(batch, batch_size=2000)
+    # Повторение — уже наступивший факт, как строка выписки: запись журнала без проверки остатка
+    ledger.post([ledger.entry_for(tx) for tx in batch])
+    for wallet_id in sorted(day_deltas):
+        checkpoints.shift_days(wallet_id, day_deltas[wallet_id])
+    deltas.flush()
+    spending.flush()
+    RecurringRule.objects.bulk_update(rules, ['occurrence_count', 'next_run'])
+    for user_id in {rule.user_id for rule in rules}:
+        bump_on_commit(user_id)
+    return len(batch)
+
+
+def run(now=None, batch_size=200):
+    """
+    Проводит все наступившие повторения всех пользователей пачками по
+    batch_size правил, каждая пачка — отдельная транзакция БД. Повторный
+    запуск после сбоя идемпотентен: next_run продвигается в той же
+    транзакции, что и вставка, а уникальный индекс (правило, момент) не
+    пропустит дубль. Параллельные запуски на PostgreSQL делят правила через
+    SKIP LOCKED. Возвращает число созданных операций.
+    """
+    now = now or timezone.now()
+    created = 0
+    while True:
+        with transaction.atomic():
+            rules = list(
+                RecurringRule.objects
+                .select_for_update(skip_locked=True, of=('self',))
+                .select_related('wallet')
+                .filter(is_active=True, next_run__lte=now)
+                # Правила одного кошелька попадают в одну пачку — один сдвиг контрольных точек
+                .order_by('wallet_id', 'pk')[:batch_size]
+            )
+            if not rules:
+                return created
+            created += _materialize(rules, now)
@@ -0,0 +1,61 @@
+from collections import namedtuple
+
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .context_cache import bump, bump_on_commit, cached_context
+from .models import Category, Wallet
+
+
+# Справочники пользователя для форм и меню. Баланса здесь нет: он меняется
+# с каждой операцией, а этот кэш сбрасывают только записи кошельков и категорий
+NAMESPACE = 'refdata'
+
+WalletRef = namedtuple('WalletRef', 'pk name type currency')
+CategoryRef = namedtuple('CategoryRef', 'pk name type')
+
+
+def _cached(user_id, name, load):
+    # Кошельки и категории — отдельные ключи: промах стоит один запрос, и только нужный
+    return cached_context(user_id, name, '', load, namespace=NAMESPACE)
+
+
+def wallets(user_id):
+    """Кошельки пользователя в порядке создания."""
+    return _cached(user_id, 'wallets', lambda: [
+        WalletRef(*row) for row in
+        Wallet.objects.filter(user_id=user_id).order_by('pk').values_list('pk', 'name', 'type', 'currency')
+    ])
+
+
+def categories(user_id):
+    """Категории пользователя в порядке создания."""
+    return _cached(user_id, 'categories', lambda: [
+        CategoryRef(*row) for row in
+        Category.objects.filter(user_id=user_id).order_by('pk').values_list('pk', 'name', 'type')
+    ])
+
+
+def wallet_choices(user_id):
+    # Подпись как у Wallet.__str__
+    return [(wallet.pk, f'{wallet.name} ({wallet.currency})') for wallet in wallets(user_id)]
+
+
+def category_choices(user_id, type=None):
+    return [
+        (category.pk, category.name) for category in categories(user_id)
+        if type is None or category.type == type
+    ]
+
+
+def invalidate(user_id):
+    bump(user_id, NAMESPACE)
+
+
+@receiver(post_save, sender=Wallet)
+@receiver(post_delete, sender=Wallet)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Category)
+def _refdata_changed(sender, instance, **kwargs):
+    # После фиксации: иначе параллельный запрос успеет закэшировать старые строки под новой версией
+    bump_on_commit(instance.user_id, NAMESPACE)
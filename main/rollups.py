@@ -0,0 +1,278 @@
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from decimal import Decimal
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import TruncDate
+from django.db.models.signals import pre_delete
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import archive
+from .models import ArchivedTransaction, Category, DailySummary, Transaction
+
+
+# Поле группировки -> (поле в DailySummary, поле в Transaction)
+GROUP_FIELDS = {
+    'type': ('type', 'type'),
+    'category': ('category_id', 'category_id'),
+    'category__name': ('category__name', 'category__name'),
+    'currency': ('currency', 'wallet__currency'),
+    'day': ('day', 'day'),
+}
+
+
+def _midnight(day):
+    return timezone.make_aware(datetime.combine(day, time.min))
+
+
+def bucket_key(tx):
+    return (
+        tx.user_id,
+        timezone.localdate(tx.created_at),
+        tx.type,
+        tx.category_id,
+        tx.wallet.currency,
+    )
+
+
+def apply_delta(key, amount, count):
+    """Прибавляет amount/count к дневной строке; вызывать внутри transaction.atomic."""
+    user_id, day, type, category_id, currency = key
+    lookup = dict(user_id=user_id, day=day, type=type, category_id=category_id, currency=currency)
+    updated = DailySummary.objects.filter(**lookup).update(
+        total=F('total') + amount,
+        count=F('count') + count,
+    )
+    if updated:
+        return
+    try:
+        with transaction.atomic():
+            DailySummary.objects.create(total=amount, count=count, **lookup)
+    except IntegrityError:
+        # Строку успел создать параллельный запрос
+        DailySummary.objects.filter(**lookup).update(
+            total=F('total') + amount,
+            count=F('count') + count,
+        )
+
+
+def apply(tx, sign=1):
+    apply_delta(bucket_key(tx), sign * tx.amount, sign)
+
+
+class Deltas:
+    """Накопитель изменений сводки: память — по числу дневных корзин, а не строк."""
+
+    def __init__(self):
+        self._deltas = defaultdict(lambda: [Decimal('0'), 0])
+
+    def add(self, tx, sign=1):
+        self.add_bucket(bucket_key(tx), sign * tx.amount, sign)
+
+    def add_bucket(self, key, amount, count):
+        delta = self._deltas[key]
+        delta[0] += amount
+        delta[1] += count
+
+    def flush(self, batch_size=1000):
+        """Применяет накопленное; вызывать внутри transaction.atomic."""
+        if len(self._deltas) <= 20:
+            for key, (amount, count) in self._deltas.items():
+                apply_delta(key, amount, count)
+            self._deltas.clear()
+            return
+
+        # Крупная пачка (импорт): затронутые строки читаются с блокировкой одним
+        # запросом на пользователя, затем bulk_update/bulk_create вместо UPDATE на корзину
+        by_user = defaultdict(dict)
+        for key, delta in self._deltas.items():
+            by_user[key[0]][key] = delta
+
+        for user_id, deltas in by_user.items():
+            days = [key[1] for key in deltas]
+            existing = {
+                (row.user_id, row.day, row.type, row.category_id, row.currency): row
+                for row in DailySummary.objects.select_for_update().filter(
+                    user_id=user_id, day__range=(min(days), max(days))
+                )
+            }
+            changed, created = [], []
+            for key, (amount, count) in deltas.items():
+                row = existing.get(key)
+                if row is None:
+                    user_id, day, type, category_id, currency = key
+                    created.append(DailySummary(
+                        user_id=user_id, day=day, type=type, category_id=category_id,
+                        currency=currency, total=amount, count=count,
+                    ))
+                else:
+                    row.total += amount
+                    row.count += count
+                    changed.append(row)
+            DailySummary.objects.bulk_update(changed, ['total', 'count'], batch_size=batch_size)
+            DailySummary.objects.bulk_create(created, batch_size=batch_size)
+        self._deltas.clear()
+
+
+def apply_many(transactions, sign=1):
+    """Сворачивает пачку транзакций в дельты по дням и применяет по одной на строку."""
+    deltas = Deltas()
+    for tx in transactions:
+        deltas.add(tx, sign)
+    deltas.flush()
+
+
+@receiver(pre_delete, sender=Category)
+def _merge_category(sender, instance, **kwargs):
+    """
+    Операции удаляемой категории станут без категории (SET_NULL) — её дневные
+    строки заранее вливаются в корзины без категории, иначе корзины задвоятся.
+    """
+    rows = DailySummary.objects.filter(category_id=instance.pk)
+    deltas = Deltas()
+    for row in rows.iterator():
+        deltas.add_bucket((row.user_id, row.day, row.type, None, row.currency), row.total, row.count)
+    rows.delete()
+    deltas.flush()
+
+
+def split_range(start, end):
+    """
+    Делит [start, end] на целые локальные дни (берутся из DailySummary)
+    и неполные края (считаются по сырым транзакциям).
+    Возвращает ((first_day, last_day) или None, [Q по created_at, ...]).
+    Граница None означает «без ограничения».
+    """
+    if start is None:
+        first_day = None
+    else:
+        first_day = timezone.localdate(start)
+        if start != _midnight(first_day):
+            first_day += timedelta(days=1)
+
+    if end is None:
+        # Будущих транзакций нет, поэтому сегодняшняя строка уже «полная»
+        last_day = None
+    else:
+        last_day = timezone.localdate(end)
+        if end + timedelta(microseconds=1) < _midnight(last_day + timedelta(days=1)):
+            last_day -= timedelta(days=1)
+
+    if first_day is not None and last_day is not None and first_day > last_day:
+        whole = Q(created_at__gte=start) if start is not None else Q()
+        if end is not None:
+            whole &= Q(created_at__lte=end)
+        return None, [whole]
+
+    edges = []
+    if start is not None and start < _midnight(first_day):
+        edges.append(Q(created_at__gte=start, created_at__lt=_midnight(first_day)))
+    if end is not None and _midnight(last_day + timedelta(days=1)) <= end:
+        edges.append(Q(created_at__gte=_midnight(last_day + timedelta(days=1)), created_at__lte=end))
+    return (first_day, last_day), edges
+
+
+def summarize(user, start=None, end=None, group_by=('type',), **filters):
+    """
+    Суммы и количества транзакций пользователя за [start, end], сгруппированные
+    по group_by. Целые дни читаются из DailySummary, края — из Transaction
+    (и из архива, если start раньше горизонта архивации).
+    filters должны называться одинаково в обеих моделях (type, category__isnull, ...).
+    Возвращает {кортеж значений group_by: {'total': ..., 'count': ...}}.
+    """
+    rollup_fields = [GROUP_FIELDS[name][0] for name in group_by]
+    tx_fields = [GROUP_FIELDS[name][1] for name in group_by]
+    result = defaultdict(lambda: {'total': Decimal('0'), 'count': 0})
+
+    days, edges = split_range(start, end)
+
+    if days is not None:
+        first_day, last_day = days
+        qs = DailySummary.objects.filter(user=user, **filters)
+        if first_day is not None:
+            qs = qs.filter(day__gte=first_day)
+        if last_day is not None:
+            qs = qs.filter(day__lte=last_day)
+        for row in qs.values(*rollup_fields).annotate(s=Sum('total'), c=Sum('count')).order_by():
+            bucket = result[tuple(row[f] for f in rollup_fields)]
+            bucket['total'] += row['s'] or 0
+            bucket['count'] += row['c'] or 0
+
+    if edges:
+        condition = Q()
+        for edge in edges:
+            condition |= edge
+        # Без start край один — последний неполный день до end
+        for model in archive.models(start if start is not None else end):
+            qs = model.objects.for_user(user).filter(condition, **filters)
+            if 'day' in group_by:
+                qs = qs.annotate(day=TruncDate('created_at'))
+            for row in qs.values(*tx_fields).annotate(s=Sum('amount'), c=Count('id')).order_by():
+                bucket = result[tuple(row[f] for f in tx_fields)]
+                bucket['total'] += row['s'] or 0
+                bucket['count'] += row['c']
+
+    return dict(result)
+
+
+def _daily_rows(model, user):
+    transactions = model.objects.all()
+    if user is not None:
+        transactions = transactions.filter(user=user)
+    return (
+        transactions
+        .annotate(day=TruncDate('created_at'))
+        .values('user_id', 'day', 'type', 'category_id', 'wallet__currency')
+        .annotate(total=Sum('amount'), count=Count('id'))
+        .order_by()
+    )
+
+
+def _bucket(row):
+    return row['user_id'], row['day'], row['type'], row['category_id'], row['wallet__currency']
+
+
+def rebuild(user=None, batch_size=1000):
+    """
+    Пересчитывает DailySummary с нуля (для одного пользователя или для всех)
+    по горячей таблице и архиву. Архив сворачивается в память — корзин в нём
+    не больше, чем дней на категории, — а горячие строки идут потоком и
+    сливаются с ним: в один день могут попасть операции из обеих таблиц.
+    """
+    summaries = DailySummary.objects.all()
+    if user is not None:
+        summaries = summaries.filter(user=user)
+    archived = {_bucket(row): row for row in _daily_rows(ArchivedTransaction, user)}
+
+    def rows():
+        for row in _daily_rows(Transaction, user).iterator(chunk_size=batch_size):
+            cold = archived.pop(_bucket(row), None)
+            if cold is not None:
+                row['total'] += cold['total']
+                row['count'] += cold['count']
+            yield row
+        yield from archived.values()
+
+    created = 0
+    with transaction.atomic():
+        summaries.delete()
+        batch = []
+        for row in rows():
+            batch.append(DailySummary(
+                user_id=row['user_id'],
+                day=row['day'],
+                type=row['type'],
+                category_id=row['category_id'],
+                currency=row['wallet__currency'],
+                total=row['total'],
+                count=row['count'],
+            ))
+            if len(batch) >= batch_size:
+                DailySummary.objects.bulk_create(batch)
+                created += len(batch)
+                batch = []
+        DailySummary.objects.bulk_create(batch)
+        created += len(batch)
+    return created
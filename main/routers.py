@@ -0,0 +1,104 @@
+import random
+import time
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+
+# Алиасы реплик из settings.DATABASES. Пусто — все запросы идут в основную БД
+REPLICAS = getattr(settings, 'DATABASE_REPLICAS', [])
+# Сколько секунд после записи пользователь читает из основной БД: реплика может отставать
+STICKY_SECONDS = getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+# Только данные приложения: сессии и пользователи читаются из основной БД
+REPLICA_APPS = {'main'}
+
+SESSION_KEY = '_primary_until'
+
+
+class _RequestState:
+    __slots__ = ('alias', 'wrote')
+
+    def __init__(self):
+        self.alias = None
+        self.wrote = False
+
+
+# Состояние текущего запроса. Объект, а не флаги: его видят и потоки
+# gather_queries (контекст копируется), и запись из них доходит до middleware
+_state = ContextVar('replica_request_state', default=None)
+
+
+class ReplicaRouter:
+    """
+    Записи — в основную БД, чтения моделей main — в реплику, если её выбрал
+    ReplicaMiddleware для текущего запроса. settings:
+        DATABASE_ROUTERS = ['main.routers.ReplicaRouter']
+        DATABASE_REPLICAS = ['replica']
+    Локально реплика — второй файл SQLite (копия основного) или второй алиас
+    того же PostgreSQL; в тестах — 'TEST': {'MIRROR': 'default'}.
+    """
+
+    def db_for_read(self, model, **hints):
+        state = _state.get()
+        if state is None or state.alias is None or model._meta.app_label not in REPLICA_APPS:
+            return None
+        # Внутри транзакции читаем её же соединение: реплика не видит незафиксированного
+        if connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return None
+        return state.alias
+
+    def db_for_write(self, model, **hints):
+        state = _state.get()
+        # Запись сессии (вход, выход) не в счёт: закрепляют только данные приложения
+        if state is not None and model._meta.app_label in REPLICA_APPS:
+            state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной БД, связи между ними допустимы
+        return True
+
+    def allow_migrate(self, db, app_label, **hints):
+        # Схему реплики приносит репликация
+        return False if db in REPLICAS else None
+
+
+def pinned(request):
+    """Пользователь недавно писал — читает из основной БД."""
+    session = getattr(request, 'session', None)
+    return session is not None and session.get(SESSION_KEY, 0) > time.time()
+
+
+class ReplicaMiddleware:
+    """
+    Выбирает реплику для GET/HEAD представлений с replica_reads = True, если
+    пользователь не писал последние STICKY_SECONDS секунд (отметка в сессии).
+    Ставится после AuthenticationMiddleware: 'main.routers.ReplicaMiddleware'.
+    Потоковые ответы отдаются после выхода из middleware и читают основную БД.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        state = _RequestState()
+        token = _state.set(state)
+        try:
+            response = self.get_response(request)
+        finally:
+            _state.reset(token)
+        if state.wrote and hasattr(request, 'session'):
+            request.session[SESSION_KEY] = time.time() + STICKY_SECONDS
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'view_class', None)
+        if (
+            REPLICAS
+            and request.method in ('GET', 'HEAD')
+            and getattr(view_class, 'replica_reads', False)
+            and not pinned(request)
+        ):
+            # Одна реплика на весь запрос: все его чтения из одного снимка
+            _state.get().alias = random.choice(REPLICAS)
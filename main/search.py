@@ -0,0 +1,148 @@
+import base64
+import binascii
+import re
+
+from django.db import NotSupportedError, connection
+from django.db.models import Q
+
+from . import archive
+from .models import ArchivedTransaction, Transaction
+from .pagination import CursorPage, CursorPaginator, InvalidCursor
+
+
+TOKEN = re.compile(r'\w+')
+MAX_TERMS = 8
+
+# Оценка во всех вариантах: меньше — релевантнее
+SQLITE_SQL = '''
+SELECT t.id, bm25(main_transaction_fts, 0.0, 2.0, 1.0) AS score
+FROM main_transaction_fts
+JOIN main_transaction t ON t.id = main_transaction_fts.rowid
+WHERE main_transaction_fts MATCH %s AND t.user_id = %s{filters}
+ORDER BY score, t.id
+LIMIT %s
+'''
+SQLITE_SCORE = 'bm25(main_transaction_fts, 0.0, 2.0, 1.0)'
+
+POSTGRESQL_SQL = '''
+SELECT t.id, -ts_rank_cd(t.search_vector, q) AS score
+FROM main_transaction t, to_tsquery('simple', %s) q
+WHERE t.search_vector @@ q AND t.user_id = %s{filters}
+ORDER BY score, t.id
+LIMIT %s
+'''
+POSTGRESQL_SCORE = '-ts_rank_cd(t.search_vector, q)'
+
+
+def terms(query):
+    return TOKEN.findall((query or '').lower())[:MAX_TERMS]
+
+
+def _sqlite(user, words):
+    # Все слова как префиксы, только в описании и категории, и токен владельца
+    match = 'owner:u{} AND {{description category}}:({})'.format(
+        user.pk, ' AND '.join(f'"{word}"*' for word in words)
+    )
+    return SQLITE_SQL, SQLITE_SCORE, [match, user.pk]
+
+
+def _postgresql(user, words):
+    query = ' & '.join(f"'{word}':*" for word in words)
+    return POSTGRESQL_SQL, POSTGRESQL_SCORE, [query, user.pk]
+
+
+BACKENDS = {'sqlite': _sqlite, 'postgresql': _postgresql}
+
+# Курсор страниц архива: префикс вне алфавита urlsafe base64, дальше — курсор CursorPaginator
+ARCHIVE_CURSOR = 'a.'
+
+
+def encode_cursor(score, pk):
+    raw = f'{score!r}|{pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        raw = base64.urlsafe_b64decode(token + '=' * (-len(token) % 4)).decode()
+        score, pk = raw.split('|')
+        return float(score), int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as exc:
+        raise InvalidCursor(token) from exc
+
+
+def search(user, query, wallet_id=None, type=None, date_from=None, date_to=None, cursor=None, per_page=20):
+    """
+    Поиск по описанию и названию категории через текстовый индекс (FTS5 на
+    SQLite, tsvector + GIN на PostgreSQL). Результаты по релевантности,
+    страницы — по ключу (оценка, id) от последней показанной строки.
+    Если date_from раньше горизонта архивации, после горячих результатов
+    идут архивные — от новых к старым, без текстового индекса.
+    """
+    words = terms(query)
+    if not words:
+        return CursorPage([], None, None)
+    scope = dict(wallet_id=wallet_id, type=type, date_from=date_from, date_to=date_to)
+    if cursor and cursor.startswith(ARCHIVE_CURSOR):
+        return _search_archive(user, words, cursor[len(ARCHIVE_CURSOR):] or None, per_page, **scope)
+    backend = BACKENDS.get(connection.vendor)
+    if backend is None:
+        raise NotSupportedError(f'Поиск не поддерживается для {connection.vendor}')
+    sql, score, params = backend(user, words)
+
+    adapt = connection.ops.adapt_datetimefield_value
+    filters = []
+    if wallet_id:
+        filters.append('t.wallet_id = %s')
+        params.append(wallet_id)
+    if type in ('income', 'outcome'):
+        filters.append('t.type = %s')
+        params.append(type)
+    if date_from is not None:
+        filters.append('t.created_at >= %s')
+        params.append(adapt(date_from))
+    if date_to is not None:
+        filters.append('t.created_at <= %s')
+        params.append(adapt(date_to))
+    if cursor:
+        after_score, after_pk = decode_cursor(cursor)
+        filters.append(f'({score} > %s OR ({score} = %s AND t.id > %s))')
+        params.extend([after_score, after_score, after_pk])
+
+    sql = sql.format(filters=''.join(f'\n  AND {condition}' for condition in filters))
+    with connection.cursor() as db_cursor:
+        db_cursor.execute(sql, params + [per_page + 1])
+        rows = db_cursor.fetchall()
+
+    has_next = len(rows) > per_page
+    rows = rows[:per_page]
+    objects = Transaction.objects.select_related('wallet', 'category').in_bulk([pk for pk, _ in rows])
+    object_list = [objects[pk] for pk, _ in rows if pk in objects]
+
+    if has_next:
+        return CursorPage(object_list, encode_cursor(rows[-1][1], rows[-1][0]), None)
+    if not archive.reaches(date_from):
+        return CursorPage(object_list, None, None)
+    # Горячие результаты кончились — страница добирается из архива
+    rest = _search_archive(user, words, None, per_page - len(object_list), **scope)
+    return CursorPage(object_list + rest.object_list, rest.next_cursor, None)
+
+
+def _search_archive(user, words, cursor, per_page, wallet_id=None, type=None, date_from=None, date_to=None):
+    """
+    Поиск в архиве подстрокой по описанию и категории, от новых к старым.
+    Архив читают редко, поэтому своего текстового индекса у него нет:
+    просмотр идёт по индексу (user, created_at) в границах дат.
+    """
+    queryset = ArchivedTransaction.objects.for_user_period(user, date_from, date_to)
+    for word in words:
+        queryset = queryset.filter(Q(description__icontains=word) | Q(category__name__icontains=word))
+    if wallet_id:
+        queryset = queryset.filter(wallet_id=wallet_id)
+    if type in ('income', 'outcome'):
+        queryset = queryset.filter(type=type)
+    if per_page <= 0:
+        # Страница уже полна — нужно лишь знать, есть ли продолжение; курсор без ключа — с начала архива
+        return CursorPage([], ARCHIVE_CURSOR if queryset.exists() else None, None)
+    page = CursorPaginator(queryset.select_related('wallet', 'category'), per_page).page(cursor)
+    return CursorPage(page.object_list, page.next_cursor and ARCHIVE_CURSOR + page.next_cursor, None)
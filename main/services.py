@@ -0,0 +1,173 @@
+from django.db import transaction
+from django.db.models import Count, Max, Q, Sum
+
+from . import budgets, checkpoints, ledger, rollups
+from .context_cache import bump_on_commit
+from .models import ArchivedTransaction, LedgerEntry, Transaction, Transfer, Wallet
+from .rates import convert
+
+
+class InsufficientFunds(Exception):
+    pass
+
+
+def change_balance(wallet_id, delta, kind, allow_overdraft=False, **entry):
+    """
+    Единственный путь изменения баланса кошелька — запись в журнал ledger.
+    Зачисление и списание без проверки — один INSERT без обновления строки
+    кошелька; списание с проверкой остатка — ledger.debit. Остальные поля
+    записи (ссылка на операцию или перевод, момент) передаются в entry.
+    """
+    _post(LedgerEntry(wallet_id=wallet_id, amount=delta, kind=kind, **entry), allow_overdraft)
+
+
+def _post(entry, allow_overdraft=False):
+    if entry.amount < 0 and not allow_overdraft:
+        if not ledger.debit(entry):
+            raise InsufficientFunds
+    else:
+        ledger.post([entry])
+
+
+COUNTER_FIELDS = ('total_income', 'total_outcome', 'tx_count', 'last_tx_at')
+
+
+def recount_wallets(wallets, repair=False):
+    """
+    Сворачивает журнал кошельков и сверяет их: баланс — с суммой свёрнутых
+    записей журнала, счётчики — с операциями (горячими и архивными), по
+    сгруппированному запросу на таблицу. Возвращает список (кошелёк, {поле: (было, должно быть)}) для
+    расходящихся; с repair=True записывает верные значения под блокировкой строк.
+    """
+    ids = [wallet.pk for wallet in wallets]
+    ledger.compact(ids)
+    with transaction.atomic():
+        wallets = Wallet.objects.filter(pk__in=ids).order_by('pk')
+        if repair:
+            wallets = wallets.select_for_update()
+        wallets = list(wallets)
+        balances = dict(
+            LedgerEntry.objects
+            .filter(wallet__in=ids, batch__isnull=False)
+            .values('wallet_id')
+            .annotate(total=Sum('amount'))
+            .order_by()
+            .values_list('wallet_id', 'total')
+        )
+        rows = {}
+        for model in (Transaction, ArchivedTransaction):
+            for row in (
+                model.objects
+                .filter(wallet__in=ids)
+                .values('wallet_id')
+                .annotate(
+                    total_income=Sum('amount', filter=Q(type='income')),
+                    total_outcome=Sum('amount', filter=Q(type='outcome')),
+                    tx_count=Count('id'),
+                    last_tx_at=Max('created_at'),
+                )
+                .order_by()
+            ):
+                total = rows.setdefault(row['wallet_id'], {
+                    'total_income': 0, 'total_outcome': 0, 'tx_count': 0, 'last_tx_at': None,
+                })
+                total['total_income'] += row['total_income'] or 0
+                total['total_outcome'] += row['total_outcome'] or 0
+                total['tx_count'] += row['tx_count']
+                total['last_tx_at'] = max(filter(None, [total['last_tx_at'], row['last_tx_at']]), default=None)
+        mismatched = []
+        for wallet in wallets:
+            row = rows.get(wallet.pk, {})
+            expected = {
+                'balance': balances.get(wallet.pk) or 0,
+                'total_income': row.get('total_income', 0),
+                'total_outcome': row.get('total_outcome', 0),
+                'tx_count': row.get('tx_count', 0),
+                'last_tx_at': row.get('last_tx_at'),
+            }
+            diff = {
+                field: (getattr(wallet, field), value)
+                for field, value in expected.items() if getattr(wallet, field) != value
+            }
+            if diff:
+                for field, (_, value) in diff.items():
+                    setattr(wallet, field, value)
+                mismatched.append((wallet, diff))
+        if repair and mismatched:
+            Wallet.objects.bulk_update([wallet for wallet, _ in mismatched], ['balance', *COUNTER_FIELDS])
+    return mismatched
+
+
+def _signed(tx):
+    return tx.amount if tx.type == 'income' else -tx.amount
+
+
+def create_transaction(tx):
+    """
+    Проводит новую транзакцию: сама запись, запись журнала, дневная сводка
+    и расход бюджета категории — одной транзакцией БД. Операция сохраняется
+    первой: записи журнала нужен её id, а не хватит остатка — откатится всё.
+    """
+    with transaction.atomic():
+        tx.save()
+        _post(ledger.entry_for(tx))
+        checkpoints.shift(tx.wallet_id, tx.created_at, _signed(tx))
+        rollups.apply(tx)
+        budgets.apply(tx)
+        bump_on_commit(tx.user_id)
+    return tx
+
+
+def delete_transaction(tx):
+    with transaction.atomic():
+        # Встречная запись журнала; отмена не упирается в остаток: доход мог быть уже потрачен
+        ledger.post([ledger.entry_for(tx, sign=-1)])
+        checkpoints.shift(tx.wallet_id, tx.created_at, -_signed(tx))
+        rollups.apply(tx, sign=-1)
+        budgets.apply(tx, sign=-1)
+        tx.delete()
+        bump_on_commit(tx.user_id)
+
+
+def delete_wallet(wallet):
+    """
+    Удаляет кошелёк: его операции (и архивные) уходят каскадом, поэтому
+    сначала они вычитаются из дневных сводок и расхода бюджетов — пачкой,
+    по строке на корзину, в той же транзакции БД.
+    """
+    with transaction.atomic():
+        deltas = rollups.Deltas()
+        spending = budgets.Spending()
+        for model in (Transaction, ArchivedTransaction):
+            rows = (
+                model.objects.filter(wallet=wallet)
+                .only('user_id', 'category_id', 'type', 'amount', 'created_at')
+                .iterator(chunk_size=2000)
+            )
+            for tx in rows:
+                tx.wallet = wallet
+                deltas.add(tx, sign=-1)
+                spending.add(tx, sign=-1)
+        deltas.flush()
+        spending.flush()
+        wallet.delete()
+        bump_on_commit(wallet.user_id)
+
+
+def transfer(from_wallet, to_wallet, amount):
+    """
+    Перевод между кошельками с конвертацией по текущему курсу: строка Transfer
+    и две записи журнала — списание с проверкой остатка и зачисление.
+    Возвращает зачисленную сумму.
+    """
+    converted = convert(amount, from_wallet.currency, to_wallet.currency)
+    with transaction.atomic():
+        record = Transfer.objects.create(
+            user_id=from_wallet.user_id, from_wallet=from_wallet, to_wallet=to_wallet,
+            amount=amount, credited=converted,
+        )
+        # Блокируется только строка списываемого кошелька — встречные переводы не дают дедлока
+        change_balance(from_wallet.pk, -amount, 'transfer', transfer=record, occurred_at=record.created_at)
+        change_balance(to_wallet.pk, converted, 'transfer', transfer=record, occurred_at=record.created_at)
+        bump_on_commit(from_wallet.user_id)
+    return converted
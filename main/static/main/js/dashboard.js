@@ -0,0 +1,51 @@
+const translations = {
+    uz: {
+        overview: "📊 Moliyaviy ko‘rinish",
+        total_balance: "💼 Umumiy balans",
+        total_usd: "Jami dollar:",
+        total_uzs: "Jami so‘m:",
+        income: "📈 Daromadlar",
+        outcome: "📉 Xarajatlar",
+        day: "Kun",
+        week: "Hafta",
+        month: "Oy",
+        total_for_period: "Jami:",
+        my_wallets: "👛 Mening hamyonlarim",
+        add_wallet: "+ Qo‘shish",
+        no_wallets: "Hamyonlar mavjud emas.",
+        recent_transactions: "🕒 So‘nggi operatsiyalar",
+        no_transactions: "Operatsiyalar mavjud emas"
+    },
+    en: {
+        overview: "📊 Financial Overview",
+        total_balance: "💼 Total Balance",
+        total_usd: "Total USD:",
+        total_uzs: "Total UZS:",
+        income: "📈 Income",
+        outcome: "📉 Expenses",
+        day: "Day",
+        week: "Week",
+        month: "Month",
+        total_for_period: "Total:",
+        my_wallets: "👛 My Wallets",
+        add_wallet: "+ Add",
+        no_wallets: "No wallets yet.",
+        recent_transactions: "🕒 Recent Transactions",
+        no_transactions: "No transactions yet."
+    }
+};
+
+let currentLang = 'uz'; // По умолчанию узбекский
+
+function translatePage(lang) {
+    currentLang = lang;
+    document.querySelectorAll('[data-i18n]').forEach(el => {
+        const key = el.getAttribute('data-i18n');
+        if(translations[lang][key]) {
+            el.innerText = translations[lang][key];
+        }
+    });
+}
+
+// Пример переключения языка
+// translatePage('en'); // для английского
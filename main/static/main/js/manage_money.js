@@ -0,0 +1,78 @@
+const amountInput = document.querySelector('.amount-input');
+const submitBtn = document.getElementById('submitBtn');
+const categoryField = document.getElementById('categoryField');
+
+function selectOperation(type) {
+    document.querySelectorAll('.operation-tab').forEach(tab => {
+        tab.classList.remove('active');
+    });
+    event.currentTarget.classList.add('active');
+    document.getElementById('op_' + type).checked = true;
+
+    if (type === 'income') {
+        amountInput.classList.remove('withdraw-mode');
+        submitBtn.className = 'btn btn-submit-income';
+        submitBtn.innerHTML = '✅ Пополнить';
+    } else {
+        amountInput.classList.add('withdraw-mode');
+        submitBtn.className = 'btn btn-submit-outcome';
+        submitBtn.innerHTML = '💸 Снять средства';
+    }
+
+    filterCategories(type);
+}
+
+function filterCategories(type) {
+    const options = categoryField.querySelectorAll('option');
+    options.forEach(option => {
+        if (option.value === '') {
+            option.style.display = 'block';
+            return;
+        }
+
+        const catType = option.getAttribute('data-type');
+        if (catType === type) {
+            option.style.display = 'block';
+        } else {
+            option.style.display = 'none';
+            if (option.selected) {
+                categoryField.value = '';
+            }
+        }
+    });
+}
+
+function selectWallet(id) {
+    document.querySelectorAll('.wallet-select-item').forEach(item => {
+        item.classList.remove('selected');
+    });
+    event.currentTarget.classList.add('selected');
+    document.getElementById('w_' + id).checked = true;
+}
+
+function setAmount(amount) {
+    amountInput.value = amount;
+    amountInput.focus();
+}
+
+function showCategorySelect() {
+    document.querySelectorAll('.toggle-btn').forEach(btn => btn.classList.remove('active'));
+    event.currentTarget.classList.add('active');
+
+    document.getElementById('categorySelect').classList.add('active');
+    document.getElementById('categoryCreate').classList.remove('active');
+
+    categoryField.required = true;
+    document.querySelector('input[name="new_category_name"]').required = false;
+}
+
+function showCategoryCreate() {
+    document.querySelectorAll('.toggle-btn').forEach(btn => btn.classList.remove('active'));
+    event.currentTarget.classList.add('active');
+
+    document.getElementById('categorySelect').classList.remove('active');
+    document.getElementById('categoryCreate').classList.add('active');
+
+    categoryField.required = false;
+    document.querySelector('input[name="new_category_name"]').required = true;
+}
@@ -0,0 +1,61 @@
+// Данные страницы приходят через json_script, адрес ряда — в data-url холста
+function readJSON(id) {
+    return JSON.parse(document.getElementById(id).textContent);
+}
+
+function doughnutData(stats) {
+    return {
+        labels: stats.map(item => item.category),
+        datasets: [{
+            // Decimal сериализуется строкой
+            data: stats.map(item => Number(item.amount)),
+            backgroundColor: stats.map(item => item.color),
+            borderWidth: 0
+        }]
+    };
+}
+
+new Chart(document.getElementById('incomeChart'), {
+    type: 'doughnut',
+    data: doughnutData(readJSON('income-stats')),
+    options: {
+        cutout: '70%',
+        plugins: { legend: { display: false } }
+    }
+});
+
+new Chart(document.getElementById('outcomeChart'), {
+    type: 'doughnut',
+    data: doughnutData(readJSON('outcome-stats')),
+    options: {
+        cutout: '70%',
+        plugins: { legend: { display: false } }
+    }
+});
+
+const seriesCanvas = document.getElementById('seriesChart');
+const seriesChart = new Chart(seriesCanvas, {
+    type: 'bar',
+    data: {
+        labels: [],
+        datasets: [
+            { label: 'Доходы', data: [], backgroundColor: '#4caf50' },
+            { label: 'Расходы', data: [], backgroundColor: '#f44336' }
+        ]
+    }
+});
+
+// Ответ помечен no-cache + ETag: браузер сам переспрашивает с If-None-Match
+// и при неизменных данных получает 304 без тела
+function loadSeries() {
+    fetch(seriesCanvas.dataset.url)
+        .then(response => response.json())
+        .then(data => {
+            seriesChart.data.labels = data.series.map(point => point.period);
+            seriesChart.data.datasets[0].data = data.series.map(point => point.income);
+            seriesChart.data.datasets[1].data = data.series.map(point => point.outcome);
+            seriesChart.update();
+        });
+}
+loadSeries();
+setInterval(loadSeries, 60000);
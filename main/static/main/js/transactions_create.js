@@ -0,0 +1,25 @@
+function setType(type){
+    document.getElementById('id_type').value = type;
+    document.getElementById('btn-income').classList.toggle('active',type==='income');
+    document.getElementById('btn-outcome').classList.toggle('active',type==='outcome');
+
+    const btn=document.getElementById('submit-btn');
+    btn.className='btn-submit '+(type==='income'?'btn-income':'btn-outcome');
+    btn.innerText=type==='income'?'✅ Подтвердить доход':'💸 Подтвердить расход';
+
+    document.getElementById('form-title').innerText=
+        type==='income'?'💰 Пополнение баланса':'📉 Списание средств';
+}
+
+function toggleCat(isNew){
+    document.getElementById('cat-old-box').classList.toggle('hidden',isNew);
+    document.getElementById('cat-new-box').classList.toggle('hidden',!isNew);
+    document.getElementById('id_category').disabled=isNew;
+}
+
+function addAmount(val){
+    const i=document.getElementById('id_amount');
+    i.value=(parseInt(i.value)||0)+val;
+}
+
+window.onload=()=>setType('income');
@@ -0,0 +1,18 @@
+const balanceChart = JSON.parse(document.getElementById('balance-chart').textContent);
+
+new Chart(document.getElementById('balanceChart'), {
+    type: 'line',
+    data: {
+        labels: balanceChart.map(point => point.day),
+        datasets: [{
+            data: balanceChart.map(point => point.balance),
+            borderColor: '#667eea',
+            backgroundColor: 'rgba(102, 126, 234, 0.15)',
+            fill: true,
+            tension: 0.3
+        }]
+    },
+    options: {
+        plugins: { legend: { display: false } }
+    }
+});
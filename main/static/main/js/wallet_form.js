@@ -0,0 +1,35 @@
+function selectType(type) {
+    document.querySelectorAll('.type-card').forEach(card => {
+        card.classList.remove('active');
+    });
+    event.currentTarget.classList.add('active');
+    document.getElementById('type_' + type).checked = true;
+
+    if (type === 'visa') {
+        const uzsOption = document.getElementById('currency_uzs');
+        if (uzsOption.checked) {
+            document.getElementById('currency_usd').checked = true;
+            selectCurrency('USD');
+        }
+    }
+}
+
+function selectCurrency(currency) {
+    document.querySelectorAll('.currency-option').forEach(option => {
+        option.classList.remove('active');
+    });
+    event.currentTarget.classList.add('active');
+    document.getElementById('currency_' + currency.toLowerCase()).checked = true;
+}
+
+document.addEventListener('DOMContentLoaded', function() {
+    const checkedType = document.querySelector('input[name="type"]:checked');
+    if (checkedType) {
+        checkedType.closest('.type-card').classList.add('active');
+    }
+
+    const checkedCurrency = document.querySelector('input[name="currency"]:checked');
+    if (checkedCurrency) {
+        checkedCurrency.closest('.currency-option').classList.add('active');
+    }
+});
@@ -0,0 +1,147 @@
+from datetime import timedelta
+from decimal import Decimal
+
+from django.db import connection
+
+from . import archive, rollups
+from .models import ArchivedTransaction, Transaction
+
+
+CENT = Decimal('0.01')
+
+# Медиана и p90 суммы операции — единственное, чего нет в дневных сводках.
+# Оконные функции идут по сырым операциям, поэтому только для ограниченного диапазона.
+#   tx     — операции диапазона; bucket — категория из топа или NULL («прочее»)
+#   ranked — номер операции по сумме внутри корзины
+# Медиана — среднее двух центральных строк, p90 — nearest rank: ceil(0.9 * n) = (9n + 9) / 10.
+PERCENTILES_SQL = '''
+WITH tx AS (
+    SELECT t.type, CASE {buckets} END AS bucket, t.amount
+    FROM {transaction} t
+    WHERE {where}
+),
+ranked AS (
+    SELECT type, bucket, amount,
+           ROW_NUMBER() OVER (PARTITION BY type, bucket ORDER BY amount) AS rn,
+           COUNT(*) OVER (PARTITION BY type, bucket) AS n
+    FROM tx
+)
+SELECT type, bucket,
+       AVG(CASE WHEN rn IN ((n + 1) / 2, (n + 2) / 2) THEN amount END) AS median,
+       MAX(CASE WHEN rn = (9 * n + 9) / 10 THEN amount END) AS p90
+FROM ranked
+GROUP BY type, bucket
+'''
+
+
+# Диапазон задевает архив — горячая таблица и архив одним источником
+UNION_SQL = '''(
+    SELECT user_id, category_id, type, amount, created_at FROM {transaction}
+    UNION ALL
+    SELECT user_id, category_id, type, amount, created_at FROM {archived}
+)'''
+
+
+def _money(value):
+    # SQLite отдаёт NUMERIC как int/float, PostgreSQL — Decimal
+    return Decimal(str(value or 0)).quantize(CENT)
+
+
+def _percentiles(user, start, end, top, type=None):
+    """{(type, bucket): (median, p90)} за [start, end]; top — {(type, category_id), ...}."""
+    adapt = connection.ops.adapt_datetimefield_value
+    buckets = ' '.join('WHEN t.type = %s AND t.category_id = %s THEN t.category_id' for _ in top)
+    bucket_params = [value for key in sorted(top) for value in key]
+    where = ['t.user_id = %s', 't.category_id IS NOT NULL', 't.created_at >= %s']
+    params = [user.pk, adapt(start)]
+    if type is not None:
+        where.append('t.type = %s')
+        params.append(type)
+    if end is not None:
+        where.append('t.created_at <= %s')
+        params.append(adapt(end))
+
+    table = connection.ops.quote_name(Transaction._meta.db_table)
+    if archive.reaches(start):
+        table = UNION_SQL.format(
+            transaction=table, archived=connection.ops.quote_name(ArchivedTransaction._meta.db_table),
+        )
+    sql = PERCENTILES_SQL.format(
+        buckets=buckets or 'WHEN 1 = 0 THEN NULL',
+        where=' AND '.join(where),
+        transaction=table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, bucket_params + params)
+        return {(type, bucket): (median, p90) for type, bucket, median, p90 in cursor.fetchall()}
+
+
+def category_stats(user, start=None, end=None, top_n=5, type=None):
+    """
+    Статистика по категориям за [start, end]: топ-N категорий по сумме и
+    «прочее», доля, число операций, сумма за предыдущий период той же длины
+    и разница с ним. Суммы и количества — из дневных сводок (rollups.summarize),
+    медиана и p90 суммы операции — окном по сырым операциям, только если у
+    диапазона есть начало; за всё время они None, как и previous/delta.
+    type ограничивает выборку одним типом операций.
+    Возвращает {'income': [...], 'outcome': [...]}.
+    """
+    filters = {'category__isnull': False}
+    if type is not None:
+        filters['type'] = type
+    group_by = ('type', 'category', 'category__name')
+    compare = start is not None and end is not None
+
+    totals = {}
+    for (kind, category, name), row in rollups.summarize(user, start, end, group_by, **filters).items():
+        totals[kind, category] = {'name': name, 'total': row['total'], 'count': row['count'], 'previous': 0}
+    if compare:
+        since = start - (end - start)
+        previous = rollups.summarize(user, since, start - timedelta(microseconds=1), group_by, **filters)
+        for (kind, category, name), row in previous.items():
+            totals.setdefault((kind, category), {'name': name, 'total': 0, 'count': 0})['previous'] = row['total']
+
+    # Место категории в своём типе; после top_n она уходит в «прочее» (bucket None)
+    ranked = sorted(totals, key=lambda key: (key[0], -totals[key]['total'], key[1]))
+    places, buckets = {}, {}
+    for kind, category in ranked:
+        place = places[kind] = places.get(kind, 0) + 1
+        bucket = category if place <= top_n else None
+        item = buckets.setdefault((kind, bucket), {
+            'name': totals[kind, category]['name'], 'total': 0, 'count': 0, 'previous': 0, 'categories': 0,
+        })
+        for field in ('total', 'count', 'previous'):
+            item[field] += totals[kind, category][field]
+        item['categories'] += 1
+
+    percentiles = {}
+    if start is not None and buckets:
+        top = {key for key in buckets if key[1] is not None}
+        percentiles = _percentiles(user, start, end, top, type)
+
+    type_totals = {}
+    for (kind, bucket), item in buckets.items():
+        type_totals[kind] = type_totals.get(kind, 0) + item['total']
+
+    result = {'income': [], 'outcome': []}
+    order = sorted(buckets, key=lambda key: (key[0], key[1] is None, -buckets[key]['total']))
+    for kind, bucket in order:
+        item = buckets[kind, bucket]
+        total, type_total, previous = _money(item['total']), _money(type_totals[kind]), _money(item['previous'])
+        if not total and not previous:
+            continue
+        median, p90 = percentiles.get((kind, bucket), (None, None))
+        count = item['count']
+        result[kind].append({
+            'category': item['name'] if bucket is not None else 'Прочее',
+            'is_other': bucket is None,
+            'categories': item['categories'],
+            'amount': total,
+            'count': count,
+            'percent': round(total / type_total * 100, 1) if type_total else 0,
+            'median': _money(median) if count and median is not None else None,
+            'p90': _money(p90) if count and p90 is not None else None,
+            'previous': previous if compare else None,
+            'delta': total - previous if compare else None,
+        })
+    return result
@@ -0,0 +1,63 @@
+import gzip
+
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.files.base import ContentFile
+
+try:
+    import brotli
+except ImportError:  # brotli необязателен: тогда только .gz
+    brotli = None
+
+
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt', '.map')
+# Мелкие файлы сжатие почти не уменьшает
+MIN_SIZE = 256
+
+
+def _gzip(data):
+    # mtime=0: одинаковый вход даёт одинаковый .gz при каждом collectstatic
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+
+def _brotli(data):
+    return brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """
+    ManifestStaticFilesStorage (имена с хэшем содержимого, manifest для
+    {% static %}), который после collectstatic кладёт рядом с каждым
+    текстовым файлом .gz и, если установлен brotli, .br — веб-сервер
+    отдаёт их как есть (nginx: gzip_static / brotli_static).
+    Файлы с хэшем в имени можно кэшировать на год:
+        STORAGES = {..., 'staticfiles': {'BACKEND': 'main.storage.CompressedManifestStaticFilesStorage'}}
+        location /static/ { expires 1y; add_header Cache-Control "public, immutable"; }
+    """
+
+    def post_process(self, paths, dry_run=False, **options):
+        yield from super().post_process(paths, dry_run=dry_run, **options)
+        if dry_run:
+            return
+        for name in sorted(set(self.hashed_files.values())):
+            if not name.endswith(COMPRESSIBLE):
+                continue
+            for compressed, processed in self.compress(name):
+                yield name, compressed, processed
+
+    def compress(self, name):
+        with self.open(name) as f:
+            data = f.read()
+        if len(data) < MIN_SIZE:
+            return
+        codecs = [('.gz', _gzip)]
+        if brotli is not None:
+            codecs.append(('.br', _brotli))
+        for suffix, codec in codecs:
+            packed = codec(data)
+            if len(packed) >= len(data):
+                continue
+            target = name + suffix
+            if self.exists(target):
+                self.delete(target)
+            self._save(target, ContentFile(packed))
+            yield target, True
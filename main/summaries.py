@@ -0,0 +1,155 @@
+from decimal import Decimal
+
+from django.db.models import Case, DecimalField, F, FloatField, OuterRef, Q, Subquery, Sum, Value, When
+from django.db.models.functions import Cast, TruncDay, TruncMonth, TruncWeek
+from django.utils import timezone
+
+from users.models import CustomUser
+from . import archive
+from .models import DailySummary, LedgerEntry, Wallet
+from .rates import amount_in, get_rate
+from .rollups import split_range
+
+
+MONEY = DecimalField(max_digits=24, decimal_places=6)
+
+
+def _in_uzs(amount, currency, rate):
+    return Case(
+        When(**{currency: 'USD'}, then=F(amount) * Value(rate)),
+        default=F(amount),
+        output_field=MONEY,
+    )
+
+
+def _in_usd(amount, currency, rate):
+    # Деление в float: SQLite приводит NUMERIC к целому и отбрасывает дробную часть
+    return Case(
+        When(**{currency: 'USD'}, then=Cast(amount, FloatField())),
+        default=Cast(amount, FloatField()) / Value(float(rate)),
+        output_field=FloatField(),
+    )
+
+
+def _only(amount, currency, code):
+    return Case(
+        When(**{currency: code}, then=F(amount)),
+        default=Value(0),
+        output_field=MONEY,
+    )
+
+
+def _scalar(queryset, expression, output_field=MONEY, owner='user'):
+    # Коррелированный агрегат по пользователю: одна ячейка внутри общего SELECT
+    return Subquery(
+        queryset
+        .filter(**{owner: OuterRef('pk')})
+        .values(owner)
+        .annotate(value=expression)
+        .values('value')[:1],
+        output_field=output_field,
+    )
+
+
+def _period_total(queryset, amount, currency, date, type, date_is_datetime):
+    return _scalar(
+        queryset.filter(type=type),
+        Sum(amount_in(amount, currency, date, date_is_datetime=date_is_datetime)),
+    )
+
+
+def dashboard_summary(user, date_from):
+    """
+    Доходы/расходы за период (в сумах) и все итоги по балансам кошельков
+    за один запрос к БД: каждая величина — скалярный подзапрос с условной
+    агрегацией по валюте, строки транзакций в Python не поднимаются.
+    Обороты пересчитываются по курсу на дату операции, балансы — по текущему.
+    """
+    rate = get_rate('USD', 'UZS')
+    wallets = Wallet.objects.all()
+    annotations = {
+        'balance_uzs': _scalar(wallets, Sum(_in_uzs('balance', 'currency', rate))),
+        'balance_usd': _scalar(wallets, Sum(_in_usd('balance', 'currency', rate)), FloatField()),
+        'balance_usd_only': _scalar(wallets, Sum(_only('balance', 'currency', 'USD'))),
+        'balance_uzs_only': _scalar(wallets, Sum(_only('balance', 'currency', 'UZS'))),
+    }
+    # Ещё не свёрнутый хвост журнала — к балансам кошельков
+    tail = LedgerEntry.objects.filter(batch__isnull=True)
+    owner = 'wallet__user'
+    annotations.update({
+        'tail_uzs': _scalar(tail, Sum(_in_uzs('amount', 'wallet__currency', rate)), owner=owner),
+        'tail_usd': _scalar(tail, Sum(_in_usd('amount', 'wallet__currency', rate)), FloatField(), owner=owner),
+        'tail_usd_only': _scalar(tail, Sum(_only('amount', 'wallet__currency', 'USD')), owner=owner),
+        'tail_uzs_only': _scalar(tail, Sum(_only('amount', 'wallet__currency', 'UZS')), owner=owner),
+    })
+
+    days, edges = split_range(date_from, None)
+    if days is not None:
+        first_day, last_day = days
+        summaries = DailySummary.objects.all()
+        if first_day is not None:
+            summaries = summaries.filter(day__gte=first_day)
+        if last_day is not None:
+            summaries = summaries.filter(day__lte=last_day)
+        for type in ('income', 'outcome'):
+            annotations[f'{type}_days'] = _period_total(
+                summaries, 'total', 'currency', 'day', type, date_is_datetime=False
+            )
+    if edges:
+        condition = Q()
+        for edge in edges:
+            condition |= edge
+        for n, model in enumerate(archive.models(date_from)):
+            transactions = model.objects.filter(condition)
+            for type in ('income', 'outcome'):
+                annotations[f'{type}_edges_{n}'] = _period_total(
+                    transactions, 'amount', 'wallet__currency', 'created_at', type, date_is_datetime=True
+                )
+
+    row = CustomUser.objects.filter(pk=user.pk).annotate(**annotations).values(*annotations).get()
+    row = {key: value or 0 for key, value in row.items()}
+
+    def turnover(type):
+        # Целые дни из сводок плюс края из горячей таблицы и архива
+        return sum(value for key, value in row.items() if key.startswith(f'{type}_'))
+
+    return {
+        'total_income': turnover('income'),
+        'total_outcome': turnover('outcome'),
+        'total_balance_uzs': row['balance_uzs'] + row['tail_uzs'],
+        'total_balance_usd': row['balance_usd'] + row['tail_usd'],
+        'total_balance_usd_not_uzs': row['balance_usd_only'] + row['tail_usd_only'],
+        'total_balance_usd_not_usd': row['balance_uzs_only'] + row['tail_uzs_only'],
+    }
+
+
+BUCKETS = {'day': TruncDay, 'week': TruncWeek, 'month': TruncMonth}
+
+
+def series(user, bucket, start=None, end=None, wallet_id=None, category_id=None):
+    """
+    Доходы и расходы пользователя по дням/неделям/месяцам в UZS (по курсу
+    на дату операции). Один сгруппированный запрос по (период, тип) и ещё
+    один по архиву, если start раньше горизонта архивации.
+    """
+    points = {}
+    for model in archive.models(start):
+        transactions = model.objects.for_user_period(user, start, end)
+        if wallet_id:
+            transactions = transactions.filter(wallet_id=wallet_id)
+        if category_id:
+            transactions = transactions.filter(category_id=category_id)
+
+        rows = (
+            transactions
+            .annotate(period=BUCKETS[bucket]('created_at'))
+            .values('period', 'type')
+            .annotate(total=Sum(amount_in('amount', 'wallet__currency', 'created_at')))
+            .order_by('period')
+            .values_list('period', 'type', 'total')
+        )
+        for period, type, total in rows:
+            day = timezone.localdate(period)
+            point = points.setdefault(day, {'period': day.isoformat(), 'income': 0.0, 'outcome': 0.0})
+            point[type] += float(total or 0)
+    return [points[day] for day in sorted(points)]
@@ -1,3 +1,464 @@
-from django.test import TestCase
+import contextvars
+import random
+import shutil
+import tempfile
+import threading
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from unittest import mock, skipUnless
 
-# Create your tests here.
+from django.db import connection
+from django.db.models import Sum
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from users.models import CustomUser
+from . import archive, benchmark, budgets, checkpoints, ledger, metrics, rates, recurring, refdata, rollups, routers, views
+from .forms import TransferForm
+from .models import ArchivedTransaction, Budget, BudgetNotification, Category, DailySummary, ExchangeRate, LedgerEntry, RecurringRule, Transaction, Transfer, Wallet
+from .search import search
+from .stats import category_stats
+from .services import (
+    InsufficientFunds, change_balance, create_transaction, delete_transaction, delete_wallet, recount_wallets,
+    transfer,
+)
+
+
+class BalanceWritePathTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('owner', password='x')
+        self.wallet = Wallet.objects.create(
+            user=self.user, name='Наличные', type='cash', currency='UZS', balance=Decimal('100')
+        )
+
+    def test_overdraft_is_rejected_and_entry_rolled_back(self):
+        change_balance(self.wallet.pk, Decimal('-60'), 'transfer')
+        with self.assertRaises(InsufficientFunds):
+            change_balance(self.wallet.pk, Decimal('-40.01'), 'transfer')
+        self.assertEqual(ledger.balance(self.wallet.pk), Decimal('40'))
+        self.assertEqual(LedgerEntry.objects.filter(wallet=self.wallet).count(), 2)
+
+    def test_entries_do_not_touch_wallet_row_until_compaction(self):
+        Wallet.objects.filter(pk=self.wallet.pk).update(name='Переименован')
+        change_balance(self.wallet.pk, Decimal('50'), 'transfer')  # self.wallet.name устарел в памяти
+        self.wallet.refresh_from_db()
+        self.assertEqual((self.wallet.name, self.wallet.balance), ('Переименован', Decimal('100')))
+        self.assertEqual(ledger.balance(self.wallet.pk), Decimal('150'))
+
+        self.assertEqual(ledger.compact(), 1)
+        self.wallet.refresh_from_db()
+        self.assertEqual(self.wallet.balance, Decimal('150'))
+        self.assertEqual(ledger.balance(self.wallet.pk), Decimal('150'))
+
+    def test_create_and_delete_transaction_restore_balance(self):
+        tx = create_transaction(Transaction(
+            user=self.user, wallet=self.wallet, type='outcome', amount=Decimal('40')
+        ))
+        self.assertEqual(ledger.balance(self.wallet.pk), Decimal('60'))
+
+        delete_transaction(tx)
+        self.assertEqual(ledger.balance(self.wallet.pk), Decimal('100'))
+
+    def test_wallet_counters_follow_writes(self):
+        early = timezone.make_aware(datetime(2024, 1, 1, 12))
+        late = timezone.make_aware(datetime(2024, 2, 1, 12))
+        create_transaction(Transaction(
+            user=self.user, wallet=self.wallet, type='income', amount=Decimal('30'), created_at=early
+        ))
+        tx = create_transaction(Transaction(
+            user=self.user, wallet=self.wallet, type='outcome', amount=Decimal('20'), created_at=late
+        ))
+        ledger.compact()
+        self.wallet.refresh_from_db()
+        self.assertEqual(
+            (self.wallet.total_income, self.wallet.total_outcome, self.wallet.tx_count, self.wallet.last_tx_at),
+            (Decimal('30'), Decimal('20'), 2, late),
+        )
+
+        delete_transaction(tx)
+        ledger.compact()
+        self.wallet.refresh_from_db()
+        self.assertEqual((self.wallet.total_outcome, self.wallet.tx_count, self.wallet.last_tx_at), (0, 1, early))
+        self.assertEqual(recount_wallets(Wallet.objects.filter(pk=self.wallet.pk)), [])
+
+
+class BalanceHistoryTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('owner', password='x')
+        self.source = Wallet.objects.create(user=self.user, name='Карта', type='cash', currency='UZS')
+        self.target = Wallet.objects.create(user=self.user, name='Наличные', type='cash', currency='UZS')
+
+    def test_history_includes_transfers(self):
+        today = timezone.localdate()
+        create_transaction(Transaction(
+            user=self.user, wallet=self.source, type='income', amount=Decimal('100'),
+            created_at=timezone.now() - timedelta(days=2),
+        ))
+        transfer(self.source, self.target, Decimal('30'))
+        days = [today - timedelta(days=1), today]
+
+        for build in (False, True):
+            if build:
+                checkpoints.build(self.source, every='day')
+                checkpoints.build(self.target, every='day')
+            self.assertEqual(self.source.balance_series(days), [Decimal('100'), Decimal('70')])
+            self.assertEqual(self.target.balance_series(days), [0, Decimal('30')])
+            self.assertEqual(self.target.balance_at(timezone.now() - timedelta(days=1)), 0)
+
+    def test_deleting_transfer_source_keeps_counterpart_entries(self):
+        create_transaction(Transaction(user=self.user, wallet=self.source, type='income', amount=Decimal('100')))
+        transfer(self.source, self.target, Decimal('30'))
+        delete_wallet(self.source)
+
+        self.assertEqual(ledger.balance(self.target.pk), Decimal('30'))
+        ledger.compact()
+        self.assertEqual(recount_wallets(Wallet.objects.filter(pk=self.target.pk)), [])
+
+
+class RecurringRuleTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('owner', password='x')
+        self.wallet = Wallet.objects.create(
+            user=self.user, name='Карта', type='cash', currency='UZS', balance=Decimal('0')
+        )
+        self.rule = RecurringRule.objects.create(
+            user=self.user, wallet=self.wallet, type='income', amount=Decimal('1000'),
+            freq='monthly', starts_at=timezone.make_aware(datetime(2026, 1, 31, 9, 0)),
+        )
+        self.now = timezone.make_aware(datetime(2026, 4, 30, 12, 0))
+
+    def test_due_occurrences_are_posted_once(self):
+        self.assertEqual(recurring.run(now=self.now), 4)
+        days = [timezone.localdate(at) for at in Transaction.objects.order_by('created_at').values_list('created_at', flat=True)]
+        # Конец месяца не сползает: после 28 февраля снова 31 марта
+        self.assertEqual([(day.month, day.day) for day in days], [(1, 31), (2, 28), (3, 31), (4, 30)])
+        self.assertEqual(ledger.balance(self.wallet.pk), Decimal('4000'))
+
+        # Повторный запуск и запуск со сброшенным счётчиком ничего не дублируют
+        self.assertEqual(recurring.run(now=self.now), 0)
+        RecurringRule.objects.filter(pk=self.rule.pk).update(occurrence_count=0, next_run=self.rule.starts_at)
+        self.assertEqual(recurring.run(now=self.now), 0)
+        self.assertEqual(ledger.balance(self.wallet.pk), Decimal('4000'))
+        self.rule.refresh_from_db()
+        self.assertEqual(self.rule.occurrence_count, 4)
+        self.assertEqual(timezone.localdate(self.rule.next_run).isoformat(), '2026-05-31')
+
+
+class BudgetCounterTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('owner', password='x')
+        self.wallet = Wallet.objects.create(
+            user=self.user, name='Карта', type='cash', currency='UZS', balance=Decimal('10000')
+        )
+        self.category = Category.objects.create(user=self.user, name='Еда', type='outcome')
+        self.budget = Budget.objects.create(user=self.user, category=self.category, limit=Decimal('1000'))
+
+    def spend(self, amount):
+        return create_transaction(Transaction(
+            user=self.user, wallet=self.wallet, category=self.category, type='outcome', amount=Decimal(amount)
+        ))
+
+    def test_spent_counter_and_threshold_notifications(self):
+        self.spend('700')
+        tx = self.spend('200')
+        self.assertEqual(budgets.status(self.user)[0]['spent'], Decimal('900'))
+        self.assertEqual(list(BudgetNotification.objects.values_list('threshold', flat=True)), [80])
+
+        delete_transaction(tx)
+        self.spend('400')
+        status = budgets.status(self.user)[0]
+        self.assertEqual(status['spent'], Decimal('1100'))
+        self.assertEqual(status['percent'], 110)
+        # 80% уже уведомлён в этом месяце — только 100%
+        self.assertEqual(sorted(BudgetNotification.objects.values_list('threshold', flat=True)), [80, 100])
+        self.assertEqual(budgets.recalculate(self.budget, budgets.month_of(timezone.localdate())), Decimal('1100'))
+
+    def test_wallet_delete_reverts_summaries_and_spending(self):
+        self.spend('700')
+        delete_wallet(self.wallet)
+        self.assertEqual(budgets.status(self.user)[0]['spent'], 0)
+        self.assertEqual(rollups.summarize(self.user, group_by=()).get((), {}).get('count', 0), 0)
+
+    def test_category_delete_merges_summary_buckets(self):
+        self.spend('700')
+        transport = Category.objects.create(user=self.user, name='Транспорт', type='outcome')
+        create_transaction(Transaction(
+            user=self.user, wallet=self.wallet, category=transport, type='outcome', amount=Decimal('300')
+        ))
+        self.category.delete()
+        transport.delete()
+        rows = DailySummary.objects.filter(user=self.user)
+        self.assertEqual(list(rows.values_list('category_id', 'total', 'count')), [(None, Decimal('1000'), 2)])
+
+        self.user.delete()
+        self.assertFalse(DailySummary.objects.exists())
+
+
+class RefDataCacheTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('owner', password='x')
+        self.wallet = Wallet.objects.create(user=self.user, name='Наличные', type='cash', currency='UZS')
+        refdata.invalidate(self.user.pk)  # id пользователя повторяется между тестами, кэш — общий
+
+    def test_form_choices_are_cached_until_wallet_write(self):
+        str(TransferForm(user=self.user)['from_wallet'])
+        change_balance(self.wallet.pk, Decimal('50'), 'transfer')  # баланс справочник не сбрасывает
+        with self.assertNumQueries(0):
+            self.assertIn('Наличные (UZS)', str(TransferForm(user=self.user)['from_wallet']))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Wallet.objects.create(user=self.user, name='Карта', type='visa', currency='USD')
+        self.assertIn('Карта (USD)', str(TransferForm(user=self.user)['to_wallet']))
+
+
+class RateExpressionTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('owner', password='x')
+        for currency, amount in (('USD', '3'), ('UZS', '24000')):
+            wallet = Wallet.objects.create(user=self.user, name=currency, type='cash', currency=currency)
+            Transaction.objects.create(user=self.user, wallet=wallet, type='income', amount=Decimal(amount))
+        rates.invalidate()
+        self.addCleanup(rates.invalidate)
+
+    def total_in(self, quote):
+        total = Transaction.objects.aggregate(
+            total=Sum(rates.amount_in('amount', 'wallet__currency', 'created_at', quote=quote))
+        )['total']
+        return Decimal(total).quantize(Decimal('0.01'))
+
+    def test_sql_rate_matches_get_rate_including_inverse_pairs(self):
+        # Курс по умолчанию USD→UZS и обратный к нему
+        self.assertEqual(self.total_in('UZS'), Decimal('60000'))
+        self.assertEqual(self.total_in('USD'), Decimal('5'))
+
+        # Сохранённый курс USD→UZS важнее умолчания в обе стороны
+        ExchangeRate.objects.create(base='USD', quote='UZS', rate=Decimal('8000'), effective_from=date(2000, 1, 1))
+        self.assertEqual(self.total_in('USD'), Decimal('6'))
+        self.assertEqual(self.total_in('USD'), rates.convert(Decimal('24000'), 'UZS', 'USD') + 3)
+
+    def test_pair_without_rate_is_excluded_not_counted_one_to_one(self):
+        with mock.patch.object(rates, 'DEFAULT_RATES', {}):
+            self.assertEqual(self.total_in('USD'), Decimal('3'))
+            with self.assertRaises(LookupError):
+                rates.get_rate('UZS', 'USD')
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        self.user = CustomUser.objects.create_user('owner', password='x')
+        self.wallet = Wallet.objects.create(
+            user=self.user, name='Карта', type='cash', currency='UZS', balance=Decimal('1000')
+        )
+        category = Category.objects.create(user=self.user, name='Аренда', type='outcome')
+        self.old, self.new = [
+            create_transaction(Transaction(
+                user=self.user, wallet=self.wallet, category=category, type='outcome',
+                amount=Decimal(amount), description='квартира', created_at=created_at,
+            ))
+            for amount, created_at in [
+                ('300', archive.horizon() - timedelta(hours=12)),
+                ('200', timezone.now()),
+            ]
+        ]
+
+    def test_archived_rows_stay_visible_in_all_time_reads(self):
+        before = rollups.summarize(self.user, group_by=())
+        self.assertEqual(archive.archive(), 1)
+        self.assertEqual(list(ArchivedTransaction.objects.values_list('pk', flat=True)), [self.old.pk])
+        self.assertFalse(Transaction.objects.filter(pk=self.old.pk).exists())
+
+        self.client.force_login(self.user)
+        response = self.client.get('/transactions/outcome/')
+        self.assertEqual([tx.pk for tx in response.context['transactions']], [self.new.pk, self.old.pk])
+        self.assertEqual(rollups.summarize(self.user, group_by=()), before)
+        # Неполный первый день периода считается по архиву
+        self.assertEqual(
+            rollups.summarize(self.user, start=self.old.created_at - timedelta(hours=1))[('outcome',)],
+            {'total': Decimal('500'), 'count': 2},
+        )
+        stats = category_stats(self.user)['outcome'][0]
+        self.assertEqual((stats['amount'], stats['count'], stats['median']), (Decimal('500'), 2, None))
+        self.assertContains(self.client.get('/statistics/'), 'медиана и p90 недоступны')
+        self.assertEqual([tx.pk for tx in search(self.user, 'кварт', per_page=1)], [self.new.pk])
+        page = search(self.user, 'кварт', per_page=2)
+        self.assertEqual([tx.pk for tx in page], [self.new.pk, self.old.pk])
+        self.assertEqual(recount_wallets([self.wallet]), [])
+
+        self.assertEqual(archive.restore(since=archive.horizon() - timedelta(days=2)), 1)
+        self.assertTrue(Transaction.objects.filter(pk=self.old.pk).exists())
+
+
+@mock.patch.object(routers, 'REPLICAS', ['replica'])
+class ReplicaRouterTests(SimpleTestCase):
+    # Без транзакции вокруг теста: внутри atomic роутер читает основную БД
+    def setUp(self):
+        self.router = routers.ReplicaRouter()
+        self.session = {}
+
+    def read_alias(self, method='GET', view=views.StatisticsView, write=False):
+        seen = []
+
+        def get_response(request):
+            middleware.process_view(request, view.as_view(), (), {})
+            seen.append((self.router.db_for_read(Transaction), self.router.db_for_read(CustomUser)))
+            if write:
+                self.router.db_for_write(Transaction)
+            return None
+
+        middleware = routers.ReplicaMiddleware(get_response)
+        request = getattr(RequestFactory(), method.lower())('/')
+        request.session = self.session
+        middleware(request)
+        return seen[0]
+
+    def test_reads_go_to_replica_until_user_writes(self):
+        self.assertEqual(self.read_alias(), ('replica', None))
+        self.assertEqual(self.read_alias(view=views.TransferView), (None, None))
+        self.assertEqual(self.read_alias(method='POST', write=True), (None, None))
+        # Запись закрепляет чтения пользователя за основной БД на STICKY_SECONDS
+        self.assertEqual(self.read_alias(), (None, None))
+        self.session[routers.SESSION_KEY] = 0
+        self.assertEqual(self.read_alias(), ('replica', None))
+        self.assertEqual(routers._state.get(), None)
+
+
+class ConcurrentTransferStressTests(TransactionTestCase):
+    WALLETS = 8
+    START_BALANCE = Decimal('1000')
+    TRANSFERS = 400
+
+    def setUp(self):
+        if connection.vendor == 'sqlite' and connection.is_in_memory_db():
+            self.skipTest('Нужна файловая или серверная БД: потоки работают через отдельные соединения')
+        self.user = CustomUser.objects.create_user('stress', password='x')
+        self.wallets = [
+            Wallet.objects.create(
+                user=self.user, name=f'W{i}', type='cash', currency='UZS', balance=self.START_BALANCE
+            )
+            for i in range(self.WALLETS)
+        ]
+
+    def run_transfers(self, threads):
+        per_thread = self.TRANSFERS // threads
+        done = []
+        errors = []
+
+        def worker(seed):
+            rnd = random.Random(seed)
+            ok = 0
+            try:
+                for _ in range(per_thread):
+                    source, target = rnd.sample(self.wallets, 2)
+                    try:
+                        transfer(source, target, Decimal(rnd.randint(1, 300)))
+                        ok += 1
+                    except InsufficientFunds:
+                        pass
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                done.append(ok)
+                connection.close()
+
+        workers = [threading.Thread(target=worker, args=(seed,)) for seed in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        self.assertEqual(errors, [])
+        return per_thread * threads / elapsed, sum(done)
+
+    def assert_reconciled(self):
+        balances = list(Wallet.objects.filter(user=self.user).with_live_balance().values_list('live_balance', flat=True))
+        self.assertEqual(sum(balances), self.START_BALANCE * self.WALLETS)
+        self.assertTrue(all(balance >= 0 for balance in balances), balances)
+        # После свёртки балансы сходятся с журналом, а каждый перевод — две записи
+        self.assertEqual(recount_wallets(Wallet.objects.filter(user=self.user)), [])
+        self.assertEqual(LedgerEntry.objects.filter(kind='transfer').count(), 2 * Transfer.objects.count())
+
+    def test_concurrent_transfers_reconcile(self):
+        self.run_transfers(threads=1)
+        self.assert_reconciled()
+
+        _, succeeded = self.run_transfers(threads=8)
+        self.assert_reconciled()
+        self.assertGreater(succeeded, 0)
+
+    @skipUnless(connection.vendor == 'postgresql', 'SQLite блокирует всю БД на запись: параллельные переводы не ускоряются')
+    def test_parallel_transfers_scale(self):
+        # Блокировки строк, а не всей БД: параллельные переводы не должны быть медленнее последовательных
+        serial_rate, _ = self.run_transfers(threads=1)
+        parallel_rate, _ = self.run_transfers(threads=8)
+        self.assertGreater(parallel_rate, serial_rate)
+
+
+class TransactionExportTests(TestCase):
+    def test_wallet_filter_is_parsed(self):
+        user = CustomUser.objects.create_user('owner', password='x')
+        wallet = Wallet.objects.create(user=user, name='Наличные', type='cash', currency='UZS')
+        create_transaction(Transaction(
+            user=user, wallet=wallet, type='income', amount=Decimal('100'), description='зарплата'
+        ))
+        self.client.force_login(user)
+
+        self.assertEqual(self.client.get('/transactions/export/', {'wallet': 'abc'}).status_code, 404)
+        response = self.client.get('/transactions/export/', {'wallet': wallet.pk})
+        self.assertIn('зарплата', b''.join(response.streaming_content).decode())
+
+
+class MetricsViewTests(TestCase):
+    def test_metrics_need_token_or_staff(self):
+        user = CustomUser.objects.create_user('owner', password='x')
+        self.client.force_login(user)
+        self.assertEqual(self.client.get('/metrics').status_code, 404)
+
+        CustomUser.objects.filter(pk=user.pk).update(is_staff=True)
+        self.assertEqual(self.client.get('/metrics').status_code, 200)
+
+        with self.settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics').status_code, 403)
+            self.client.logout()
+            response = self.client.get('/metrics', headers={'Authorization': 'Bearer secret'})
+            self.assertEqual(response.status_code, 200)
+
+    def test_queries_from_worker_threads_are_counted(self):
+        def query():
+            try:
+                list(Category.objects.all())
+            finally:
+                connection.close()
+
+        timer = metrics.QueryTimer()
+        token = metrics.current_timer.set(timer)
+        try:
+            # Как sync_to_async(thread_sensitive=False): свой поток, своё соединение, копия контекста
+            worker = threading.Thread(target=contextvars.copy_context().run, args=(query,))
+            worker.start()
+            worker.join()
+        finally:
+            metrics.current_timer.reset(token)
+        self.assertEqual(timer.count, 1)
+
+
+class ViewBenchmarkTests(TestCase):
+    """
+    Число запросов и коды ответов всех страниц против main/benchmark_baseline.json;
+    обновить: manage.py benchmark --update-baseline. Время — только в команде benchmark.
+    """
+
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+        self.baseline = benchmark.load_baseline(benchmark.BASELINE_PATH)
+        self.data = benchmark.seed(**self.baseline['volume'])
+
+    def test_views_do_not_regress(self):
+        results = benchmark.run(self.data, samples=2)
+        self.assertEqual(benchmark.compare(results, self.baseline), [])
@@ -7,6 +7,8 @@ urlpatterns = [
     path('',login_view, name='login'),
     path('dashboard/', views.DashboardView.as_view(), name='dashboard'),
     # Транзакции
+    path('transactions/search/', views.TransactionSearchView.as_view(), name='transaction_search'),
+    path('transactions/export/', views.TransactionExportView.as_view(), name='transaction_export'),
     path('transactions/<str:type>/', views.TransactionListView.as_view(), name='transaction_list'),
     path('transaction/<int:pk>/delete/', views.TransactionDeleteView.as_view(), name='transaction_delete'),
     path('wallet/<int:pk>/transaction/create/', views.CreateTransactionsView.as_view(), name='transaction_create'),
@@ -15,9 +17,19 @@ urlpatterns = [
     path('wallet/add/', views.WalletCreateView.as_view(), name='wallet_add'),
     path('wallet/<int:pk>/', views.WalletDetailView.as_view(), name='wallet_detail'),
     path('wallet/<int:pk>/delete/', views.WalletDeleteView.as_view(), name='wallet_delete'),
+    path('wallet/<int:pk>/import/', views.StatementImportView.as_view(), name='statement_import'),
     #transfer
     path('transfer/create/',views.TransferView.as_view(),name='transfer_create'),
     #statistics
     path('statistics/', views.StatisticsView.as_view(), name='statistics'),
+    path('statistics/series/', views.StatisticsSeriesView.as_view(), name='statistics_series'),
+    #budgets
+    path('budgets/', views.BudgetListView.as_view(), name='budget_list'),
+    path('budget/<int:pk>/delete/', views.BudgetDeleteView.as_view(), name='budget_delete'),
+    #async (ASGI)
+    path('async/dashboard/', views.AsyncDashboardView.as_view(), name='dashboard_async'),
+    path('async/statistics/', views.AsyncStatisticsView.as_view(), name='statistics_async'),
+    #metrics
+    path('metrics', views.MetricsView.as_view(), name='metrics'),
 
 ]
\ No newline at end of file
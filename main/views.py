@@ -1,13 +1,35 @@
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden, JsonResponse, StreamingHttpResponse
 from django.shortcuts import render, redirect, get_object_or_404
 from django.utils import timezone
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import quote_etag
 from django.views.generic import TemplateView, ListView, CreateView,  DeleteView
 from django.contrib.auth.mixins import LoginRequiredMixin
-from django.db.models import Sum
+import io
+from collections import defaultdict
+from decimal import Decimal
+
+from django.db import transaction as db_transaction
 from django.urls import reverse_lazy
 from datetime import datetime, timedelta
-from .models import Transaction, Wallet, Category
-from .forms import  TransactionsCreateForm ,TransferForm
+from .models import ArchivedTransaction, Budget, BudgetNotification, Transaction, Wallet, Category
+from .forms import  TransactionsCreateForm ,TransferForm, StatementImportForm, TransactionSearchForm, BudgetForm
+from .context_cache import acached_context, bump_on_commit, cached_context, data_version
+from .exporters import FORMATS, encode, export_rows
+from .importers import PARSERS, StatementError, detect_format, import_rows
+from . import archive, budgets, ledger, refdata, rollups
+from .services import InsufficientFunds, create_transaction, delete_transaction, delete_wallet, transfer
+from .pagination import CursorPaginator, InvalidCursor
+from .rates import convert
+from .metrics import registry as metrics_registry
+from .search import search
+from .stats import category_stats
+from .summaries import BUCKETS, dashboard_summary, series
 from django.views import View
+from django.contrib.auth.views import redirect_to_login
+from asgiref.sync import sync_to_async
+from .concurrency import gather_queries
 from django.contrib import messages
 
 
@@ -16,83 +38,56 @@ from django.contrib import messages
 
 class DashboardView(TemplateView):
     template_name = 'main/dashboard.html'
+    # Только чтение: ReplicaMiddleware может направить запросы в реплику (main/routers.py)
+    replica_reads = True
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         user = self.request.user
         period = self.request.GET.get('period', 'day')
 
+        context.update(cached_context(
+            user.pk, 'dashboard', period, lambda: self.build_context(user, period)
+        ))
+        context['period'] = period
+        context['period_display'] = self.get_period_display(period)
 
+        return context
 
+    def build_context(self, user, period):
+        return self.assemble_context(*[query() for query in self.context_queries(user, period)])
 
+    def context_queries(self, user, period):
+        """Независимые запросы страницы: кошельки, сводка за период, последние операции."""
         date_from = self.get_date_from(period)
-
-
-        transactions = Transaction.objects.filter(
-            user=user,
-            created_at__gte=date_from
-        )
-
-        wallets = Wallet.objects.filter(user=self.request.user)
-        RATE_USD = 12000
-
-        total_income = 0
-        total_outcome = 0
-
-        for tx in transactions.select_related('wallet'):
-            amount_uzs = tx.amount
-
-            if tx.wallet.currency == 'USD':
-                amount_uzs = tx.amount * RATE_USD
-
-            if tx.type == 'income':
-                total_income += amount_uzs
-            else:
-                total_outcome += amount_uzs
-
-        context['total_income'] = total_income
-        context['total_outcome'] = total_outcome
+        return [
+            lambda: list(Wallet.objects.filter(user=user).with_live_balance()),
+            lambda: dashboard_summary(user, date_from),
+            lambda: self.recent_transactions(user),
+        ]
+
+    def recent_transactions(self, user, count=5):
+        # Архив читается, только если свежих операций не хватает на count
+        return CursorPaginator(
+            Transaction.objects.for_user(user).select_related('wallet', 'category'), count,
+            archived=ArchivedTransaction.objects.for_user(user).select_related('wallet', 'category'),
+            horizon=archive.horizon(),
+        ).page().object_list
+
+    def assemble_context(self, wallets, summary, recent_transactions):
+        context = {}
+        context.update(summary)
 
         context['wallets'] = wallets
-        context['first_wallet'] = wallets.first()
-        total_uzs = 0
-        total_usd = 0
-        total_usd_not_uzs = 0
-        total_usd_not_usd = 0
-        for wallet in context['wallets']:
-            if wallet.currency == 'UZS':
-                total_uzs += wallet.balance
-            else:
-                total_uzs += wallet.balance * 12000
-        for wallet in context['wallets']:
-            if wallet.currency == 'USD':
-                total_usd += wallet.balance
-            else:
-                total_usd += wallet.balance / 12000
-        for wallet in context['wallets']:
-            if wallet.currency == 'USD':
-                total_usd_not_uzs += wallet.balance
-            else:
-                total_usd_not_usd += wallet.balance
-
-        context['total_balance_uzs'] = total_uzs
-        context['total_balance_usd'] = total_usd
-        context['total_balance_usd_not_uzs'] = total_usd_not_uzs
-        context['total_balance_usd_not_usd'] = total_usd_not_usd
-
-        context['period'] = period
-        context['period_display'] = self.get_period_display(period)
+        context['first_wallet'] = wallets[0] if wallets else None
 
-
-        context['recent_transactions'] = Transaction.objects.filter(
-            user=user
-        ).select_related('wallet', 'category').order_by('-created_at')[:5]
+        context['recent_transactions'] = recent_transactions
 
         return context
 
     def get_date_from(self, period):
 
-        now = datetime.now()
+        now = timezone.now()
         if period == 'day':
             return now - timedelta(days=1)
         elif period == 'week':
@@ -119,12 +114,12 @@ class DashboardView(TemplateView):
 
 class CreateTransactionsView(LoginRequiredMixin,View):
     def get(self,request,pk):
-        wallet = get_object_or_404(Wallet,pk=pk,user=request.user)
+        wallet = get_object_or_404(Wallet.objects.with_live_balance(),pk=pk,user=request.user)
         form = TransactionsCreateForm(user=request.user)
         return render(request,'main/transactions_create.html',{'form':form,'wallet':wallet})
 
     def post(self, request, pk):
-        wallet = get_object_or_404(Wallet, pk=pk, user=request.user)
+        wallet = get_object_or_404(Wallet.objects.with_live_balance(), pk=pk, user=request.user)
         form = TransactionsCreateForm(request.POST, user=request.user)
 
         if form.is_valid():
@@ -136,29 +131,26 @@ class CreateTransactionsView(LoginRequiredMixin,View):
                     form.add_error(None, 'Введите название категории')
                     return render(request, 'main/transactions_create.html', {'form': form, 'wallet': wallet})
 
-                category = Category.objects.create(
-                    user=request.user,
-                    name=name,
-                    type=form.cleaned_data['type']
-                )
-            else:
-                category = form.cleaned_data['category']
-
-            transaction = form.save(commit=False)
-            transaction.user = request.user
-            transaction.wallet = wallet
-            transaction.category = category
-
-            if transaction.type == 'income':
-                wallet.balance += transaction.amount
-            else:
-                if wallet.balance < transaction.amount:
-                    form.add_error('amount', 'Недостаточно средств')
-                    return render(request, 'main/transactions_create.html', {'form': form, 'wallet': wallet})
-                wallet.balance -= transaction.amount
+            try:
+                with db_transaction.atomic():
+                    if category_choice == 'new':
+                        category = Category.objects.create(
+                            user=request.user,
+                            name=name,
+                            type=form.cleaned_data['type']
+                        )
+                    else:
+                        category = form.cleaned_data['category']
+
+                    transaction = form.save(commit=False)
+                    transaction.user = request.user
+                    transaction.wallet = wallet
+                    transaction.category = category
+                    create_transaction(transaction)
+            except InsufficientFunds:
+                form.add_error('amount', 'Недостаточно средств')
+                return render(request, 'main/transactions_create.html', {'form': form, 'wallet': wallet})
 
-            wallet.save()
-            transaction.save()
             return redirect('dashboard')
 
         return render(request, 'main/transactions_create.html', {'form': form, 'wallet': wallet})
@@ -173,16 +165,32 @@ class TransactionListView(LoginRequiredMixin, ListView):
     template_name = 'main/transaction_list.html'
     context_object_name = 'transactions'
     paginate_by = 20
+    replica_reads = True
 
     def get_queryset(self):
-        queryset = Transaction.objects.filter(user=self.request.user)
-        transaction_type = self.kwargs.get('type')
+        return self.filter_transactions(Transaction.objects).newest_first()
 
+    def filter_transactions(self, transactions):
+        # Одни и те же условия для горячей таблицы и архива
+        transaction_type = self.kwargs.get('type')
 
         if transaction_type in ['income', 'outcome']:
-            queryset = queryset.filter(type=transaction_type)
+            queryset = transactions.for_user_type(self.request.user, transaction_type)
+        else:
+            queryset = transactions.for_user(self.request.user)
 
-        return queryset.select_related('wallet', 'category').order_by('-created_at')
+        return queryset.select_related('wallet', 'category')
+
+    def paginate_queryset(self, queryset, page_size):
+        try:
+            page = CursorPaginator(
+                queryset, page_size,
+                archived=self.filter_transactions(ArchivedTransaction.objects),
+                horizon=archive.horizon(),
+            ).page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Неверный курсор страницы')
+        return None, page, page.object_list, page.has_other_pages()
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
@@ -190,40 +198,130 @@ class TransactionListView(LoginRequiredMixin, ListView):
         context['transaction_type'] = transaction_type
         context['type_display'] = 'Доходы' if transaction_type == 'income' else 'Расходы'
 
-        wallet = Wallet.objects.filter(user=self.request.user)
-        context['wallet'] = wallet
-        context['first_wallet'] = wallet.first()
- 
+        wallets = refdata.wallets(self.request.user.pk)
+        context['wallets'] = wallets
+        context['first_wallet'] = wallets[0] if wallets else None
+
+        # Итоги за всё время — из дневных сводок, а не SUM/COUNT по всей истории
+        filters = {'type': transaction_type} if transaction_type in ['income', 'outcome'] else {}
+        summary = rollups.summarize(self.request.user, group_by=(), **filters).get((), {})
+        context['total'] = summary.get('total', 0)
+        context['total_count'] = summary.get('count', 0)
+
+        return context
+
+
+# -----------------------------------------------
+
+
+class TransactionSearchView(LoginRequiredMixin, TemplateView):
+    template_name = 'main/transaction_search.html'
+    paginate_by = 20
+    replica_reads = True
 
-        total = self.get_queryset().aggregate(Sum('amount'))['amount__sum'] or 0
-        context['total'] = total
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        form = TransactionSearchForm(self.request.GET or None, user=self.request.user)
+        page = None
+
+        if form.is_valid() and form.cleaned_data['q']:
+            data = form.cleaned_data
+            date_from = date_to = None
+            if data['date_from']:
+                date_from = timezone.make_aware(datetime.combine(data['date_from'], datetime.min.time()))
+            if data['date_to']:
+                date_to = timezone.make_aware(datetime.combine(data['date_to'], datetime.max.time()))
+            try:
+                page = search(
+                    self.request.user, data['q'],
+                    wallet_id=data['wallet'].pk if data['wallet'] else None,
+                    type=data['type'] or None,
+                    date_from=date_from,
+                    date_to=date_to,
+                    cursor=self.request.GET.get('cursor'),
+                    per_page=self.paginate_by,
+                )
+            except InvalidCursor:
+                raise Http404('Неверный курсор страницы')
 
+        # Ссылка на следующую страницу сохраняет параметры поиска
+        params = self.request.GET.copy()
+        params.pop('cursor', None)
+        context.update({
+            'form': form,
+            'page_obj': page,
+            'transactions': page.object_list if page else [],
+            'query_string': params.urlencode(),
+        })
         return context
 
 
 # -----------------------------------------------
 
 
+class TransactionExportView(LoginRequiredMixin, View):
+
+    def get(self, request):
+        file_format = request.GET.get('format', 'csv')
+        if file_format not in FORMATS:
+            raise Http404('Неизвестный формат выгрузки')
+        compress = request.GET.get('gzip') == '1'
+
+        date_from = self.parse_date(request.GET.get('date_from'))
+        date_to = self.parse_date(request.GET.get('date_to'), end_of_day=True)
+
+        rows = export_rows(
+            request.user,
+            date_from=date_from,
+            date_to=date_to,
+            type=request.GET.get('type'),
+            wallet_id=self.parse_wallet(request.GET.get('wallet')),
+        )
+        to_chunks, content_type, extension = FORMATS[file_format]
+        filename = f'transactions.{extension}'
+        if compress:
+            content_type, filename = 'application/gzip', filename + '.gz'
+
+        response = StreamingHttpResponse(encode(to_chunks(rows), compress), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        return response
+
+    def parse_date(self, value, end_of_day=False):
+        if not value:
+            return None
+        try:
+            day = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            raise Http404('Неверная дата')
+        return timezone.make_aware(
+            datetime.combine(day, datetime.max.time() if end_of_day else datetime.min.time())
+        )
+
+    def parse_wallet(self, value):
+        if not value:
+            return None
+        try:
+            return int(value)
+        except ValueError:
+            raise Http404('Неверный кошелёк')
+
+
+# -----------------------------------------------
+
+
 class TransactionDeleteView(LoginRequiredMixin, DeleteView):
 
     model = Transaction
     success_url = reverse_lazy('dashboard')
 
     def get_queryset(self):
-        return Transaction.objects.filter(user=self.request.user)
-
-    def delete(self, request, *args, **kwargs):
-        transaction = self.get_object()
-        wallet = transaction.wallet
+        return Transaction.objects.for_user(self.request.user)
 
-        if transaction.type == 'income':
-            wallet.balance -= transaction.amount
-        else:
-            wallet.balance += transaction.amount
-        wallet.save()
+    def form_valid(self, form):
+        delete_transaction(self.object)
 
-        messages.success(request, 'Транзакция удалена')
-        return super().delete(request, *args, **kwargs)
+        messages.success(self.request, 'Транзакция удалена')
+        return redirect(self.get_success_url())
 
 
 ####################### Wallet####################
@@ -233,22 +331,41 @@ class WalletListView(LoginRequiredMixin, ListView):
     model = Wallet
     template_name = 'main/wallet_list.html'
     context_object_name = 'wallets'
+    replica_reads = True
+
+    def get(self, request, *args, **kwargs):
+        self.cached = cached_context(request.user.pk, 'wallet_list', '', self.build_context)
+        return super().get(request, *args, **kwargs)
 
     def get_queryset(self):
-        return Wallet.objects.filter(user=self.request.user).order_by('-balance')
+        return self.cached['wallets']
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
+        context.update(self.cached['totals'])
+        return context
 
-        total_non_visa = Wallet.objects.filter(user=self.request.user).exclude(type='visa').aggregate(total = Sum('balance'))['total'] or 0
-        total_visa = Wallet.objects.filter(user=self.request.user, type='visa').aggregate(total = Sum('balance'))['total'] or 0
-        total_all = total_non_visa + total_visa*12000
-
-        context['total_non_visa_balance'] = total_non_visa
-        context['total_visa_balance'] = total_visa
-        context['total_all_balance'] = total_all
+    def build_context(self):
+        wallets = list(
+            Wallet.objects.filter(user=self.request.user).with_live_balance().order_by('-live_balance')
+        )
 
-        return context
+        # Суммы по валютам — из уже прочитанных текущих балансов, без второго запроса
+        totals = defaultdict(Decimal)
+        for wallet in wallets:
+            totals[wallet.currency] += wallet.live_balance
+        total_non_visa = totals['UZS']
+        total_visa = totals['USD']
+        total_all = total_non_visa + convert(total_visa, 'USD', 'UZS')
+
+        return {
+            'wallets': wallets,
+            'totals': {
+                'total_non_visa_balance': total_non_visa,
+                'total_visa_balance': total_visa,
+                'total_all_balance': total_all,
+            },
+        }
 
 
 #---------------------------------------
@@ -264,7 +381,10 @@ class WalletCreateView(LoginRequiredMixin, CreateView):
     def form_valid(self, form):
         form.instance.user = self.request.user
         messages.success(self.request, f'Кошелёк "{form.instance.name}" создан')
-        return super().form_valid(form)
+        response = super().form_valid(form)
+        # После сохранения: иначе при автокоммите версия сменится раньше, чем появится кошелёк
+        bump_on_commit(self.request.user.pk)
+        return response
 
 
 # -----------------------------------------
@@ -272,17 +392,40 @@ class WalletCreateView(LoginRequiredMixin, CreateView):
 
 class WalletDetailView(LoginRequiredMixin,TemplateView):
     template_name = 'main/wallet_detail.html'
+    CHART_DAYS = 30
+    replica_reads = True
+
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         pk = self.kwargs.get('pk')
         wallet = get_object_or_404(Wallet,pk=pk,user=self.request.user)
         context['wallet'] = wallet
-        transactions = wallet.transactions.all()
-
-        context['income'] = transactions.filter(type='income').aggregate(total = Sum('amount'))['total'] or 0
-        context['outcome'] = transactions.filter(type= 'outcome').aggregate(total =Sum('amount'))['total'] or 0
 
-        context['transactions'] = wallet.transactions.select_related('category').order_by('-created_at')[:20]
+        # Итоги — свёрнутые счётчики кошелька плюс хвост журнала, без агрегатов по операциям
+        tail = ledger.tail(wallet.pk)
+        wallet.live_balance = wallet.balance + tail['balance']
+        context['income'] = wallet.total_income + tail['income']
+        context['outcome'] = wallet.total_outcome + tail['outcome']
+        context['tx_count'] = wallet.tx_count + tail['count']
+        context['last_tx_at'] = max(filter(None, [wallet.last_tx_at, tail['last_at']]), default=None)
+
+        try:
+            page = CursorPaginator(
+                Transaction.objects.for_wallet(wallet).select_related('category'), 20,
+                archived=ArchivedTransaction.objects.for_wallet(wallet).select_related('category'),
+                horizon=archive.horizon(),
+            ).page(self.request.GET.get('cursor'))
+        except InvalidCursor:
+            raise Http404('Неверный курсор страницы')
+        context['transactions'] = page.object_list
+        context['page_obj'] = page
+
+        today = timezone.localdate()
+        days = [today - timedelta(days=n) for n in range(self.CHART_DAYS - 1, -1, -1)]
+        context['balance_chart'] = [
+            {'day': day.strftime('%d.%m'), 'balance': float(balance)}
+            for day, balance in zip(days, wallet.balance_series(days))
+        ]
         return context
 
 
@@ -297,10 +440,40 @@ class WalletDeleteView(LoginRequiredMixin, DeleteView):
     def get_queryset(self):
         return Wallet.objects.filter(user=self.request.user)
 
-    def delete(self, request, *args, **kwargs):
-        wallet = self.get_object()
-        messages.success(request, f'Кошелёк "{wallet.name}" удалён')
-        return super().delete(request, *args, **kwargs)
+    def form_valid(self, form):
+        delete_wallet(self.object)
+        messages.success(self.request, f'Кошелёк "{self.object.name}" удалён')
+        return redirect(self.get_success_url())
+
+
+class StatementImportView(LoginRequiredMixin, View):
+    template_name = 'main/statement_import.html'
+
+    def get(self, request, pk):
+        wallet = get_object_or_404(Wallet, pk=pk, user=request.user)
+        return render(request, self.template_name, {'form': StatementImportForm(), 'wallet': wallet})
+
+    def post(self, request, pk):
+        wallet = get_object_or_404(Wallet, pk=pk, user=request.user)
+        form = StatementImportForm(request.POST, request.FILES)
+        if not form.is_valid():
+            return render(request, self.template_name, {'form': form, 'wallet': wallet})
+
+        upload = form.cleaned_data['file']
+        file_format = form.cleaned_data['format']
+        if file_format == 'auto':
+            file_format = detect_format(upload.name)
+
+        # Файл читается потоком по строкам, целиком в память не загружается
+        stream = io.TextIOWrapper(upload.file, encoding='utf-8-sig', errors='replace', newline='')
+        try:
+            imported = import_rows(request.user, wallet, PARSERS[file_format](stream))
+        except StatementError as exc:
+            form.add_error('file', str(exc))
+            return render(request, self.template_name, {'form': form, 'wallet': wallet})
+
+        messages.success(request, f'Импортировано операций: {imported}')
+        return redirect('wallet_detail', pk=wallet.pk)
 
 
 ####################### transfer ##########################
@@ -324,40 +497,26 @@ class TransferView(LoginRequiredMixin, View):
             form.add_error(None, 'Нельзя переводить в тот же кошелёк')
             return render(request, 'main/transfer.html', {'form': form})
 
-        if from_wallet.balance < amount:
+        try:
+            transfer(from_wallet, to_wallet, amount)
+        except InsufficientFunds:
             form.add_error('amount', 'Недостаточно средств')
             return render(request, 'main/transfer.html', {'form': form})
-
-
-        EXCHANGE_RATE = 12000
-
-        if from_wallet.type == to_wallet.type:
-            converted_amount = amount
-
-        elif from_wallet.type == 'uzcard' and to_wallet.type == 'visa':
-            converted_amount = amount / EXCHANGE_RATE
-
-        elif from_wallet.type == 'visa' and to_wallet.type == 'uzcard':
-            converted_amount = amount * EXCHANGE_RATE
-        else:
+        except LookupError:
             form.add_error(None, 'Невозможно выполнить перевод между этими кошельками')
             return render(request, 'main/transfer.html', {'form': form})
 
-        from_wallet.balance -= amount
-        to_wallet.balance += converted_amount
-
-        from_wallet.save()
-        to_wallet.save()
-
         return redirect('dashboard')
 
 
-
 #####################Statistics############################
 
 
 class StatisticsView(LoginRequiredMixin, TemplateView):
     template_name = 'main/statistics.html'
+    replica_reads = True
+    COLORS = ['#4caf50', '#2196f3', '#ff9800', '#9c27b0', '#00bcd4']
+    OTHER_COLOR = '#bdbdbd'
 
     def get_date_range(self):
         now = timezone.now()
@@ -392,63 +551,30 @@ class StatisticsView(LoginRequiredMixin, TemplateView):
         context = super().get_context_data(**kwargs)
 
         user = self.request.user
-        period = self.request.GET.get('period')
-
-        qs = Transaction.objects.filter(
-            user=user,
-            category__isnull=False
-        )
+        params = f"{self.request.GET.get('period', '')}:{self.request.GET.get('date', '')}"
+        context.update(cached_context(user.pk, 'statistics', params, self.build_context))
+        return context
 
+    def build_context(self):
+        user = self.request.user
+        period = self.request.GET.get('period')
 
         start_date, end_date = self.get_date_range()
 
-        if start_date and end_date:
-            qs = qs.filter(created_at__range=(start_date, end_date))
-
-        outcome_qs = qs.filter(type='outcome')
-        income_qs = qs.filter(type='income')
-
-        total_outcome = outcome_qs.aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-
-        total_income = income_qs.aggregate(
-            total=Sum('amount')
-        )['total'] or 0
-
-        by_category_outcome = (
-            outcome_qs
-            .values('category__name')
-            .annotate(total=Sum('amount'))
-        )
-
-        by_category_income = (
-            income_qs
-            .values('category__name')
-            .annotate(total=Sum('amount'))
-        )
+        stats = category_stats(user, start_date, end_date, top_n=len(self.COLORS))
+        return self.stats_context(stats, period, start_date, end_date)
 
-        COLORS = ['#4caf50', '#2196f3', '#ff9800', '#9c27b0', '#00bcd4']
+    def stats_context(self, stats, period, start_date, end_date):
+        context = {}
 
-        outcome_stats = []
-        for idx, item in enumerate(by_category_outcome):
-            percent = (item['total'] / total_outcome * 100) if total_outcome else 0
-            outcome_stats.append({
-                'category': item['category__name'],
-                'amount': item['total'],
-                'percent': round(percent, 1),
-                'color': COLORS[idx % len(COLORS)]
-            })
+        for items in stats.values():
+            for idx, item in enumerate(items):
+                item['color'] = self.OTHER_COLOR if item['is_other'] else self.COLORS[idx % len(self.COLORS)]
 
-        income_stats = []
-        for idx, item in enumerate(by_category_income):
-            percent = (item['total'] / total_income * 100) if total_income else 0
-            income_stats.append({
-                'category': item['category__name'],
-                'amount': item['total'],
-                'percent': round(percent, 1),
-                'color': COLORS[idx % len(COLORS)]
-            })
+        outcome_stats = stats['outcome']
+        income_stats = stats['income']
+        total_outcome = sum(item['amount'] for item in outcome_stats)
+        total_income = sum(item['amount'] for item in income_stats)
 
         context.update({
             'outcome_stats': outcome_stats,
@@ -463,17 +589,187 @@ class StatisticsView(LoginRequiredMixin, TemplateView):
         return context
 
 
+# -----------------------------------------------
 
 
+class StatisticsSeriesView(LoginRequiredMixin, View):
+    """JSON-ряды доходов/расходов для графика: ?bucket=day|week|month&date_from&date_to&wallet&category"""
 
+    DEFAULT_DAYS = {'day': 30, 'week': 12 * 7, 'month': 365}
+    replica_reads = True
 
+    def get_date(self, name):
+        value = self.request.GET.get(name)
+        return datetime.strptime(value, '%Y-%m-%d').date() if value else None
 
+    def get(self, request):
+        bucket = request.GET.get('bucket', 'day')
+        if bucket not in BUCKETS:
+            return JsonResponse({'error': 'bucket: day, week или month'}, status=400)
+        try:
+            date_to = self.get_date('date_to') or timezone.localdate()
+            date_from = self.get_date('date_from') or date_to - timedelta(days=self.DEFAULT_DAYS[bucket])
+            wallet_id = int(request.GET.get('wallet') or 0)
+            category_id = int(request.GET.get('category') or 0)
+        except ValueError:
+            return JsonResponse({'error': 'Неверные параметры'}, status=400)
+
+        # Версия данных поднимается при каждой записи пользователя: пока она
+        # та же, опрос графика получает 304 без запросов к транзакциям
+        params = f'{bucket}:{date_from}:{date_to}:{wallet_id}:{category_id}'
+        etag = quote_etag(f'{data_version(request.user.pk)}:{params}')
+
+        response = get_conditional_response(request, etag=etag)
+        if response is None:
+            start = timezone.make_aware(datetime.combine(date_from, datetime.min.time()))
+            end = timezone.make_aware(datetime.combine(date_to, datetime.max.time()))
+            response = JsonResponse({
+                'bucket': bucket,
+                'date_from': date_from.isoformat(),
+                'date_to': date_to.isoformat(),
+                'currency': 'UZS',
+                'series': series(request.user, bucket, start, end, wallet_id, category_id),
+            })
+        response['ETag'] = etag
+        patch_cache_control(response, private=True, no_cache=True)
+        return response
 
 
+####################### Budgets####################
 
 
+class BudgetListView(LoginRequiredMixin, View):
+    """Бюджеты с расходом за текущий месяц — счётчики, без агрегатов по операциям."""
 
+    def get(self, request):
+        return self.render(request, BudgetForm(user=request.user))
 
+    def post(self, request):
+        category_id = request.POST.get('category', '')
+        # Лимит по уже заведённой категории обновляется
+        instance = None
+        if category_id.isdigit():
+            instance = Budget.objects.filter(user=request.user, category_id=category_id).first()
+        form = BudgetForm(request.POST, user=request.user, instance=instance)
+        if not form.is_valid():
+            return self.render(request, form)
+
+        with db_transaction.atomic():
+            budget = form.save(commit=False)
+            budget.user = request.user
+            budget.save()
+            # Расход до появления бюджета счётчик не видел
+            budgets.recalculate(budget, budgets.month_of(timezone.localdate()))
+        messages.success(request, f'Бюджет «{budget.category.name}» сохранён')
+        return redirect('budget_list')
+
+    def render(self, request, form):
+        month = budgets.month_of(timezone.localdate())
+        notifications = (
+            BudgetNotification.objects
+            .filter(budget__user=request.user, month=month)
+            .select_related('budget__category')
+            .order_by('-created_at')
+        )
+        return render(request, 'main/budget_list.html', {
+            'form': form,
+            'budgets': budgets.status(request.user, month),
+            'notifications': notifications,
+            'month': month,
+        })
+
+
+class BudgetDeleteView(LoginRequiredMixin, DeleteView):
+
+    model = Budget
+    success_url = reverse_lazy('budget_list')
+
+    def get_queryset(self):
+        return Budget.objects.filter(user=self.request.user)
+
+    def form_valid(self, form):
+        messages.success(self.request, 'Бюджет удалён')
+        return super().form_valid(form)
 
 
+##################### Async (ASGI) ######################
 
+
+class AsyncDashboardView(DashboardView):
+    """DashboardView для ASGI: независимые запросы страницы выполняются одновременно."""
+
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        period = request.GET.get('period', 'day')
+
+        context = {'view': self}
+        context.update(await acached_context(
+            user.pk, 'dashboard', period, lambda: self.abuild_context(user, period)
+        ))
+        context['period'] = period
+        context['period_display'] = self.get_period_display(period)
+        # Шаблон и контекст-процессоры (сессия, сообщения) синхронные
+        return await sync_to_async(render)(request, self.template_name, context)
+
+    async def abuild_context(self, user, period):
+        return self.assemble_context(*await gather_queries(*self.context_queries(user, period)))
+
+
+# -----------------------------------------------
+
+
+class AsyncStatisticsView(StatisticsView):
+    """StatisticsView для ASGI: доходы и расходы считаются двумя одновременными запросами."""
+
+    def dispatch(self, request, *args, **kwargs):
+        # LoginRequiredMixin читает request.user синхронно; вход проверяет get через auser()
+        return View.dispatch(self, request, *args, **kwargs)
+
+    async def get(self, request, *args, **kwargs):
+        user = await request.auser()
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+
+        params = f"{request.GET.get('period', '')}:{request.GET.get('date', '')}"
+        context = {'view': self}
+        context.update(await acached_context(
+            user.pk, 'statistics', params, lambda: self.abuild_context(user)
+        ))
+        return await sync_to_async(render)(request, self.template_name, context)
+
+    async def abuild_context(self, user):
+        period = self.request.GET.get('period')
+        start_date, end_date = self.get_date_range()
+        top_n = len(self.COLORS)
+
+        income, outcome = await gather_queries(
+            lambda: category_stats(user, start_date, end_date, top_n, type='income'),
+            lambda: category_stats(user, start_date, end_date, top_n, type='outcome'),
+        )
+        stats = {'income': income['income'], 'outcome': outcome['outcome']}
+        return self.stats_context(stats, period, start_date, end_date)
+
+
+##################### Metrics ############################
+
+
+class MetricsView(View):
+    """
+    Метрики процесса для Prometheus. При заданном METRICS_TOKEN нужен заголовок
+    Authorization: Bearer, без него метрики видит только персонал.
+    """
+
+    def get(self, request):
+        token = getattr(settings, 'METRICS_TOKEN', None)
+        if token:
+            if request.headers.get('Authorization') != f'Bearer {token}':
+                return HttpResponseForbidden()
+        elif not request.user.is_staff:
+            # Остальным адрес не выдаёт, что метрики вообще есть
+            raise Http404
+        return HttpResponse(
+            metrics_registry.render(),
+            content_type='text/plain; version=0.0.4; charset=utf-8',
+        )
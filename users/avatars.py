@@ -0,0 +1,140 @@
+import hashlib
+import io
+import logging
+import re
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, transaction
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+
+logger = logging.getLogger(__name__)
+
+DEFAULT = 'avatars/default.png'
+RENDITIONS_DIR = 'avatars/r'
+
+# Большая сторона оригинала после загрузки
+MAX_SIDE = 1024
+# Квадратные копии: 120 — кружок в профиле, 240 — он же на экранах 2x
+SIZES = (120, 240)
+FORMATS = {
+    'webp': ('WEBP', 'webp', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', 'jpg', {'quality': 85, 'optimize': True, 'progressive': True}),
+}
+RENDITION_NAME = re.compile(r'^[0-9a-f]{16}-\d+\.(webp|jpg)$')
+
+CONTENT_TYPES = {'webp': 'image/webp', 'jpg': 'image/jpeg'}
+
+executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='avatars')
+
+
+def _digest(data):
+    return hashlib.sha256(data).hexdigest()[:16]
+
+
+def _encode(image, format):
+    pillow_format, _, options = FORMATS[format]
+    buffer = io.BytesIO()
+    image.save(buffer, pillow_format, **options)
+    return buffer.getvalue()
+
+
+def _store(name, data):
+    # Имя — хэш содержимого: файл с таким именем уже ровно такой же
+    if not default_storage.exists(name):
+        default_storage.save(name, ContentFile(data))
+    return name
+
+
+def _load(source):
+    image = Image.open(source)
+    # JPEG декодируется сразу в уменьшенном масштабе, если сторона много больше нужной
+    image.draft('RGB', (MAX_SIDE, MAX_SIDE))
+    image = ImageOps.exif_transpose(image)
+    if image.mode in ('RGBA', 'LA', 'P'):
+        image = image.convert('RGBA')
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    elif image.mode != 'RGB':
+        image = image.convert('RGB')
+    image.thumbnail((MAX_SIDE, MAX_SIDE), Image.Resampling.LANCZOS)
+    return image
+
+
+def render(source):
+    """
+    Уменьшает оригинал до MAX_SIDE и сохраняет его без EXIF как JPEG,
+    плюс квадратные копии SIZES в WebP и JPEG. Имена файлов — хэш содержимого.
+    Возвращает (имя оригинала, {'webp': {'120': имя, ...}, 'jpeg': {...}}).
+    """
+    image = _load(source)
+    data = _encode(image, 'jpeg')
+    original = _store(f'avatars/{_digest(data)}.jpg', data)
+
+    renditions = {format: {} for format in FORMATS}
+    for size in SIZES:
+        square = ImageOps.fit(image, (size, size), Image.Resampling.LANCZOS)
+        for format, (_, extension, _) in FORMATS.items():
+            data = _encode(square, format)
+            renditions[format][str(size)] = _store(
+                f'{RENDITIONS_DIR}/{_digest(data)}-{size}.{extension}', data
+            )
+    return original, renditions
+
+
+def process(user_id, name):
+    """
+    Готовит копии аватара name пользователя user_id. Если пользователь
+    успел загрузить другой аватар, результат не записывается.
+    """
+    from .models import CustomUser
+
+    with default_storage.open(name) as source:
+        original, renditions = render(source)
+    updated = CustomUser.objects.filter(pk=user_id, avatar=name).update(
+        avatar=original, avatar_renditions=renditions,
+    )
+    if updated and original != name:
+        default_storage.delete(name)
+    return updated
+
+
+def _job(user_id, name):
+    try:
+        process(user_id, name)
+    except Exception:
+        logger.exception('Не удалось обработать аватар %s пользователя %s', name, user_id)
+    finally:
+        close_old_connections()
+
+
+def schedule(user):
+    """Ставит обработку аватара в пул после фиксации транзакции — запрос её не ждёт."""
+    name = user.avatar.name
+    if not name or name == DEFAULT:
+        return
+    transaction.on_commit(lambda: executor.submit(_job, user.pk, name))
+
+
+def url(name):
+    return reverse('avatar_rendition', kwargs={'name': name.rsplit('/', 1)[-1]})
+
+
+def picture(user, size=SIZES[0]):
+    """srcset для <picture>: WebP и JPEG в size и 2x. None, пока копий нет."""
+    renditions = user.avatar_renditions or {}
+    result = {}
+    for format in FORMATS:
+        names = renditions.get(format, {})
+        if str(size) not in names:
+            return None
+        srcset = [f'{url(names[str(size)])} 1x']
+        if str(size * 2) in names:
+            srcset.append(f'{url(names[str(size * 2)])} 2x')
+        result[format] = ', '.join(srcset)
+    result['src'] = url(renditions['jpeg'][str(size)])
+    return result
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from users import avatars
+from users.models import CustomUser
+
+
+class Command(BaseCommand):
+    help = 'Готовит уменьшенные копии аватаров, загруженных до их появления'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', type=int, action='append', help='Только этот пользователь (можно несколько)')
+        parser.add_argument('--all', action='store_true', help='Пересоздать и уже готовые копии')
+
+    def handle(self, *args, **options):
+        users = CustomUser.objects.exclude(avatar='').exclude(avatar=avatars.DEFAULT).order_by('pk')
+        if options['user']:
+            users = users.filter(pk__in=options['user'])
+        if not options['all']:
+            users = users.filter(avatar_renditions={})
+
+        total = 0
+        for pk, name in users.values_list('pk', 'avatar').iterator():
+            try:
+                total += avatars.process(pk, name)
+            except (OSError, ValueError) as exc:
+                self.stderr.write(f'{name}: {exc}')
+        self.stdout.write(self.style.SUCCESS(f'Обработано аватаров: {total}'))
@@ -8,8 +8,15 @@ class CustomUser(AbstractUser):
     avatar = models.ImageField(upload_to='avatars/',default='avatars/default.png')
     address = models.TextField()
     balance  = models.DecimalField(max_digits=15,decimal_places=2,default=0.00)
+    # Уменьшенные копии аватара, см. users/avatars.py
+    avatar_renditions = models.JSONField(default=dict, blank=True, editable=False)
 
     def __str__(self):
         return self.username
 
+    @property
+    def avatar_picture(self):
+        from . import avatars
+        return avatars.picture(self)
+
 
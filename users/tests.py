@@ -1,3 +1,47 @@
-from django.test import TestCase
+import io
+import shutil
+import tempfile
 
-# Create your tests here.
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from PIL import Image
+
+from . import avatars
+from .models import CustomUser
+
+
+class AvatarRenditionTests(TestCase):
+    def setUp(self):
+        media = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media)
+        settings = override_settings(MEDIA_ROOT=media)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_process_bounds_original_and_serves_renditions(self):
+        photo = io.BytesIO()
+        Image.new('RGB', (3000, 2000), (200, 50, 50)).save(photo, 'JPEG')
+        user = CustomUser.objects.create_user('photo', password='x')
+        user.avatar = SimpleUploadedFile('photo.jpg', photo.getvalue(), content_type='image/jpeg')
+        user.save()
+        uploaded = user.avatar.name
+
+        self.assertEqual(avatars.process(user.pk, uploaded), 1)
+        user.refresh_from_db()
+        self.assertFalse(default_storage.exists(uploaded))
+        with default_storage.open(user.avatar.name) as f:
+            self.assertEqual(max(Image.open(f).size), avatars.MAX_SIDE)
+        for size in avatars.SIZES:
+            with default_storage.open(user.avatar_renditions['webp'][str(size)]) as f:
+                self.assertEqual(Image.open(f).size, (size, size))
+
+        response = self.client.get(user.avatar_picture['src'])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'image/jpeg')
+        self.assertIn('immutable', response['Cache-Control'])
+        response.close()
+
+        # Пользователь сменил аватар, пока шла обработка: старый результат не пишется
+        CustomUser.objects.filter(pk=user.pk).update(avatar='avatars/newer.jpg')
+        self.assertEqual(avatars.process(user.pk, user.avatar.name), 0)
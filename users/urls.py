@@ -6,4 +6,5 @@ urlpatterns = [
     # path('login/', views.login_view, name='login'),
     path('logout/', views.logout_view, name='logout'),
     path('profile/', views.ProfileView.as_view(), name='profile'),
+    path('avatars/<str:name>', views.avatar_rendition, name='avatar_rendition'),
 ]
\ No newline at end of file
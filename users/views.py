@@ -1,3 +1,5 @@
+from django.core.files.storage import default_storage
+from django.http import FileResponse, Http404
 from django.shortcuts import render, redirect
 from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.decorators import login_required
@@ -5,6 +7,7 @@ from django.contrib import messages
 from django.views.generic import UpdateView
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.urls import reverse_lazy
+from . import avatars
 from .forms import SignUpForm, LoginForm, ProfileUpdateForm
 from .models import CustomUser
 
@@ -56,5 +59,25 @@ class ProfileView(LoginRequiredMixin, UpdateView):
         return self.request.user
 
     def form_valid(self, form):
+        avatar_changed = 'avatar' in form.changed_data
+        if avatar_changed:
+            # Старые копии от прежнего аватара, новые появятся после обработки
+            form.instance.avatar_renditions = {}
         messages.success(self.request, 'Профиль обновлён')
-        return super().form_valid(form)
\ No newline at end of file
+        response = super().form_valid(form)
+        if avatar_changed:
+            avatars.schedule(self.object)
+        return response
+
+
+def avatar_rendition(request, name):
+    # Имя содержит хэш содержимого, поэтому файл по этому адресу не меняется
+    if not avatars.RENDITION_NAME.match(name):
+        raise Http404
+    try:
+        file = default_storage.open(f'{avatars.RENDITIONS_DIR}/{name}')
+    except FileNotFoundError:
+        raise Http404
+    response = FileResponse(file, content_type=avatars.CONTENT_TYPES[name.rsplit('.', 1)[1]])
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response